@@ -0,0 +1,103 @@
+"""Porownanie czasu chunkowania: dawny algorytm kwadratowy vs inkrementalny.
+
+Uruchomienie:
+    uv run python benchmarks/bench_chunking.py --items 500 --tokenizer auto
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from miniflux_prompt_compiler.core.chunking import build_prompts_with_chunking  # noqa: E402
+from miniflux_prompt_compiler.core.prompting import build_prompt  # noqa: E402
+from miniflux_prompt_compiler.core.tokenization import (  # noqa: E402
+    MAX_PROMPT_TOKENS,
+    TOKENIZER_OPTIONS,
+    count_tokens,
+)
+from miniflux_prompt_compiler.types import ProcessedItem  # noqa: E402
+
+WORDS = (
+    "miniflux rss artykul dane liczba wzrost rynek model analiza raport "
+    "the of and to in for with on news market growth report data"
+).split()
+
+
+def legacy_build_prompts_with_chunking(
+    items: list[ProcessedItem], max_tokens: int, tokenizer: str = "auto"
+) -> list[str]:
+    # Wersja sprzed inkrementalnego chunkera: pelny prompt po kazdym elemencie.
+    prompts: list[str] = []
+    current: list[ProcessedItem] = []
+    for item in items:
+        current.append(item)
+        if count_tokens(build_prompt(current), tokenizer=tokenizer) <= max_tokens:
+            continue
+        current.pop()
+        if current:
+            prompts.append(build_prompt(current))
+            current = [item]
+            if count_tokens(build_prompt(current), tokenizer=tokenizer) <= max_tokens:
+                continue
+        current = []
+    if current:
+        prompts.append(build_prompt(current))
+    return prompts
+
+
+def make_items(count: int, seed: int = 0) -> list[ProcessedItem]:
+    rng = random.Random(seed)
+    items: list[ProcessedItem] = []
+    for index in range(count):
+        paragraphs = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + "."
+            for _ in range(rng.randint(3, 12))
+        ]
+        items.append(
+            ProcessedItem(title=f"Artykul {index}", content="\n\n".join(paragraphs))
+        )
+    return items
+
+
+def measure(func, *args, **kwargs):  # type: ignore[no-untyped-def]
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--max-tokens", type=int, default=MAX_PROMPT_TOKENS)
+    parser.add_argument(
+        "--tokenizer", choices=sorted(TOKENIZER_OPTIONS), default="auto"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    items = make_items(args.items)
+    legacy_seconds, legacy_prompts = measure(
+        legacy_build_prompts_with_chunking, items, args.max_tokens, args.tokenizer
+    )
+    new_seconds, new_chunks = measure(
+        build_prompts_with_chunking, items, args.max_tokens, args.tokenizer
+    )
+    new_prompts = [chunk.text for chunk in new_chunks]
+    if legacy_prompts != new_prompts:
+        print("BLAD: rozne granice chunkow")
+        return 1
+
+    print(f"items={args.items} tokenizer={args.tokenizer} prompts={len(new_prompts)}")
+    print(f"legacy:      {legacy_seconds:.3f}s")
+    print(f"incremental: {new_seconds:.3f}s")
+    print(f"speedup:     {legacy_seconds / max(new_seconds, 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""Porownanie czasu cleanupu markdown: dawne re.sub per wzorzec vs NoiseFilter.
+
+Uruchomienie:
+    uv run python benchmarks/bench_noise_filter.py --articles 300
+    uv run python benchmarks/bench_noise_filter.py --corpus ~/artykuly
+
+Katalog `--corpus` moze zawierac pliki `.md` (markdown po trafilatura) oraz
+`.html` (przepuszczane raz przez `trafilatura.extract` przed pomiarem).
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from miniflux_prompt_compiler.core.noise_filter import DEFAULT_NOISE_RULES  # noqa: E402
+
+LEGACY_NOISE_PATTERNS = [
+    r"(?im)^follow us\s*$",
+    r"(?im)^font size\s*$",
+    r"(?im)^save\s*$",
+    r"(?im)^print\s*$",
+    r"(?im)^rate story\s*$",
+    r"(?im)^listen\s*$",
+    r"(?im)^loading\.\.\.\s*$",
+    r"(?im)^live events\s*$",
+    r"(?im)^read more news on\s*$",
+    r"(?im)^download the .* app.*$",
+    r"(?im)^\s*you can now subscribe to our .*?$",
+    r"(?im)^\s*catch all the .*?$",
+    r"(?im)^faqs:?\s*$",
+    r"(?im)^q:\s+.*$",
+    r"(?im)^a:\s+.*$",
+]
+
+LEGACY_NOISE_LINE_CONTAINS = [
+    "whatsapp channel",
+    "follow channel",
+    "read more news on",
+    "download the economic times news app",
+    "catch all the us news",
+    "international breaking news events",
+]
+
+WORDS = (
+    "miniflux rss artykul dane liczba wzrost rynek model analiza raport "
+    "the of and to in for with on news market growth report data"
+).split()
+
+NOISE_LINES = [
+    "Follow us",
+    "Font Size",
+    "Save",
+    "Print",
+    "Listen",
+    "Loading...",
+    "Read more news on",
+    "Download The Economic Times News App to get Daily Market Updates",
+    "Join our WhatsApp channel for updates",
+    "Catch all the US News and Updates",
+]
+
+
+def legacy_cleanup_markdown(markdown: str) -> str:
+    # Wersja sprzed NoiseFilter: osobne re.sub na calym tekscie i any() per linia.
+    text = markdown
+    for pattern in LEGACY_NOISE_PATTERNS:
+        text = re.sub(pattern, "", text)
+
+    cleaned_lines: list[str] = []
+    for line in text.splitlines():
+        normalized = line.strip().lower()
+        if not normalized:
+            cleaned_lines.append("")
+            continue
+        if any(fragment in normalized for fragment in LEGACY_NOISE_LINE_CONTAINS):
+            continue
+        cleaned_lines.append(line)
+
+    text = "\n".join(cleaned_lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def make_articles(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    articles: list[str] = []
+    for _ in range(count):
+        lines: list[str] = []
+        for _ in range(rng.randint(20, 200)):
+            if rng.random() < 0.1:
+                lines.append(rng.choice(NOISE_LINES))
+            else:
+                lines.append(
+                    " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 80)))
+                )
+            lines.append("")
+        articles.append("\n".join(lines))
+    return articles
+
+
+def load_corpus(corpus: Path) -> list[str]:
+    articles: list[str] = []
+    for path in sorted(corpus.rglob("*")):
+        if path.suffix == ".md":
+            articles.append(path.read_text(encoding="utf-8"))
+        elif path.suffix in {".html", ".htm"}:
+            import trafilatura
+
+            markdown = trafilatura.extract(
+                path.read_text(encoding="utf-8", errors="replace"),
+                output_format="markdown",
+                include_links=False,
+                include_images=False,
+                include_tables=False,
+                favor_precision=True,
+                with_metadata=False,
+            )
+            if markdown:
+                articles.append(markdown)
+    return articles
+
+
+def measure(func, articles: list[str], repeat: int):  # type: ignore[no-untyped-def]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(article) for article in articles]
+    return time.perf_counter() - started, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=300)
+    parser.add_argument("--corpus", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus:
+        articles = load_corpus(args.corpus)
+        if not articles:
+            print(f"BLAD: brak plikow .md/.html w {args.corpus}")
+            return 1
+    else:
+        articles = make_articles(args.articles)
+
+    noise_filter = DEFAULT_NOISE_RULES.for_url(None)
+    legacy_seconds, legacy_results = measure(
+        legacy_cleanup_markdown, articles, args.repeat
+    )
+    new_seconds, new_results = measure(noise_filter.clean, articles, args.repeat)
+    # Dawne wzorce z `\s` w trybie (?m) potrafily zjesc nastepna linie (np. "Q:"),
+    # wiec rozbieznosci raportujemy zamiast przerywac pomiar.
+    different = sum(
+        1 for legacy, new in zip(legacy_results, new_results) if legacy != new
+    )
+    chars = sum(len(article) for article in articles)
+
+    print(f"articles={len(articles)} chars={chars} repeat={args.repeat}")
+    print(f"legacy:      {legacy_seconds:.3f}s")
+    print(f"noisefilter: {new_seconds:.3f}s")
+    print(f"speedup:     {legacy_seconds / max(new_seconds, 1e-9):.1f}x")
+    print(f"rozne wyniki: {different}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
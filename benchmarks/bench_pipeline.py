@@ -0,0 +1,301 @@
+"""Przepustowosc calego przebiegu `run()` na lokalnych zastepnikach Miniflux i Jiny.
+
+Uruchomienie:
+    uv run python benchmarks/bench_pipeline.py --entries 300 --workers 8 \\
+        --output benchmarks/results/pipeline.json
+    uv run python benchmarks/bench_pipeline.py --async --fetch-content-error-rate 0.3 \\
+        --compare benchmarks/results/pipeline.json
+
+Wynik (entries/s, p50/p95 latencji pobrania tresci wpisu, szczytowy RSS, czas
+CPU tokenizacji i chunkowania, liczba duplikatow i tokenow promptow oraz
+agregaty etapow z `RunMetrics`) jest
+wypisywany i zapisywany jako JSON, zeby porownywac przebiegi miedzy commitami.
+"""
+
+import argparse
+import io
+import json
+import logging
+import math
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fake_upstreams import FakeJina, FakeMiniflux, UpstreamProfile  # noqa: E402
+
+from miniflux_prompt_compiler.app import run  # noqa: E402
+from miniflux_prompt_compiler.core.chunking import (  # noqa: E402
+    GROUP_BY_OPTIONS,
+    PACKING_OPTIONS,
+)
+from miniflux_prompt_compiler.core.tokenization import (  # noqa: E402
+    MAX_PROMPT_TOKENS,
+    TOKENIZER_OPTIONS,
+)
+from miniflux_prompt_compiler.options import RunOptions  # noqa: E402
+
+COMPARED = (
+    ("entries_per_sec", True),
+    ("latency_p50", False),
+    ("latency_p95", False),
+    ("peak_rss_mb", False),
+    ("tokenize_cpu_seconds", False),
+    ("chunk_cpu_seconds", False),
+    ("prompt_tokens", False),
+    ("prompts", False),
+)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parents[1],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss jest w KB na Linuksie i w bajtach na macOS.
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stage_cpu(stages: list[dict[str, Any]], name: str) -> float:
+    return sum(row["cpu_seconds_total"] for row in stages if row["stage"] == name)
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    miniflux = FakeMiniflux(
+        args.entries,
+        UpstreamProfile(
+            latency=args.miniflux_latency,
+            jitter=args.miniflux_latency * args.jitter,
+            error_rate=args.fetch_content_error_rate,
+            # 500 z fetch-content nie jest ponawiany, wiec wpis od razu idzie do Jiny.
+            error_status=500,
+            payload_kb=args.payload_kb,
+            payload_spread=args.payload_spread,
+        ),
+        list_latency=args.list_latency,
+        seed=args.seed,
+        duplicate_rate=args.duplicate_rate,
+    )
+    jina = FakeJina(
+        UpstreamProfile(
+            latency=args.jina_latency,
+            jitter=args.jina_latency * args.jitter,
+            error_rate=args.jina_error_rate,
+            error_status=503,
+            payload_kb=args.payload_kb,
+            payload_spread=args.payload_spread,
+        ),
+        seed=args.seed + 1,
+    )
+    with miniflux, jina, tempfile.TemporaryDirectory() as tmpdir:
+        report_path = Path(tmpdir) / "metrics.json"
+        environ = {
+            "MINIFLUX_API_TOKEN": "benchmark",
+            "MINIFLUX_BASE_URL": miniflux.url,
+            "JINA_READER_URL": jina.url,
+        }
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            options = RunOptions(
+                env_path=Path(tmpdir) / ".env",
+                interactive=False,
+                max_tokens=args.max_tokens,
+                tokenizer=args.tokenizer,
+                workers=args.workers,
+                async_mode=args.async_mode,
+                extract_processes=args.extract_processes,
+                dedup=not args.no_dedup,
+                packing=args.packing,
+                group_by=args.group_by,
+                metrics_path=report_path,
+            )
+            summary = run(options, environ=environ)
+        wall_seconds = time.perf_counter() - started
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+
+    # Latencja wpisu to suma prob wszystkich zrodel tresci (z fallbackiem).
+    per_entry: dict[int, float] = {}
+    for span in report["spans"]:
+        if span["stage"] == "article" and span["entry_id"] is not None:
+            per_entry[span["entry_id"]] = (
+                per_entry.get(span["entry_id"], 0.0) + span["duration"]
+            )
+    latencies = list(per_entry.values())
+    stages = report["stages"]
+    success = report["summary"].get("success", 0)
+    duplicates = report["summary"].get("duplicates", 0)
+    tokens = re.search(r"Tokens: (\d+)", summary)
+    prompts = re.search(r"Prompts: (\d+)", summary)
+    return {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in {"output", "compare"}
+        },
+        "results": {
+            "summary": summary,
+            "entries": report["summary"].get("unread", 0),
+            "success": success,
+            "duplicates": duplicates,
+            "prompt_tokens": int(tokens.group(1)) if tokens else 0,
+            "prompts": int(prompts.group(1)) if prompts else int(bool(tokens)),
+            "wall_seconds": wall_seconds,
+            "entries_per_sec": (
+                (success + duplicates) / wall_seconds if wall_seconds else 0.0
+            ),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+            "peak_rss_children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "tokenize_cpu_seconds": stage_cpu(stages, "tokenize"),
+            "chunk_cpu_seconds": stage_cpu(stages, "chunk"),
+        },
+        "upstreams": {
+            "miniflux_fetch_content": {
+                "requests": miniflux.stats.requests,
+                "errors": miniflux.stats.errors,
+                "marked_read": len(miniflux.stats.marked),
+            },
+            "jina": {"requests": jina.stats.requests, "errors": jina.stats.errors},
+        },
+        "stages": stages,
+    }
+
+
+def print_result(result: dict[str, Any]) -> None:
+    results = result["results"]
+    upstreams = result["upstreams"]
+    print(results["summary"])
+    print(
+        f"wall: {results['wall_seconds']:.2f}s "
+        f"entries/s: {results['entries_per_sec']:.1f}"
+    )
+    print(
+        f"latencja wpisu p50: {results['latency_p50'] * 1000:.0f} ms "
+        f"p95: {results['latency_p95'] * 1000:.0f} ms"
+    )
+    print(
+        f"peak RSS: {results['peak_rss_mb']:.1f} MB "
+        f"(procesy potomne: {results['peak_rss_children_mb']:.1f} MB)"
+    )
+    print(
+        f"CPU tokenizacja: {results['tokenize_cpu_seconds']:.3f}s "
+        f"chunkowanie: {results['chunk_cpu_seconds']:.3f}s"
+    )
+    print(
+        f"tokeny promptow: {results['prompt_tokens']} "
+        f"w {results['prompts']} promptach (duplikaty: {results['duplicates']})"
+    )
+    print(f"upstreamy: {json.dumps(upstreams)}")
+
+
+def print_comparison(result: dict[str, Any], baseline: dict[str, Any]) -> None:
+    current = result["results"]
+    previous = baseline["results"]
+    print(f"porownanie z {baseline.get('commit') or 'baseline'}:")
+    for key, higher_is_better in COMPARED:
+        old = float(previous.get(key, 0.0))
+        new = float(current[key])
+        change = (new - old) / old * 100 if old else 0.0
+        better = change >= 0 if higher_is_better else change <= 0
+        marker = "" if abs(change) < 5 else (" (lepiej)" if better else " (gorzej)")
+        print(f"  {key}: {old:.3f} -> {new:.3f} ({change:+.1f}%){marker}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--async", action="store_true", dest="async_mode")
+    parser.add_argument("--extract-processes", type=int, default=None)
+    parser.add_argument(
+        "--tokenizer", choices=sorted(TOKENIZER_OPTIONS), default="auto"
+    )
+    parser.add_argument("--max-tokens", type=int, default=MAX_PROMPT_TOKENS)
+    parser.add_argument("--payload-kb", type=int, default=20)
+    parser.add_argument(
+        "--payload-spread",
+        type=float,
+        default=0.0,
+        help="Rozrzut rozmiaru tresci wpisu jako ulamek --payload-kb (0-1).",
+    )
+    parser.add_argument("--list-latency", type=float, default=0.01)
+    parser.add_argument("--miniflux-latency", type=float, default=0.05)
+    parser.add_argument("--jina-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.5,
+        help="Losowy dodatek do opoznienia jako ulamek opoznienia bazowego.",
+    )
+    parser.add_argument("--fetch-content-error-rate", type=float, default=0.1)
+    parser.add_argument("--jina-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.0,
+        help="Odsetek wpisow powtarzajacych historie wczesniejszego wpisu.",
+    )
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--packing", choices=PACKING_OPTIONS, default="greedy")
+    parser.add_argument("--group-by", choices=GROUP_BY_OPTIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Zapisz wynik jako JSON.")
+    parser.add_argument("--compare", type=Path, help="Poprzedni wynik JSON.")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    result = run_benchmark(args)
+    print_result(result)
+    if args.compare:
+        print_comparison(result, json.loads(args.compare.read_text(encoding="utf-8")))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(
+            json.dumps(result, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"zapisano: {args.output}")
+    # Duplikaty nie trafiaja do promptu, ale tez sa oznaczane jako read.
+    handled = result["results"]["success"] + result["results"]["duplicates"]
+    marked = result["upstreams"]["miniflux_fetch_content"]["marked_read"]
+    if marked != handled:
+        print(f"BLAD: oznaczono {marked} wpisow, a przetworzono {handled}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
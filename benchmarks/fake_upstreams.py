@@ -0,0 +1,279 @@
+"""Lokalne zastepniki Miniflux API i czytnika Jina dla benchmarkow.
+
+Serwery dzialaja w watkach (`ThreadingHTTPServer`) na losowym porcie
+127.0.0.1 i odtwarzaja tylko te endpointy, z ktorych korzysta `run()`:
+lista unread, `fetch-content`, oznaczanie read i `GET /<url>` Jiny.
+"""
+
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = (
+    "miniflux rss artykul dane liczba wzrost rynek model analiza raport "
+    "the of and to in for with on news market growth report data"
+).split()
+
+
+@dataclass
+class UpstreamProfile:
+    """Opoznienie (stale + losowy jitter), odsetek bledow i rozmiar tresci."""
+
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    error_status: int = 503
+    payload_kb: int = 20
+    # Rozrzut rozmiaru tresci: kazdy wpis ma payload_kb * (1 +- payload_spread).
+    payload_spread: float = 0.0
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency + rng.random() * self.jitter
+
+
+@dataclass
+class UpstreamStats:
+    requests: int = 0
+    errors: int = 0
+    marked: set[int] = field(default_factory=set)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count(self, error: bool) -> None:
+        with self.lock:
+            self.requests += 1
+            self.errors += 1 if error else 0
+
+
+def make_paragraphs(
+    rng: random.Random, payload_kb: int, spread: float = 0.0
+) -> list[str]:
+    paragraphs: list[str] = []
+    size = 0
+    target = payload_kb * 1024 * (1 + spread * (2 * rng.random() - 1))
+    while size < target:
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+        paragraphs.append(paragraph.capitalize() + ".")
+        size += len(paragraph) + 2
+    return paragraphs
+
+
+class FakeServer:
+    """Bazowy serwer w watku tla; `url` jest znany po `start()`."""
+
+    def __init__(self, profile: UpstreamProfile, seed: int = 0) -> None:
+        self.profile = profile
+        self.stats = UpstreamStats()
+        self._seed = seed
+        self._rng_lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Serwer nie jest uruchomiony.")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def paragraphs(self, key: int) -> list[str]:
+        # Tresc deterministyczna per wpis, zeby przebiegi byly porownywalne.
+        rng = random.Random(self._seed * 1_000_003 + key)
+        return make_paragraphs(
+            rng, self.profile.payload_kb, self.profile.payload_spread
+        )
+
+    def simulate(self) -> bool:
+        """Czeka opoznienie upstreamu i zwraca True, gdy zapytanie ma sie nie udac."""
+        with self._rng_lock:
+            delay = self.profile.delay(self._rng)
+            failed = self._rng.random() < self.profile.error_rate
+        time.sleep(delay)
+        self.stats.count(failed)
+        return failed
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        raise NotImplementedError
+
+    def start(self) -> "FakeServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802
+                server.handle(self)
+
+            do_PUT = do_POST = do_GET  # noqa: N815
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                return
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.stop()
+
+
+def send(
+    handler: BaseHTTPRequestHandler,
+    status: int,
+    body: bytes = b"",
+    content_type: str = "application/json",
+) -> None:
+    handler.send_response(status)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def read_body(handler: BaseHTTPRequestHandler) -> dict[str, object]:
+    length = int(handler.headers.get("Content-Length") or 0)
+    if not length:
+        return {}
+    payload = json.loads(handler.rfile.read(length))
+    return payload if isinstance(payload, dict) else {}
+
+
+class FakeMiniflux(FakeServer):
+    """`/v1/entries` (unread, stronicowanie po `after_entry_id`), `fetch-content`
+    i oznaczanie read. `profile` dotyczy `fetch-content`; lista i oznaczanie
+    odpowiadaja z opoznieniem `list_latency`.
+    """
+
+    def __init__(
+        self,
+        entries: int,
+        profile: UpstreamProfile,
+        list_latency: float = 0.01,
+        seed: int = 0,
+        duplicate_rate: float = 0.0,
+    ) -> None:
+        super().__init__(profile, seed)
+        self.entries = entries
+        self.list_latency = list_latency
+        self.duplicate_rate = duplicate_rate
+
+    def story(self, entry_id: int) -> int:
+        """ID historii wpisu; duplikat powtarza historie wczesniejszego wpisu."""
+        rng = random.Random(self._seed * 7_919 + entry_id)
+        if entry_id > 1 and rng.random() < self.duplicate_rate:
+            return rng.randint(1, entry_id - 1)
+        return entry_id
+
+    def entry(self, entry_id: int) -> dict[str, object]:
+        story = self.story(entry_id)
+        url = f"https://news{story % 7}.example.com/artykul/{story}"
+        if story != entry_id:
+            # Ta sama historia z innego kanalu: co drugi raz ten sam URL z
+            # parametrami sledzacymi, a co drugi raz depesza pod innym adresem.
+            url = (
+                f"{url}?utm_source=feed{entry_id % 5}&utm_medium=rss"
+                if entry_id % 2
+                else f"https://wire{entry_id % 5}.example.com/{entry_id}/{story}"
+            )
+        return {
+            "id": entry_id,
+            "title": f"Artykul {entry_id}",
+            "url": url,
+            "feed": {
+                "title": f"Kanal {entry_id % 5}",
+                "category": {"title": f"Kategoria {entry_id % 2}"},
+            },
+            "content": "<p>Skrot wpisu z kanalu RSS.</p>",
+            "status": "unread",
+        }
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        parts = urlsplit(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        segments = [segment for segment in parts.path.split("/") if segment]
+        if handler.command == "GET" and segments == ["v1", "entries"]:
+            time.sleep(self.list_latency)
+            self.list_entries(handler, query)
+        elif (
+            handler.command == "GET"
+            and len(segments) == 4
+            and segments[:2] == ["v1", "entries"]
+            and segments[3] == "fetch-content"
+        ):
+            self.fetch_content(handler, int(segments[2]))
+        elif handler.command == "PUT" and segments == ["v1", "entries"]:
+            time.sleep(self.list_latency)
+            self.mark_read(handler)
+        else:
+            send(handler, 404, b'{"error_message":"not found"}')
+
+    def list_entries(
+        self, handler: BaseHTTPRequestHandler, query: dict[str, str]
+    ) -> None:
+        limit = int(query.get("limit", 100))
+        after = int(query.get("after_entry_id", 0))
+        with self.stats.lock:
+            marked = set(self.stats.marked)
+        ids = [
+            entry_id
+            for entry_id in range(after + 1, self.entries + 1)
+            if entry_id not in marked
+        ][:limit]
+        body = {"total": self.entries, "entries": [self.entry(i) for i in ids]}
+        send(handler, 200, json.dumps(body).encode("utf-8"))
+
+    def fetch_content(self, handler: BaseHTTPRequestHandler, entry_id: int) -> None:
+        if self.simulate():
+            send(handler, self.profile.error_status, b'{"error_message":"upstream"}')
+            return
+        story = self.story(entry_id)
+        html = "".join(f"<p>{text}</p>\n" for text in self.paragraphs(story))
+        body = {"content": f"<article><h1>Artykul {entry_id}</h1>\n{html}</article>"}
+        send(handler, 200, json.dumps(body).encode("utf-8"))
+
+    def mark_read(self, handler: BaseHTTPRequestHandler) -> None:
+        payload = read_body(handler)
+        # Jak w Miniflux: status musi byc w tresci zapytania, wiec pierwszy
+        # wariant klienta (`?status=read`) dostaje 400 i przechodzi na kolejny.
+        if payload.get("status") != "read":
+            send(handler, 400, b'{"error_message":"invalid status"}')
+            return
+        entry_ids = payload.get("entry_ids") or []
+        with self.stats.lock:
+            self.stats.marked.update(int(entry_id) for entry_id in entry_ids)
+        send(handler, 204)
+
+
+class FakeJina(FakeServer):
+    """`GET /<url>` zwraca markdown artykulu o rozmiarze `payload_kb`."""
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        if self.simulate():
+            send(handler, self.profile.error_status, b"upstream error", "text/plain")
+            return
+        target = handler.path.lstrip("/")
+        # Tresc zalezy od historii (ostatni segment sciezki), wiec ta sama
+        # depesza pod roznymi adresami daje te sama tresc.
+        last = urlsplit(target).path.rstrip("/").rsplit("/", 1)[-1]
+        key = int(last) if last.isdigit() else sum(target.encode("utf-8"))
+        text = f"Title: {target}\n\nMarkdown Content:\n" + "\n\n".join(
+            self.paragraphs(key)
+        )
+        send(handler, 200, text.encode("utf-8"), "text/plain; charset=utf-8")
@@ -1,26 +1,44 @@
 from miniflux_prompt_compiler.adapters.clipboard import copy_to_clipboard
+from miniflux_prompt_compiler.adapters.http_client import create_session
 from miniflux_prompt_compiler.adapters.jina import (
     fetch_article_markdown,
     fetch_article_with_fallback,
 )
 from miniflux_prompt_compiler.adapters.miniflux_http import (
+    BatchReadMarker,
     fetch_unread_entries,
+    iter_unread_entries,
+    mark_entries_read,
     mark_entry_read,
 )
 from miniflux_prompt_compiler.adapters.playwright_fetch import (
+    PlaywrightBrowserPool,
     fetch_article_with_playwright,
 )
+from miniflux_prompt_compiler.adapters.retry import RetryBudget, RetryPolicy
+from miniflux_prompt_compiler.adapters.run_journal import RunJournal
+from miniflux_prompt_compiler.adapters.source_routing import SourceRouter
 from miniflux_prompt_compiler.adapters.youtube import fetch_youtube_transcript
 from miniflux_prompt_compiler.app import process_entry, run
+from miniflux_prompt_compiler.async_app import run_async
 from miniflux_prompt_compiler.cli import main, parse_args
+from miniflux_prompt_compiler.concurrency import HostRateLimiter
 from miniflux_prompt_compiler.config import load_env
-from miniflux_prompt_compiler.core.chunking import build_prompts_with_chunking
+from miniflux_prompt_compiler.core.chunking import (
+    PromptChunker,
+    build_prompts_with_chunking,
+    count_prompt_tokens,
+)
+from miniflux_prompt_compiler.core.compression import ContentCompressor
+from miniflux_prompt_compiler.core.dedup import Deduplicator, canonical_url
 from miniflux_prompt_compiler.core.prompting import PROMPT, build_prompt
 from miniflux_prompt_compiler.core.tokenization import (
     MAX_PROMPT_TOKENS,
     TOKEN_LABELS,
     TOKENIZER_OPTIONS,
+    Tokenizer,
     count_tokens,
+    get_tokenizer,
     label_for_tokens,
 )
 from miniflux_prompt_compiler.core.url_classify import (
@@ -28,30 +46,52 @@ from miniflux_prompt_compiler.core.url_classify import (
     is_youtube_shorts,
     is_youtube_url,
 )
+from miniflux_prompt_compiler.metrics import RunMetrics
+from miniflux_prompt_compiler.options import RunOptions
 
 __all__ = [
+    "BatchReadMarker",
+    "ContentCompressor",
+    "Deduplicator",
+    "HostRateLimiter",
     "MAX_PROMPT_TOKENS",
     "PROMPT",
+    "PlaywrightBrowserPool",
+    "PromptChunker",
+    "RetryBudget",
+    "RetryPolicy",
+    "RunJournal",
+    "RunMetrics",
+    "RunOptions",
+    "SourceRouter",
     "TOKEN_LABELS",
     "TOKENIZER_OPTIONS",
+    "Tokenizer",
     "build_prompt",
     "build_prompts_with_chunking",
+    "canonical_url",
     "copy_to_clipboard",
+    "count_prompt_tokens",
     "count_tokens",
+    "create_session",
     "extract_youtube_id",
     "fetch_article_markdown",
     "fetch_article_with_fallback",
     "fetch_article_with_playwright",
     "fetch_unread_entries",
     "fetch_youtube_transcript",
+    "get_tokenizer",
     "is_youtube_shorts",
     "is_youtube_url",
+    "iter_unread_entries",
     "label_for_tokens",
     "load_env",
+    "mark_entries_read",
     "mark_entry_read",
     "parse_args",
     "process_entry",
     "run",
+    "run_async",
 ]
 
 
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from pathlib import Path
+
+CACHE_FILENAME = "content.sqlite3"
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ContentCache:
+    """Cache tresci w SQLite z TTL i eviction LRU po rozmiarze."""
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Decyzja: jedno polaczenie chronione lockiem, bo z cache korzystaja watki
+        # z puli `--workers`.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS content ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS content_accessed_at ON content (accessed_at)"
+        )
+        self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def in_dir(cls, cache_dir: Path) -> "ContentCache":
+        return cls(cache_dir / CACHE_FILENAME)
+
+    def get(self, namespace: str, key: str) -> str | None:
+        now = self._clock()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM content"
+                " WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._connection.execute(
+                    "DELETE FROM content WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+                self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE content SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+            self._connection.commit()
+            self.hits += 1
+            return value
+
+    def put(self, namespace: str, key: str, value: str) -> None:
+        now = self._clock()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO content"
+                " (namespace, key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, size, now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now: float) -> None:
+        self._connection.execute(
+            "DELETE FROM content WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM content"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute(
+            "SELECT namespace, key, size FROM content ORDER BY accessed_at ASC"
+        ).fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._connection.execute(
+                "DELETE FROM content WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            total -= size
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+        logging.info("Cache: %s trafien, %s chybien", self.hits, self.misses)
+
+    def __enter__(self) -> "ContentCache":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
+
+
+def cached_article_fetcher(
+    cache: ContentCache,
+    fetcher: Callable[[int | None, str], str | tuple[str, str]],
+) -> Callable[[int | None, str], str | tuple[str, str]]:
+    def fetch(entry_id: int | None, url: str) -> str | tuple[str, str]:
+        key = f"{entry_id}|{url}"
+        cached = cache.get("article", key)
+        if cached is not None:
+            content, source = json.loads(cached)
+            logging.info("Cache: artykul z cache (%s)", source or "unknown")
+            return content if source is None else (content, source)
+        result = fetcher(entry_id, url)
+        if isinstance(result, tuple):
+            cache.put("article", key, json.dumps(list(result)))
+        else:
+            cache.put("article", key, json.dumps([result, None]))
+        return result
+
+    return fetch
+
+
+def cached_article_fetcher_async(
+    cache: ContentCache,
+    fetcher: Callable[[int | None, str], Awaitable[str | tuple[str, str]]],
+) -> Callable[[int | None, str], Awaitable[str | tuple[str, str]]]:
+    async def fetch(entry_id: int | None, url: str) -> str | tuple[str, str]:
+        key = f"{entry_id}|{url}"
+        cached = cache.get("article", key)
+        if cached is not None:
+            content, source = json.loads(cached)
+            logging.info("Cache: artykul z cache (%s)", source or "unknown")
+            return content if source is None else (content, source)
+        result = await fetcher(entry_id, url)
+        if isinstance(result, tuple):
+            cache.put("article", key, json.dumps(list(result)))
+        else:
+            cache.put("article", key, json.dumps([result, None]))
+        return result
+
+    return fetch
+
+
+def cached_youtube_fetcher(
+    cache: ContentCache, fetcher: Callable[[str], str]
+) -> Callable[[str], str]:
+    def fetch(video_id: str) -> str:
+        cached = cache.get("youtube", video_id)
+        if cached is not None:
+            logging.info("Cache: transkrypcja z cache")
+            return cached
+        content = fetcher(video_id)
+        cache.put("youtube", video_id, content)
+        return content
+
+    return fetch
+
+
+def _markdown_key(title: str, html: str, url: str | None, rules_key: str) -> str:
+    # Decyzja: URL i odcisk regul noise w kluczu, bo reguly per domena
+    # zmieniaja wynik dla tego samego HTML.
+    raw = f"{title}\0{html}\0{url or ''}\0{rules_key}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cached_markdown_converter(
+    cache: ContentCache, converter: Callable[..., str], rules_key: str = ""
+) -> Callable[..., str]:
+    def convert(title: str, html: str, url: str | None = None) -> str:
+        digest = _markdown_key(title, html, url, rules_key)
+        cached = cache.get("markdown", digest)
+        if cached is not None:
+            return cached
+        content = converter(title=title, html=html, url=url)
+        cache.put("markdown", digest, content)
+        return content
+
+    return convert
+
+
+def cached_markdown_submitter(
+    cache: ContentCache,
+    submit: Callable[[str, str, str | None], "Future[str]"],
+    rules_key: str = "",
+) -> Callable[[str, str, str | None], "Future[str]"]:
+    def submit_cached(title: str, html: str, url: str | None = None) -> "Future[str]":
+        digest = _markdown_key(title, html, url, rules_key)
+        cached = cache.get("markdown", digest)
+        if cached is not None:
+            future: Future[str] = Future()
+            future.set_result(cached)
+            return future
+
+        def store(done: "Future[str]") -> None:
+            if not done.cancelled() and done.exception() is None:
+                cache.put("markdown", digest, done.result())
+
+        future = submit(title, html, url)
+        future.add_done_callback(store)
+        return future
+
+    return submit_cached
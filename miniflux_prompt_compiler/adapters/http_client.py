@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from functools import cache
+from typing import TYPE_CHECKING
+
+from miniflux_prompt_compiler.concurrency import HostRateLimiter
+
+# Decyzja: requests i httpx sa importowane w funkcjach tworzacych klientow,
+# zeby start CLI (i `--links` bez `--async`) nie ladowal nieuzywanej biblioteki.
+if TYPE_CHECKING:
+    import httpx
+    import requests
+    from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = 10
+HTTP_POOL_HOSTS = 10
+
+
+@cache
+def rate_limited_adapter() -> type[HTTPAdapter]:
+    """Klasa adaptera requests, ktory przed wyslaniem zapytania czeka na token
+    hosta; tworzona przy pierwszej sesji.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class RateLimitedAdapter(HTTPAdapter):
+        def __init__(
+            self, rate_limiter: HostRateLimiter | None = None, **kwargs: object
+        ) -> None:
+            self.rate_limiter = rate_limiter
+            super().__init__(**kwargs)  # type: ignore[arg-type]
+
+        def send(  # type: ignore[override]
+            self, request: requests.PreparedRequest, **kwargs: object
+        ) -> requests.Response:
+            if self.rate_limiter is not None and request.url:
+                self.rate_limiter.acquire(request.url)
+            return super().send(request, **kwargs)  # type: ignore[arg-type]
+
+    return RateLimitedAdapter
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    pool_hosts: int = HTTP_POOL_HOSTS,
+    rate_limiter: HostRateLimiter | None = None,
+) -> requests.Session:
+    """Sesja HTTP z pulami polaczen keep-alive per host.
+
+    `pool_size` to liczba polaczen utrzymywanych do jednego hosta (powinna byc
+    co najmniej rowna liczbie watkow `--workers`), a `pool_hosts` to liczba
+    hostow, dla ktorych pule sa trzymane jednoczesnie. `rate_limiter` dotyczy
+    kazdego zapytania sesji, takze ponowien i zapytan bibliotek zewnetrznych.
+    """
+    import requests
+    from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+    session = requests.Session()
+    # Decyzja: bez automatycznych retry w urllib3; ponowienia sa po stronie
+    # adapterow, ktore wiedza, ktore bledy maja sens.
+    adapter = rate_limited_adapter()(
+        rate_limiter,
+        pool_connections=max(1, pool_hosts),
+        pool_maxsize=max(1, pool_size),
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Decyzja: `br`/`zstd` sa ogloszone tylko, gdy urllib3 ma dekoder
+    # (pakiet `brotli`/`zstandard`), wiec serwer nie dostanie obietnicy bez pokrycia.
+    session.headers["Accept-Encoding"] = DEFAULT_ACCEPT_ENCODING
+    return session
+
+
+@cache
+def default_session() -> requests.Session:
+    """Wspoldzielona sesja dla wywolan adapterow bez wstrzyknietej sesji."""
+    return create_session()
+
+
+def create_async_client(
+    pool_size: int = HTTP_POOL_SIZE,
+    pool_hosts: int = HTTP_POOL_HOSTS,
+    rate_limiter: HostRateLimiter | None = None,
+) -> httpx.AsyncClient:
+    """Klient HTTP dla trybu asyncio z pula keep-alive.
+
+    httpx nie ma limitu polaczen per host, wiec pula globalna to
+    `pool_size * pool_hosts`; rownoleglosc per upstream ogranicza
+    `UpstreamLimiter`. Naglowek `Accept-Encoding` ustawia httpx wedlug
+    dostepnych dekoderow.
+    """
+    import httpx
+
+    total = max(1, pool_size) * max(1, pool_hosts)
+    hooks = []
+    if rate_limiter is not None:
+
+        async def wait_for_token(request: httpx.Request) -> None:
+            await rate_limiter.acquire_async(str(request.url))
+
+        hooks.append(wait_for_token)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=total, max_keepalive_connections=total),
+        follow_redirects=True,
+        event_hooks={"request": hooks},
+    )
@@ -1,49 +1,64 @@
+from __future__ import annotations
+
 import logging
-import time
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
+from miniflux_prompt_compiler.adapters.http_client import default_session
+from miniflux_prompt_compiler.adapters.retry import DEFAULT_RETRY_POLICY, RetryPolicy
+from miniflux_prompt_compiler.types import ContentFetchError, TransientFetchError
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
 
-import requests
+JINA_READER_URL = "https://r.jina.ai/"
 
-from miniflux_prompt_compiler.types import ContentFetchError
 
+def fetch_article_markdown(
+    url: str,
+    timeout: int = 15,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+    reader_url: str = JINA_READER_URL,
+) -> str:
+    import requests
 
-def fetch_article_markdown(url: str, timeout: int = 15, retries: int = 3) -> str:
     logging.info("Jina: start")
-    request_url = f"https://r.jina.ai/{url}"
-    last_error: Exception | None = None
-    for attempt in range(1, retries + 1):
-        try:
-            response = requests.get(request_url, timeout=timeout)
-            response.raise_for_status()
-            content = response.text
-        except requests.RequestException as exc:
-            last_error = exc
-            if attempt < retries:
-                time.sleep(1)
-                continue
-            raise ContentFetchError(
-                f"Nie udalo sie pobrac tresci artykulu: {exc}"
-            ) from exc
-
-        # Decyzja: pusta tresc traktujemy jako porazke, bo nie ma czego uzyc dalej.
-        if content.strip():
-            return content
-        last_error = ContentFetchError("Pusta tresc z jina.ai")
-        if attempt < retries:
-            time.sleep(1)
-            continue
-        break
-
-    raise ContentFetchError(f"Nie udalo sie pobrac tresci artykulu: {last_error}")
+    session = session or default_session()
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    request_url = f"{reader_url.rstrip('/')}/{url}"
+
+    def attempt() -> str:
+        response = session.get(request_url, timeout=timeout)
+        response.raise_for_status()
+        return _non_empty(response.text)
+
+    try:
+        return retry_policy.call(attempt, "jina")
+    except (requests.RequestException, ContentFetchError) as exc:
+        raise ContentFetchError(
+            f"Nie udalo sie pobrac tresci artykulu: {exc}"
+        ) from exc
+
+
+def _non_empty(content: str) -> str:
+    # Decyzja: pusta tresc traktujemy jako porazke, bo nie ma czego uzyc dalej,
+    # ale ponawiamy ja, bo r.jina.ai zwraca ja tez przy chwilowym przeciazeniu.
+    if not content.strip():
+        raise TransientFetchError("Pusta tresc z jina.ai")
+    return content
 
 
 def fetch_article_with_fallback(
     url: str,
     use_playwright: bool,
     fallback_fetcher: Callable[[str], str] | None = None,
+    primary_fetcher: Callable[[str], str] | None = None,
 ) -> str:
+    primary_fetcher = primary_fetcher or fetch_article_markdown
     try:
-        content = fetch_article_markdown(url)
+        content = primary_fetcher(url)
         logging.info("Content source selected: jina")
         return content
     except ContentFetchError as exc:
@@ -53,3 +68,48 @@ def fetch_article_with_fallback(
         content = fallback_fetcher(url)
         logging.info("Content source selected: playwright")
         return content
+
+
+async def fetch_article_markdown_async(
+    client: httpx.AsyncClient,
+    url: str,
+    timeout: int = 15,
+    retry_policy: RetryPolicy | None = None,
+    reader_url: str = JINA_READER_URL,
+) -> str:
+    import httpx
+
+    logging.info("Jina: start")
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    request_url = f"{reader_url.rstrip('/')}/{url}"
+
+    async def attempt() -> str:
+        response = await client.get(request_url, timeout=timeout)
+        response.raise_for_status()
+        return _non_empty(response.text)
+
+    try:
+        return await retry_policy.call_async(attempt, "jina")
+    except (httpx.HTTPError, ContentFetchError) as exc:
+        raise ContentFetchError(
+            f"Nie udalo sie pobrac tresci artykulu: {exc}"
+        ) from exc
+
+
+async def fetch_article_with_fallback_async(
+    url: str,
+    use_playwright: bool,
+    primary_fetcher: Callable[[str], Awaitable[str]],
+    fallback_fetcher: Callable[[str], Awaitable[str]] | None = None,
+) -> str:
+    try:
+        content = await primary_fetcher(url)
+        logging.info("Content source selected: jina")
+        return content
+    except ContentFetchError as exc:
+        logging.info("Jina: error (%s)", exc)
+        if not use_playwright or fallback_fetcher is None:
+            raise
+        content = await fallback_fetcher(url)
+        logging.info("Content source selected: playwright")
+        return content
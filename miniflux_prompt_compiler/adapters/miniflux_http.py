@@ -1,97 +1,608 @@
-import json
-import urllib.error
-import urllib.parse
-import urllib.request
+from __future__ import annotations
 
-from miniflux_prompt_compiler.types import ContentFetchError, MinifluxEntry, MinifluxError
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING
 
+from miniflux_prompt_compiler.adapters.http_client import default_session
+from miniflux_prompt_compiler.adapters.retry import (
+    DEFAULT_RETRY_POLICY,
+    FETCH_CONTENT_RETRYABLE_STATUSES,
+    RetryPolicy,
+)
+from miniflux_prompt_compiler.types import (
+    ContentFetchError,
+    MinifluxEntry,
+    MinifluxError,
+    MinifluxFeed,
+    PartialMarkReadError,
+)
 
-def fetch_unread_entries(
-    base_url: str, token: str, timeout: int = 10
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+UNREAD_PAGE_SIZE = 100
+ENTRY_FIELDS = ("id", "title", "url")
+
+
+def _slim_feed(feed: object) -> MinifluxFeed | None:
+    if not isinstance(feed, dict):
+        return None
+    category = feed.get("category")
+    return {
+        "title": feed.get("title"),
+        "category": (
+            {"title": category.get("title")} if isinstance(category, dict) else None
+        ),
+    }
+
+
+def _slim_entry(entry: dict[str, object]) -> MinifluxEntry:
+    # Decyzja: API Miniflux nie pozwala wybrac pol, wiec odrzucamy `content`
+    # i reszte payloadu od razu po sparsowaniu strony; z feedu zostaja tylko
+    # tytuly feedu i kategorii potrzebne do `--group-by`.
+    slim: dict[str, object] = {key: entry[key] for key in ENTRY_FIELDS if key in entry}
+    feed = _slim_feed(entry.get("feed"))
+    if feed is not None:
+        slim["feed"] = feed
+    return slim  # type: ignore[return-value]
+
+
+def fetch_unread_page(
+    base_url: str,
+    token: str,
+    limit: int = UNREAD_PAGE_SIZE,
+    after_entry_id: int | None = None,
+    timeout: int = 10,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
 ) -> list[MinifluxEntry]:
-    # Miniflux API endpoint przyjmujemy w najprostszym wariancie: /v1/entries?status=unread.
-    url = f"{base_url.rstrip('/')}/v1/entries?status=unread"
-    request = urllib.request.Request(url, headers={"X-Auth-Token": token})
+    import requests
+
+    session = session or default_session()
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+
+    def attempt() -> requests.Response:
+        response = session.get(
+            f"{base_url.rstrip('/')}/v1/entries",
+            params=_unread_params(limit, after_entry_id),
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return response
+
     try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            payload = json.load(response)
-    except (urllib.error.URLError, json.JSONDecodeError) as exc:
+        payload = retry_policy.call(attempt, "miniflux").json()
+    except (requests.RequestException, ValueError) as exc:
         raise MinifluxError(f"Nie udalo sie pobrac wpisow: {exc}") from exc
+    return _parse_unread_page(payload)
+
+
+def _unread_params(limit: int, after_entry_id: int | None) -> dict[str, str | int]:
+    params: dict[str, str | int] = {
+        "status": "unread",
+        "order": "id",
+        "direction": "asc",
+        "limit": limit,
+    }
+    if after_entry_id is not None:
+        params["after_entry_id"] = after_entry_id
+    return params
 
+
+def _parse_unread_page(payload: dict[str, object]) -> list[MinifluxEntry]:
     entries = payload.get("entries", [])
     if not isinstance(entries, list):
         raise MinifluxError(
             "Nieprawidlowy format odpowiedzi Miniflux (brak listy entries)."
         )
-    return entries
+    return [_slim_entry(entry) for entry in entries if isinstance(entry, dict)]
 
 
-def mark_entry_read(
-    base_url: str, token: str, entry_id: int, timeout: int = 10
-) -> None:
+def iter_unread_entries(
+    base_url: str,
+    token: str,
+    timeout: int = 10,
+    page_size: int = UNREAD_PAGE_SIZE,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> Iterator[MinifluxEntry]:
+    # Decyzja: stronicujemy kursorem `after_entry_id` (order=id), a nie `offset`,
+    # bo oznaczanie `read` w trakcie przebiegu przesuwa offsety listy unread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_page = executor.submit(
+            fetch_unread_page,
+            base_url,
+            token,
+            page_size,
+            None,
+            timeout,
+            session,
+            retry_policy,
+        )
+        while next_page is not None:
+            page = next_page.result()
+            next_page = None
+            if len(page) >= page_size:
+                cursor = _entry_cursor(page[-1])
+                if cursor is not None:
+                    next_page = executor.submit(
+                        fetch_unread_page,
+                        base_url,
+                        token,
+                        page_size,
+                        cursor,
+                        timeout,
+                        session,
+                        retry_policy,
+                    )
+            yield from page
+
+
+def _entry_cursor(entry: MinifluxEntry) -> int | None:
+    try:
+        return int(entry.get("id"))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_unread_entries(
+    base_url: str,
+    token: str,
+    timeout: int = 10,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> list[MinifluxEntry]:
+    return list(
+        iter_unread_entries(
+            base_url,
+            token,
+            timeout=timeout,
+            session=session,
+            retry_policy=retry_policy,
+        )
+    )
+
+
+async def fetch_unread_page_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    limit: int = UNREAD_PAGE_SIZE,
+    after_entry_id: int | None = None,
+    timeout: int = 10,
+    retry_policy: RetryPolicy | None = None,
+) -> list[MinifluxEntry]:
+    import httpx
+
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+
+    async def attempt() -> httpx.Response:
+        response = await client.get(
+            f"{base_url.rstrip('/')}/v1/entries",
+            params=_unread_params(limit, after_entry_id),
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return response
+
+    try:
+        payload = (await retry_policy.call_async(attempt, "miniflux")).json()
+    except (httpx.HTTPError, ValueError) as exc:
+        raise MinifluxError(f"Nie udalo sie pobrac wpisow: {exc}") from exc
+    return _parse_unread_page(payload)
+
+
+async def iter_unread_entries_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    timeout: int = 10,
+    page_size: int = UNREAD_PAGE_SIZE,
+    retry_policy: RetryPolicy | None = None,
+) -> AsyncIterator[MinifluxEntry]:
+    next_page: asyncio.Task[list[MinifluxEntry]] | None = asyncio.create_task(
+        fetch_unread_page_async(
+            client, base_url, token, page_size, None, timeout, retry_policy
+        )
+    )
+    try:
+        while next_page is not None:
+            page = await next_page
+            next_page = None
+            if len(page) >= page_size:
+                cursor = _entry_cursor(page[-1])
+                if cursor is not None:
+                    next_page = asyncio.create_task(
+                        fetch_unread_page_async(
+                            client,
+                            base_url,
+                            token,
+                            page_size,
+                            cursor,
+                            timeout,
+                            retry_policy,
+                        )
+                    )
+            for entry in page:
+                yield entry
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+
+async def fetch_unread_entries_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    timeout: int = 10,
+    retry_policy: RetryPolicy | None = None,
+) -> list[MinifluxEntry]:
+    return [
+        entry
+        async for entry in iter_unread_entries_async(
+            client, base_url, token, timeout=timeout, retry_policy=retry_policy
+        )
+    ]
+
+
+MARK_READ_BATCH_SIZE = 100
+# Indeks wariantu z osobnym zapytaniem na kazdy wpis (ostatni w kolejnosci).
+PER_ENTRY_VARIANT = 3
+
+
+def _mark_read_attempts(
+    base_url: str, entry_ids: list[int]
+) -> list[list[tuple[str, str, dict[str, object]]]]:
     # Decyzja: probujemy kilka wariantow API (PUT/POST i inny endpoint),
     # bo instalacje Miniflux moga roznic sie obsluga tej operacji.
-    attempts = [
-        (
-            "PUT",
-            f"{base_url.rstrip('/')}/v1/entries?status=read",
-            {"entry_ids": [entry_id]},
-        ),
-        (
-            "PUT",
-            f"{base_url.rstrip('/')}/v1/entries",
-            {"entry_ids": [entry_id], "status": "read"},
-        ),
-        (
-            "POST",
-            f"{base_url.rstrip('/')}/v1/entries?status=read",
-            {"entry_ids": [entry_id]},
-        ),
-        (
-            "PUT",
-            f"{base_url.rstrip('/')}/v1/entries/{entry_id}",
-            {"status": "read"},
-        ),
+    # Kazdy wariant to lista zapytan; ostatni wymaga jednego zapytania na wpis.
+    root = base_url.rstrip("/")
+    return [
+        [("PUT", f"{root}/v1/entries?status=read", {"entry_ids": entry_ids})],
+        [("PUT", f"{root}/v1/entries", {"entry_ids": entry_ids, "status": "read"})],
+        [("POST", f"{root}/v1/entries?status=read", {"entry_ids": entry_ids})],
+        [
+            ("PUT", f"{root}/v1/entries/{entry_id}", {"status": "read"})
+            for entry_id in entry_ids
+        ],
     ]
-    for index, (method, url, payload_dict) in enumerate(attempts):
-        payload = json.dumps(payload_dict).encode("utf-8")
-        request = urllib.request.Request(
+
+
+def _entry_gone(entry_id: int) -> None:
+    logging.info("Miniflux: wpis %s nie istnieje, pomijam oznaczanie read", entry_id)
+
+
+def _raise_failures(entry_ids: list[int], failures: dict[int, Exception]) -> None:
+    if not failures:
+        return
+    details = "; ".join(f"{entry_id}: {exc}" for entry_id, exc in failures.items())
+    raise PartialMarkReadError(
+        f"Nie udalo sie oznaczyc wpisow jako read ({details})",
+        [entry_id for entry_id in entry_ids if entry_id not in failures],
+    )
+
+
+def _variant_order(count: int, variant: int | None) -> list[int]:
+    order = list(range(count))
+    if variant is not None and variant in order:
+        order.remove(variant)
+        order.insert(0, variant)
+    return order
+
+
+def mark_entries_read(
+    base_url: str,
+    token: str,
+    entry_ids: list[int],
+    timeout: int = 10,
+    variant: int | None = None,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> int:
+    """Oznacza wpisy jako read i zwraca indeks wariantu API, ktory zadzialal."""
+    import requests
+
+    session = session or default_session()
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+
+    def send(method: str, url: str, payload: dict[str, object]) -> None:
+        response = session.request(
+            method,
+            url,
+            json=payload,
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+
+    def send_each(calls: list[tuple[str, str, dict[str, object]]]) -> None:
+        # Decyzja: w wariancie per wpis blad jednego wpisu nie cofa calej
+        # paczki - wpisy juz oznaczone zostaja, 404 (wpis usuniety) pomijamy.
+        failures: dict[int, Exception] = {}
+        for entry_id, (method, url, payload) in zip(entry_ids, calls):
+            try:
+                retry_policy.call(partial(send, method, url, payload), "miniflux")
+            except requests.HTTPError as exc:
+                if exc.response is not None and exc.response.status_code == 404:
+                    _entry_gone(entry_id)
+                    continue
+                failures[entry_id] = exc
+            except requests.RequestException as exc:
+                failures[entry_id] = exc
+        _raise_failures(entry_ids, failures)
+
+    attempts = _mark_read_attempts(base_url, entry_ids)
+    order = _variant_order(len(attempts), variant)
+    label = ", ".join(str(entry_id) for entry_id in entry_ids)
+    for position, index in enumerate(order):
+        if index == PER_ENTRY_VARIANT:
+            send_each(attempts[index])
+            return index
+        try:
+            for method, url, payload in attempts[index]:
+                retry_policy.call(partial(send, method, url, payload), "miniflux")
+            return index
+        except requests.HTTPError as exc:
+            status = exc.response.status_code if exc.response is not None else None
+            if status in {400, 404} and position < len(order) - 1:
+                continue
+            raise MinifluxError(
+                f"Nie udalo sie oznaczyc wpisu {label} jako read: {exc}"
+            ) from exc
+        except requests.RequestException as exc:
+            raise MinifluxError(
+                f"Nie udalo sie oznaczyc wpisu {label} jako read: {exc}"
+            ) from exc
+    raise MinifluxError(f"Nie udalo sie oznaczyc wpisu {label} jako read.")
+
+
+def mark_entry_read(
+    base_url: str,
+    token: str,
+    entry_id: int,
+    timeout: int = 10,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> None:
+    mark_entries_read(
+        base_url,
+        token,
+        [entry_id],
+        timeout=timeout,
+        session=session,
+        retry_policy=retry_policy,
+    )
+
+
+async def mark_entries_read_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    entry_ids: list[int],
+    timeout: int = 10,
+    variant: int | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> int:
+    """Asynchroniczny odpowiednik `mark_entries_read`."""
+    import httpx
+
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+
+    async def send(method: str, url: str, payload: dict[str, object]) -> None:
+        response = await client.request(
+            method,
             url,
-            data=payload,
-            method=method,
-            headers={"X-Auth-Token": token, "Content-Type": "application/json"},
+            json=payload,
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
         )
+        response.raise_for_status()
+
+    async def send_each(calls: list[tuple[str, str, dict[str, object]]]) -> None:
+        failures: dict[int, Exception] = {}
+        for entry_id, (method, url, payload) in zip(entry_ids, calls):
+            try:
+                await retry_policy.call_async(
+                    partial(send, method, url, payload), "miniflux"
+                )
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code == 404:
+                    _entry_gone(entry_id)
+                    continue
+                failures[entry_id] = exc
+            except httpx.HTTPError as exc:
+                failures[entry_id] = exc
+        _raise_failures(entry_ids, failures)
+
+    attempts = _mark_read_attempts(base_url, entry_ids)
+    order = _variant_order(len(attempts), variant)
+    label = ", ".join(str(entry_id) for entry_id in entry_ids)
+    for position, index in enumerate(order):
+        if index == PER_ENTRY_VARIANT:
+            await send_each(attempts[index])
+            return index
         try:
-            with urllib.request.urlopen(request, timeout=timeout):
-                return
-        except urllib.error.HTTPError as exc:
-            if exc.code in {400, 404} and index < len(attempts) - 1:
+            for method, url, payload in attempts[index]:
+                await retry_policy.call_async(
+                    partial(send, method, url, payload), "miniflux"
+                )
+            return index
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code in {400, 404} and position < len(order) - 1:
                 continue
             raise MinifluxError(
-                f"Nie udalo sie oznaczyc wpisu {entry_id} jako read: {exc}"
+                f"Nie udalo sie oznaczyc wpisu {label} jako read: {exc}"
             ) from exc
-        except urllib.error.URLError as exc:
+        except httpx.HTTPError as exc:
             raise MinifluxError(
-                f"Nie udalo sie oznaczyc wpisu {entry_id} jako read: {exc}"
+                f"Nie udalo sie oznaczyc wpisu {label} jako read: {exc}"
             ) from exc
+    raise MinifluxError(f"Nie udalo sie oznaczyc wpisu {label} jako read.")
+
+
+async def mark_entry_read_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    entry_id: int,
+    timeout: int = 10,
+    retry_policy: RetryPolicy | None = None,
+) -> None:
+    await mark_entries_read_async(
+        client, base_url, token, [entry_id], timeout, retry_policy=retry_policy
+    )
+
+
+class BatchReadMarker:
+    """Zbiera ID wpisow i oznacza je jako read paczkami po `batch_size`.
+
+    Wpisy, ktorych nie udalo sie oznaczyc w wariancie per wpis, sa logowane
+    i pomijane w wyniku `add`/`flush` (zostaja unread w Miniflux).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        batch_size: int = MARK_READ_BATCH_SIZE,
+        timeout: int = 10,
+        session: requests.Session | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self.base_url = base_url
+        self.token = token
+        self.session = session
+        self.retry_policy = retry_policy
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        # Wariant API wykryty przy pierwszej paczce i uzywany do konca przebiegu.
+        self.variant: int | None = None
+        self._pending: list[int] = []
+
+    def add(self, entry_id: int) -> list[int]:
+        self._pending.append(entry_id)
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self) -> list[int]:
+        marked: list[int] = []
+        while self._pending:
+            chunk = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            try:
+                self.variant = mark_entries_read(
+                    self.base_url,
+                    self.token,
+                    chunk,
+                    timeout=self.timeout,
+                    variant=self.variant,
+                    session=self.session,
+                    retry_policy=self.retry_policy,
+                )
+            except PartialMarkReadError as exc:
+                self.variant = PER_ENTRY_VARIANT
+                logging.info("Blad oznaczania read: %s", exc)
+                marked.extend(exc.marked)
+                continue
+            marked.extend(chunk)
+        return marked
+
+
+class AsyncBatchReadMarker:
+    """Asynchroniczny odpowiednik `BatchReadMarker`."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        token: str,
+        batch_size: int = MARK_READ_BATCH_SIZE,
+        timeout: int = 10,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self.client = client
+        self.retry_policy = retry_policy
+        self.base_url = base_url
+        self.token = token
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.variant: int | None = None
+        self._pending: list[int] = []
+
+    async def add(self, entry_id: int) -> list[int]:
+        self._pending.append(entry_id)
+        if len(self._pending) >= self.batch_size:
+            return await self.flush()
+        return []
+
+    async def flush(self) -> list[int]:
+        marked: list[int] = []
+        while self._pending:
+            chunk = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            try:
+                self.variant = await mark_entries_read_async(
+                    self.client,
+                    self.base_url,
+                    self.token,
+                    chunk,
+                    timeout=self.timeout,
+                    variant=self.variant,
+                    retry_policy=self.retry_policy,
+                )
+            except PartialMarkReadError as exc:
+                self.variant = PER_ENTRY_VARIANT
+                logging.info("Blad oznaczania read: %s", exc)
+                marked.extend(exc.marked)
+                continue
+            marked.extend(chunk)
+        return marked
 
 
 def fetch_entry_content(
-    base_url: str, token: str, entry_id: int, timeout: int = 10
+    base_url: str,
+    token: str,
+    entry_id: int,
+    timeout: int = 10,
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
 ) -> str:
-    query = urllib.parse.urlencode({"update_content": "true"})
-    url = (
-        f"{base_url.rstrip('/')}/v1/entries/{entry_id}/fetch-content?{query}"
-    )
-    request = urllib.request.Request(url, headers={"X-Auth-Token": token})
+    import requests
+
+    session = session or default_session()
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    url = f"{base_url.rstrip('/')}/v1/entries/{entry_id}/fetch-content"
+
+    def attempt() -> requests.Response:
+        response = session.get(
+            url,
+            params={"update_content": "true"},
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return response
+
     try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            payload = json.load(response)
-    except (urllib.error.URLError, json.JSONDecodeError) as exc:
+        payload = retry_policy.call(
+            attempt, "miniflux", FETCH_CONTENT_RETRYABLE_STATUSES
+        ).json()
+    except (requests.RequestException, ValueError) as exc:
         raise ContentFetchError(
             f"Nie udalo sie pobrac tresci z Miniflux fetch-content: {exc}"
         ) from exc
+    return _parse_entry_content(payload)
+
 
+def _parse_entry_content(payload: dict[str, object]) -> str:
     content = payload.get("content")
     if not isinstance(content, str):
         raise ContentFetchError(
@@ -100,3 +611,38 @@ def fetch_entry_content(
     if not content.strip():
         raise ContentFetchError("Pusta tresc z Miniflux fetch-content.")
     return content
+
+
+async def fetch_entry_content_async(
+    client: httpx.AsyncClient,
+    base_url: str,
+    token: str,
+    entry_id: int,
+    timeout: int = 10,
+    retry_policy: RetryPolicy | None = None,
+) -> str:
+    import httpx
+
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    url = f"{base_url.rstrip('/')}/v1/entries/{entry_id}/fetch-content"
+
+    async def attempt() -> httpx.Response:
+        response = await client.get(
+            url,
+            params={"update_content": "true"},
+            headers={"X-Auth-Token": token},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return response
+
+    try:
+        response = await retry_policy.call_async(
+            attempt, "miniflux", FETCH_CONTENT_RETRYABLE_STATUSES
+        )
+        payload = response.json()
+    except (httpx.HTTPError, ValueError) as exc:
+        raise ContentFetchError(
+            f"Nie udalo sie pobrac tresci z Miniflux fetch-content: {exc}"
+        ) from exc
+    return _parse_entry_content(payload)
@@ -1,51 +1,221 @@
+import asyncio
 import logging
 import re
+import threading
+from collections.abc import Callable
+from typing import Any
 
 from miniflux_prompt_compiler.types import ContentFetchError
 
+PLAYWRIGHT_MAX_PAGES = 2
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+CONSENT_PATTERN = re.compile(
+    r"^(accept|agree|accept all|i agree|zgadzam sie|akceptuj)$",
+    re.IGNORECASE,
+)
 
-def fetch_article_with_playwright(url: str, timeout: int = 20) -> str:
+
+def _default_playwright_factory() -> Any:
     try:
-        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
-        from playwright.sync_api import sync_playwright
+        from playwright.async_api import async_playwright
     except ImportError as exc:
         raise ContentFetchError("Brak zaleznosci playwright w srodowisku.") from exc
+    return async_playwright()
 
-    try:
-        with sync_playwright() as playwright:
-            browser = playwright.chromium.launch(headless=True)
-            page = browser.new_page()
-            try:
-                logging.info("Playwright: start %s", url)
-                page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
-            except PlaywrightTimeoutError as exc:
-                logging.info("Playwright: failed (timeout)")
-                raise ContentFetchError(f"Playwright timeout: {exc}") from exc
-
-            consent_pattern = re.compile(
-                r"^(accept|agree|accept all|i agree|zgadzam sie|akceptuj)$",
-                re.IGNORECASE,
+
+class PlaywrightBrowserPool:
+    """Jedna przegladarka Chromium na przebieg i pula stron z limitem.
+
+    Playwright dziala w osobnym watku z wlasna petla asyncio, bo obiekty
+    Playwrighta sa przywiazane do watku, a fallback jest wolany z puli
+    `--workers`. Przegladarka startuje leniwie przy pierwszym fallbacku.
+    """
+
+    def __init__(
+        self,
+        max_pages: int = PLAYWRIGHT_MAX_PAGES,
+        timeout: int = 20,
+        playwright_factory: Callable[[], Any] | None = None,
+    ) -> None:
+        self.max_pages = max(1, max_pages)
+        self.timeout = timeout
+        self.launches = 0
+        self._playwright_factory = playwright_factory or _default_playwright_factory
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._start_error: ContentFetchError | None = None
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._context: Any = None
+        self._idle_pages: list[Any] = []
+        self._slots = asyncio.Semaphore(self.max_pages)
+
+    def fetch(self, url: str, timeout: int | None = None) -> str:
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(
+            self._fetch(url, timeout or self.timeout), loop
+        )
+        return future.result()
+
+    async def fetch_async(self, url: str, timeout: int | None = None) -> str:
+        # Decyzja: przegladarka zostaje w swojej petli; start (blokujacy) idzie
+        # przez to_thread, a strona jest odbierana przez wrap_future.
+        loop = await asyncio.to_thread(self._ensure_started)
+        future = asyncio.run_coroutine_threadsafe(
+            self._fetch(url, timeout or self.timeout), loop
+        )
+        return await asyncio.wrap_future(future)
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._start_error is not None:
+                raise self._start_error
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="playwright", daemon=True
             )
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+            except Exception as exc:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                # Decyzja: nieudany start zapamietujemy, zeby kolejne fallbacki
+                # nie probowaly uruchamiac przegladarki od nowa.
+                if isinstance(exc, ContentFetchError):
+                    self._start_error = exc
+                else:
+                    self._start_error = ContentFetchError(
+                        f"Nie udalo sie uruchomic Playwright: {exc}"
+                    )
+                logging.info("Playwright: failed (%s)", self._start_error)
+                raise self._start_error from exc
+            self._loop = loop
+            self._thread = thread
+            return loop
+
+    async def _start(self) -> None:
+        self._playwright = await self._playwright_factory().start()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self.launches += 1
+            self._context = await self._browser.new_context()
+            await self._context.route("**/*", _block_heavy_resources)
+            self._slots = asyncio.Semaphore(self.max_pages)
+        except Exception:
+            await self._shutdown()
+            raise
+        logging.info(
+            "Playwright: przegladarka uruchomiona (strony: %d)", self.max_pages
+        )
+
+    async def _fetch(self, url: str, timeout: int) -> str:
+        async with self._slots:
+            page = self._idle_pages.pop() if self._idle_pages else None
+            if page is None:
+                page = await self._context.new_page()
+            reusable = False
             try:
-                consent_button = page.get_by_role("button", name=consent_pattern)
-                if consent_button.count() > 0:
-                    consent_button.first.click(timeout=2000)
-                    logging.info("Playwright: cookie-consent clicked")
+                content = await _read_page(page, url, timeout)
+                reusable = True
+                return content
+            except ContentFetchError:
+                reusable = True
+                raise
+            except Exception as exc:
+                logging.info("Playwright: failed (%s)", exc)
+                raise ContentFetchError(
+                    f"Nie udalo sie pobrac tresci Playwright: {exc}"
+                ) from exc
+            finally:
+                if reusable:
+                    self._idle_pages.append(page)
+                else:
+                    await _close_quietly(page)
+
+    async def _shutdown(self) -> None:
+        pages, self._idle_pages = self._idle_pages, []
+        for page in pages:
+            await _close_quietly(page)
+        for resource in (self._context, self._browser):
+            if resource is not None:
+                await _close_quietly(resource)
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
             except Exception:
                 pass
+        self._context = self._browser = self._playwright = None
 
-            content = page.evaluate(
-                "() => (document.body && document.body.innerText) || ''"
-            )
-            if not isinstance(content, str) or not content.strip():
-                logging.info("Playwright: failed (empty content)")
-                raise ContentFetchError("Pusta tresc z Playwrighta.")
-            logging.info("Playwright: success (%d)", len(content))
-            return content
-    except ContentFetchError:
-        raise
-    except Exception as exc:
-        logging.info("Playwright: failed (%s)", exc)
-        raise ContentFetchError(
-            f"Nie udalo sie pobrac tresci Playwright: {exc}"
-        ) from exc
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is None or thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        logging.info("Playwright: przegladarka zamknieta")
+
+    def __enter__(self) -> "PlaywrightBrowserPool":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
+
+
+async def _read_page(page: Any, url: str, timeout: int) -> str:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    try:
+        logging.info("Playwright: start %s", url)
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
+    except PlaywrightTimeoutError as exc:
+        logging.info("Playwright: failed (timeout)")
+        raise ContentFetchError(f"Playwright timeout: {exc}") from exc
+
+    try:
+        consent_button = page.get_by_role("button", name=CONSENT_PATTERN)
+        if await consent_button.count() > 0:
+            await consent_button.first.click(timeout=2000)
+            logging.info("Playwright: cookie-consent clicked")
+    except Exception:
+        pass
+
+    content = await page.evaluate(
+        "() => (document.body && document.body.innerText) || ''"
+    )
+    if not isinstance(content, str) or not content.strip():
+        logging.info("Playwright: failed (empty content)")
+        raise ContentFetchError("Pusta tresc z Playwrighta.")
+    logging.info("Playwright: success (%d)", len(content))
+    return content
+
+
+async def _block_heavy_resources(route: Any) -> None:
+    # Decyzja: obrazy, fonty i media nie wplywaja na innerText, a sa
+    # wiekszoscia transferu strony.
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def _close_quietly(resource: Any) -> None:
+    try:
+        await resource.close()
+    except Exception:
+        pass
+
+
+def fetch_article_with_playwright(url: str, timeout: int = 20) -> str:
+    with PlaywrightBrowserPool(max_pages=1, timeout=timeout) as pool:
+        return pool.fetch(url)
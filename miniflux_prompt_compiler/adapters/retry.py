@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, TypeVar
+
+from miniflux_prompt_compiler.types import TransientFetchError
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+R = TypeVar("R")
+
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+RETRY_BUDGET = 50
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Decyzja: Miniflux fetch-content zwraca 500 dla stron, ktorych nie umie
+# przetworzyc; ponowienie tylko opoznia fallback do Jiny. Jina (przejsciowe 500
+# przy timeoucie pobrania strony), YouTube i pozostale zapytania Miniflux
+# ponawiaja 500.
+FETCH_CONTENT_RETRYABLE_STATUSES = RETRYABLE_STATUSES - {500}
+
+
+class RetryBudget:
+    """Wspolna pula ponowien na caly przebieg, dzielona przez watki i upstreamy.
+
+    `limit=None` oznacza brak limitu.
+    """
+
+    def __init__(self, limit: int | None = RETRY_BUDGET) -> None:
+        self.limit = limit
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.limit is not None and self.spent >= self.limit:
+                return False
+            self.spent += 1
+            return True
+
+
+def _error_chain(exc: BaseException) -> Iterator[BaseException]:
+    seen: set[int] = set()
+    current: BaseException | None = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+# Decyzja: typy bledow bierzemy z juz zaladowanych modulow; wyjatek requests
+# lub httpx nie moze wystapic, zanim biblioteka zostala zaimportowana, wiec
+# klasyfikacja bledu nie laduje drugiej biblioteki HTTP.
+def _network_errors() -> tuple[type[BaseException], ...]:
+    errors: list[type[BaseException]] = []
+    requests_module = sys.modules.get("requests")
+    if requests_module is not None:
+        errors += [requests_module.ConnectionError, requests_module.Timeout]
+    httpx_module = sys.modules.get("httpx")
+    if httpx_module is not None:
+        errors += [
+            httpx_module.TimeoutException,
+            httpx_module.NetworkError,
+            httpx_module.RemoteProtocolError,
+        ]
+    return tuple(errors)
+
+
+def _response_of(
+    exc: BaseException,
+) -> "requests.Response | httpx.Response | None":
+    httpx_module = sys.modules.get("httpx")
+    if httpx_module is not None and isinstance(exc, httpx_module.HTTPStatusError):
+        return exc.response
+    requests_module = sys.modules.get("requests")
+    if requests_module is not None and isinstance(exc, requests_module.HTTPError):
+        return exc.response
+    return None
+
+
+def is_retryable(
+    exc: BaseException, statuses: frozenset[int] = RETRYABLE_STATUSES
+) -> bool:
+    """Bledy przejsciowe (throttling, 5xx, zerwane polaczenia) sa ponawiane."""
+    for error in _error_chain(exc):
+        if isinstance(error, TransientFetchError):
+            return True
+        response = _response_of(error)
+        if response is not None:
+            return response.status_code in statuses
+        if isinstance(error, _network_errors()):
+            return True
+    return False
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Czas z naglowka `Retry-After` (sekundy lub data HTTP), jesli jest."""
+    for error in _error_chain(exc):
+        response = _response_of(error)
+        if response is None:
+            continue
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+    return None
+
+
+class RetryPolicy:
+    """Ponowienia z wykladniczym backoffem, jitterem i obsluga `Retry-After`.
+
+    Kazde ponowienie zuzywa jednostke z `budget`; po wyczerpaniu budzetu bledy
+    sa zwracane od razu, zeby przeciazony upstream nie blokowal przebiegu.
+    """
+
+    def __init__(
+        self,
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        budget: RetryBudget | None = None,
+        jitter: Callable[[], float] = random.random,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget(None)
+        self._jitter = jitter
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+
+    def backoff(self, attempt: int) -> float:
+        # Decyzja: "equal jitter" - polowa opoznienia stala, polowa losowa, zeby
+        # rozproszyc watki bez ryzyka natychmiastowego ponowienia.
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling / 2 + self._jitter() * ceiling / 2
+
+    def next_delay(
+        self,
+        attempt: int,
+        exc: BaseException,
+        label: str,
+        statuses: frozenset[int] = RETRYABLE_STATUSES,
+    ) -> float | None:
+        """Opoznienie przed kolejna proba albo `None`, gdy blad ma zostac zwrocony."""
+        if attempt >= self.attempts or not is_retryable(exc, statuses):
+            return None
+        delay = self.backoff(attempt)
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                logging.info(
+                    "Retry: %s Retry-After %.0fs przekracza limit, rezygnuje",
+                    label,
+                    retry_after,
+                )
+                return None
+            delay = max(delay, retry_after)
+        if not self.budget.acquire():
+            logging.info("Retry: budzet ponowien wyczerpany (%s)", label)
+            return None
+        logging.info(
+            "Retry: %s proba %d/%d za %.1fs (%s)",
+            label,
+            attempt + 1,
+            self.attempts,
+            delay,
+            exc,
+        )
+        return delay
+
+    def call(
+        self,
+        func: Callable[[], R],
+        label: str = "",
+        statuses: frozenset[int] = RETRYABLE_STATUSES,
+    ) -> R:
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except Exception as exc:
+                delay = self.next_delay(attempt, exc, label, statuses)
+                if delay is None:
+                    raise
+            self._sleep(delay)
+            attempt += 1
+
+    async def call_async(
+        self,
+        func: Callable[[], Awaitable[R]],
+        label: str = "",
+        statuses: frozenset[int] = RETRYABLE_STATUSES,
+    ) -> R:
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except Exception as exc:
+                delay = self.next_delay(attempt, exc, label, statuses)
+                if delay is None:
+                    raise
+            await self._async_sleep(delay)
+            attempt += 1
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
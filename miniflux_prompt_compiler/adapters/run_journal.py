@@ -0,0 +1,256 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from miniflux_prompt_compiler.types import ProcessedItem
+
+DEFAULT_STATE_DIR = Path.home() / ".local" / "state" / "miniflux_prompt_compiler"
+JOURNAL_FILENAME = "journal.sqlite3"
+STATE_EXTRACTED = "extracted"
+STATE_DELIVERED = "delivered"
+STATE_READ = "read"
+
+
+@dataclass
+class JournalEntry:
+    """Stan wpisu w dzienniku; dla trybu `--links` `content` to URL wpisu."""
+
+    entry_id: int
+    state: str
+    title: str | None
+    content: str
+    prompt: int | None = None
+
+    def result(self) -> ProcessedItem | str:
+        if self.title is None:
+            return self.content
+        return ProcessedItem(
+            title=self.title, content=self.content, entry_id=self.entry_id
+        )
+
+
+class RunJournal:
+    """Dziennik przebiegu (write-ahead) w SQLite.
+
+    Kazda zmiana stanu wpisu (`extracted` -> `delivered` -> `read`) jest
+    zatwierdzana od razu, wiec po przerwaniu przebiegu `--resume` wie, ktore
+    tresci sa juz pobrane, ktore prompty zostaly dostarczone i ktore wpisy
+    czekaja tylko na oznaczenie read. Nowy przebieg bez `--resume` nie
+    kasuje niedokonczonych: zostaja, dopoki przebieg w tym samym trybie nie
+    dojdzie do `finish()`, a `--resume` laczy je w jeden.
+    """
+
+    def __init__(self, path: Path, clock: Callable[[], float] = time.time) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._run_id: int | None = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Decyzja: WAL i synchronous=NORMAL, bo zapis po kazdym wpisie z pelnym
+        # fsync spowalnial przebieg; po awarii procesu zatwierdzone zmiany zostaja.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY,"
+            " mode TEXT NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " finished_at REAL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " run_id INTEGER NOT NULL,"
+            " entry_id INTEGER NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"
+            " title TEXT,"
+            " content TEXT NOT NULL,"
+            " prompt INTEGER,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (run_id, entry_id))"
+        )
+        self._connection.commit()
+
+    @classmethod
+    def in_dir(cls, state_dir: Path) -> "RunJournal":
+        return cls(state_dir / JOURNAL_FILENAME)
+
+    def begin(self, mode: str, resume: bool = False) -> dict[int, JournalEntry]:
+        """Otwiera przebieg; przy `resume` zwraca niedokonczone wpisy poprzednich."""
+        with self._lock:
+            unfinished = [
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT id FROM runs WHERE finished_at IS NULL AND mode = ?"
+                    " ORDER BY id",
+                    (mode,),
+                ).fetchall()
+            ]
+            if resume and unfinished:
+                self._run_id = unfinished[-1]
+                self._merge(unfinished)
+                pending = self._pending(self._run_id)
+                logging.info(
+                    "Dziennik: wznawiam przebieg (%d wpisow do dokonczenia)",
+                    len(pending),
+                )
+                return pending
+            if resume:
+                logging.info(
+                    "Dziennik: brak przerwanego przebiegu w trybie %s, "
+                    "zaczynam od poczatku.",
+                    mode,
+                )
+            else:
+                pending_ids = {
+                    entry_id
+                    for run_id in unfinished
+                    for entry_id in self._pending(run_id)
+                }
+                if pending_ids:
+                    logging.info(
+                        "Dziennik: poprzedni przebieg nie zostal dokonczony "
+                        "(%d wpisow); zostaje w dzienniku, --resume pozwala "
+                        "go dokonczyc.",
+                        len(pending_ids),
+                    )
+            cursor = self._connection.execute(
+                "INSERT INTO runs (mode, started_at) VALUES (?, ?)",
+                (mode, self._clock()),
+            )
+            self._run_id = cursor.lastrowid
+            self._connection.commit()
+            return {}
+
+    def _merge(self, run_ids: list[int]) -> None:
+        """Przenosi wpisy starszych niedokonczonych przebiegow do najnowszego.
+
+        Decyzja: przy wpisie obecnym w kilku przebiegach wygrywa stan z
+        nowszego, bo nowszy przebieg pobral go ponownie jako nadal unread.
+        """
+        newest = run_ids[-1]
+        for run_id in reversed(run_ids[:-1]):
+            self._connection.execute(
+                "UPDATE entries SET run_id = ? WHERE run_id = ? AND entry_id NOT IN"
+                " (SELECT entry_id FROM entries WHERE run_id = ?)",
+                (newest, run_id, newest),
+            )
+            self._connection.execute("DELETE FROM entries WHERE run_id = ?", (run_id,))
+            self._connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        self._connection.commit()
+
+    def _pending(self, run_id: int) -> dict[int, JournalEntry]:
+        rows = self._connection.execute(
+            "SELECT entry_id, state, title, content, prompt FROM entries"
+            " WHERE run_id = ? AND state != ? ORDER BY position",
+            (run_id, STATE_READ),
+        ).fetchall()
+        return {row[0]: JournalEntry(*row) for row in rows}
+
+    def extracted(self, entry_id: int, result: ProcessedItem | str) -> None:
+        title, content = (
+            (None, result)
+            if isinstance(result, str)
+            else (result.title, result.content)
+        )
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (run_id, entry_id, position, state, title, content, updated_at)"
+                " VALUES (?, ?,"
+                " (SELECT COALESCE(MAX(position), 0) + 1 FROM entries"
+                "  WHERE run_id = ?), ?, ?, ?, ?)",
+                (
+                    self._run_id,
+                    entry_id,
+                    self._run_id,
+                    STATE_EXTRACTED,
+                    title,
+                    content,
+                    self._clock(),
+                ),
+            )
+            self._connection.commit()
+
+    def delivered(self, entry_ids: Iterable[int], prompt: int | None = None) -> None:
+        self._set_state(entry_ids, STATE_DELIVERED, prompt)
+
+    def read(self, entry_ids: Iterable[int]) -> None:
+        self._set_state(entry_ids, STATE_READ)
+
+    def _set_state(
+        self, entry_ids: Iterable[int], state: str, prompt: int | None = None
+    ) -> None:
+        now = self._clock()
+        with self._lock:
+            # Decyzja: stan tylko rosnie; ponowne `delivered` nie cofa `read`,
+            # a prompt zostaje z pierwszego dostarczenia.
+            self._connection.executemany(
+                "UPDATE entries SET state = ?, prompt = COALESCE(prompt, ?),"
+                " updated_at = ? WHERE run_id = ? AND entry_id = ? AND state != ?",
+                [
+                    (state, prompt, now, self._run_id, entry_id, STATE_READ)
+                    for entry_id in entry_ids
+                ],
+            )
+            self._connection.commit()
+
+    def states(self) -> dict[int, str]:
+        with self._lock:
+            return dict(
+                self._connection.execute(
+                    "SELECT entry_id, state FROM entries WHERE run_id = ?",
+                    (self._run_id,),
+                ).fetchall()
+            )
+
+    def finish(self) -> bool:
+        """Zamyka przebieg, gdy wszystkie wpisy sa oznaczone jako read."""
+        with self._lock:
+            (pending,) = self._connection.execute(
+                "SELECT COUNT(*) FROM entries WHERE run_id = ? AND state != ?",
+                (self._run_id, STATE_READ),
+            ).fetchone()
+            if pending:
+                logging.info(
+                    "Dziennik: %d wpisow czeka na oznaczenie read; "
+                    "--resume dokonczy przebieg.",
+                    pending,
+                )
+                return False
+            self._connection.execute(
+                "UPDATE runs SET finished_at = ? WHERE id = ?",
+                (self._clock(), self._run_id),
+            )
+            # Decyzja: dokonczony przebieg zastepuje wczesniejsze w tym samym
+            # trybie (ich wpisy unread pobral od nowa); starsze dokonczone
+            # przebiegi innych trybow tez nie sa juz potrzebne.
+            superseded = (
+                "SELECT id FROM runs WHERE id < ? AND (finished_at IS NOT NULL"
+                " OR mode = (SELECT mode FROM runs WHERE id = ?))"
+            )
+            self._connection.execute(
+                f"DELETE FROM entries WHERE run_id IN ({superseded})",
+                (self._run_id, self._run_id),
+            )
+            self._connection.execute(
+                f"DELETE FROM runs WHERE id IN ({superseded})",
+                (self._run_id, self._run_id),
+            )
+            self._connection.commit()
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from miniflux_prompt_compiler.adapters.trafilatura_markdown import (
+    EXTRACTION_PLACEHOLDER,
+)
+from miniflux_prompt_compiler.core.source_routing import (
+    ROUTE_PROBE_RATE,
+    RoutingPolicy,
+    SourceStats,
+    source_domain,
+)
+from miniflux_prompt_compiler.types import ContentFetchError
+
+ROUTING_FILENAME = "routing.sqlite3"
+HEDGE_DEFAULT_DELAY = 3.0
+HEDGE_MAX_RATIO = 0.1
+
+SOURCE_ERROR_LOGS = {
+    "miniflux": "Miniflux fetch-content error (%s)",
+    "jina": "Jina: error (%s)",
+    "playwright": "Playwright: error (%s)",
+}
+
+
+class SourceRouter(RoutingPolicy):
+    """`RoutingPolicy` ze statystykami zapisywanymi w SQLite miedzy przebiegami."""
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        probe_rate: float = ROUTE_PROBE_RATE,
+        random_source: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(probe_rate, random_source, clock)
+        self.path = path
+        self._dirty: set[tuple[str, str]] = set()
+        self._connection: sqlite3.Connection | None = None
+        if path is not None:
+            self._open(path)
+
+    @classmethod
+    def in_dir(
+        cls, cache_dir: Path, probe_rate: float = ROUTE_PROBE_RATE
+    ) -> "SourceRouter":
+        return cls(cache_dir / ROUTING_FILENAME, probe_rate=probe_rate)
+
+    def _open(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS source_stats ("
+            " domain TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " attempts REAL NOT NULL,"
+            " successes REAL NOT NULL,"
+            " latency_total REAL NOT NULL,"
+            " length_total REAL NOT NULL,"
+            " length_samples REAL NOT NULL,"
+            " last_attempt REAL NOT NULL,"
+            " PRIMARY KEY (domain, source))"
+        )
+        self._connection.commit()
+        for domain, source, *values in self._connection.execute(
+            "SELECT domain, source, attempts, successes, latency_total,"
+            " length_total, length_samples, last_attempt FROM source_stats"
+        ):
+            self._stats[(domain, source)] = SourceStats(*values)
+
+    def _update(self, domain: str, source: str) -> SourceStats:
+        self._dirty.add((domain, source))
+        return super()._update(domain, source)
+
+    def save(self) -> None:
+        if self._connection is None:
+            return
+        with self._lock:
+            rows = [
+                (
+                    domain,
+                    source,
+                    stats.attempts,
+                    stats.successes,
+                    stats.latency_total,
+                    stats.length_total,
+                    stats.length_samples,
+                    stats.last_attempt,
+                )
+                for (domain, source), stats in self._stats.items()
+                if (domain, source) in self._dirty
+            ]
+            self._dirty.clear()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO source_stats"
+                " (domain, source, attempts, successes, latency_total,"
+                " length_total, length_samples, last_attempt)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.save()
+        if self._connection is not None:
+            with self._lock:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self) -> "SourceRouter":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
+
+
+class Hedging:
+    """Zapasowe zapytanie do drugiego zrodla, gdy pierwsze sie spoznia.
+
+    Opoznienie to percentyl `percentile` dotychczasowych latencji zrodla
+    pierwszego (do `HEDGE_MIN_SAMPLES` probek: `HEDGE_DEFAULT_DELAY`), a
+    zapasowe zapytania stanowia najwyzej `max_ratio` wszystkich pobran, wiec
+    obciazenie upstreamow rosnie o ulamek, a nie dwukrotnie.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        executor: ThreadPoolExecutor | None = None,
+        max_ratio: float = HEDGE_MAX_RATIO,
+    ) -> None:
+        self.percentile = percentile
+        self.executor = executor
+        self.max_ratio = max_ratio
+        self.fetches = 0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self, router: RoutingPolicy, source: str) -> float:
+        latency = router.latency_percentile(source, self.percentile)
+        return HEDGE_DEFAULT_DELAY if latency is None else latency
+
+    def start(self) -> None:
+        with self._lock:
+            self.fetches += 1
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.fetches:
+                return False
+            self.hedges += 1
+            return True
+
+    def won(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+    def log_stats(self) -> None:
+        if self.fetches:
+            logging.info(
+                "Hedging: %d zapasowych zapytan na %d pobran, wygrane: %d",
+                self.hedges,
+                self.fetches,
+                self.wins,
+            )
+
+
+def _record_success(
+    router: RoutingPolicy, domain: str, source: str, content: str, latency: float
+) -> None:
+    router.record_fetch(domain, source, True, latency)
+    router.record_extraction(domain, source, len(content.strip()))
+    logging.info("Content source selected: %s", source)
+
+
+def _record_failure(
+    router: RoutingPolicy,
+    domain: str,
+    source: str,
+    exc: ContentFetchError,
+    latency: float,
+) -> None:
+    router.record_fetch(domain, source, False, latency)
+    logging.info(SOURCE_ERROR_LOGS.get(source, source + ": error (%s)"), exc)
+
+
+def extracted(content: str) -> str:
+    """Zwraca tresc, a pusta ekstrakcje zglasza jako blad zrodla."""
+    # Decyzja: placeholder pustej ekstrakcji to chybienie zrodla, wiec routing
+    # probuje kolejnego zrodla zamiast oddac placeholder jako tresc wpisu.
+    if EXTRACTION_PLACEHOLDER in content:
+        raise ContentFetchError("Nie udalo sie wyciagnac tresci artykulu.")
+    return content
+
+
+def fetch_routed(
+    router: RoutingPolicy,
+    url: str,
+    sources: dict[str, Callable[[], str]],
+    hedging: Hedging | None = None,
+) -> tuple[str, str]:
+    """Pobiera tresc z pierwszego dzialajacego zrodla w kolejnosci routera.
+
+    `sources` podaje zrodla w kolejnosci domyslnej i zwraca gotowy markdown
+    (Miniflux juz po konwersji), zeby pusta ekstrakcja byla chybieniem.
+    """
+    domain = source_domain(url)
+    order = router.order(domain, list(sources))
+    last_error: ContentFetchError | None = None
+    if hedging is not None and hedging.executor is not None and len(order) > 1:
+        result, last_error = _fetch_hedged(
+            router, domain, order[0], order[1], sources, hedging
+        )
+        if result is not None:
+            return result
+        order = order[2:]
+    for source in order:
+        started = time.perf_counter()
+        try:
+            content = extracted(sources[source]())
+        except ContentFetchError as exc:
+            _record_failure(router, domain, source, exc, time.perf_counter() - started)
+            last_error = exc
+            continue
+        _record_success(router, domain, source, content, time.perf_counter() - started)
+        return content, source
+    raise last_error or ContentFetchError("Brak zrodel tresci dla wpisu.")
+
+
+def _fetch_hedged(
+    router: RoutingPolicy,
+    domain: str,
+    primary: str,
+    secondary: str,
+    sources: dict[str, Callable[[], str]],
+    hedging: Hedging,
+) -> tuple[tuple[str, str] | None, ContentFetchError | None]:
+    """Wyscig dwoch pierwszych zrodel; zwraca (wynik, ostatni blad)."""
+    executor = hedging.executor
+    if executor is None:
+        raise ValueError("Hedging w trybie watkow wymaga executora.")
+    hedging.start()
+    started: dict[str, float] = {}
+    running: dict[Future[str], str] = {}
+
+    def launch(source: str) -> None:
+        started[source] = time.perf_counter()
+        running[executor.submit(sources[source])] = source
+
+    launch(primary)
+    delay = hedging.delay(router, primary)
+    done, _ = wait(running, timeout=delay)
+    if not done and hedging.allow():
+        logging.info(
+            "Hedging: %s bez odpowiedzi po %.1fs, start %s", primary, delay, secondary
+        )
+        launch(secondary)
+    last_error: ContentFetchError | None = None
+    pending = set(running)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = running[future]
+            latency = time.perf_counter() - started[source]
+            try:
+                content = extracted(future.result())
+            except ContentFetchError as exc:
+                _record_failure(router, domain, source, exc, latency)
+                last_error = exc
+                continue
+            # Decyzja: przegranego zapytania w watku nie da sie przerwac, wiec
+            # tylko porzucamy jego wynik (anulowane jest, jesli jeszcze czeka).
+            for loser in pending:
+                loser.cancel()
+                logging.info("Hedging: porzucam %s", running[loser])
+            if source == secondary:
+                hedging.won()
+            _record_success(router, domain, source, content, latency)
+            return (content, source), None
+        if not pending and secondary not in started:
+            # Pierwsze zrodlo padlo przed uplywem opoznienia: drugie idzie
+            # zwyczajnie, bez liczenia jako zapytanie zapasowe.
+            launch(secondary)
+            pending = {
+                future for future, source in running.items() if source == secondary
+            }
+    return None, last_error
+
+
+async def fetch_routed_async(
+    router: RoutingPolicy,
+    url: str,
+    sources: dict[str, Callable[[], Awaitable[str]]],
+    hedging: Hedging | None = None,
+) -> tuple[str, str]:
+    """Asynchroniczny odpowiednik `fetch_routed`; przegrany wyscigu jest anulowany."""
+    domain = source_domain(url)
+    order = router.order(domain, list(sources))
+    last_error: ContentFetchError | None = None
+    if hedging is not None and len(order) > 1:
+        result, last_error = await _fetch_hedged_async(
+            router, domain, order[0], order[1], sources, hedging
+        )
+        if result is not None:
+            return result
+        order = order[2:]
+    for source in order:
+        started = time.perf_counter()
+        try:
+            content = extracted(await sources[source]())
+        except ContentFetchError as exc:
+            _record_failure(router, domain, source, exc, time.perf_counter() - started)
+            last_error = exc
+            continue
+        _record_success(router, domain, source, content, time.perf_counter() - started)
+        return content, source
+    raise last_error or ContentFetchError("Brak zrodel tresci dla wpisu.")
+
+
+async def _fetch_hedged_async(
+    router: RoutingPolicy,
+    domain: str,
+    primary: str,
+    secondary: str,
+    sources: dict[str, Callable[[], Awaitable[str]]],
+    hedging: Hedging,
+) -> tuple[tuple[str, str] | None, ContentFetchError | None]:
+    hedging.start()
+    started: dict[str, float] = {}
+    running: dict[asyncio.Task[str], str] = {}
+
+    def launch(source: str) -> None:
+        started[source] = time.perf_counter()
+        running[asyncio.ensure_future(sources[source]())] = source
+
+    launch(primary)
+    delay = hedging.delay(router, primary)
+    done, _ = await asyncio.wait(running, timeout=delay)
+    if not done and hedging.allow():
+        logging.info(
+            "Hedging: %s bez odpowiedzi po %.1fs, start %s", primary, delay, secondary
+        )
+        launch(secondary)
+    last_error: ContentFetchError | None = None
+    pending = set(running)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                source = running[task]
+                latency = time.perf_counter() - started[source]
+                try:
+                    content = extracted(task.result())
+                except ContentFetchError as exc:
+                    _record_failure(router, domain, source, exc, latency)
+                    last_error = exc
+                    continue
+                for loser in pending:
+                    logging.info("Hedging: anuluje %s", running[loser])
+                if source == secondary:
+                    hedging.won()
+                _record_success(router, domain, source, content, latency)
+                return (content, source), None
+            if not pending and secondary not in started:
+                launch(secondary)
+                pending = {
+                    task for task, source in running.items() if source == secondary
+                }
+    finally:
+        for task in pending:
+            task.cancel()
+    return None, last_error
@@ -1,55 +1,33 @@
-import re
-
-import trafilatura
-
-NOISE_PATTERNS = [
-    r"(?im)^follow us\s*$",
-    r"(?im)^font size\s*$",
-    r"(?im)^save\s*$",
-    r"(?im)^print\s*$",
-    r"(?im)^rate story\s*$",
-    r"(?im)^listen\s*$",
-    r"(?im)^loading\.\.\.\s*$",
-    r"(?im)^live events\s*$",
-    r"(?im)^read more news on\s*$",
-    r"(?im)^download the .* app.*$",
-    r"(?im)^\s*you can now subscribe to our .*?$",
-    r"(?im)^\s*catch all the .*?$",
-    r"(?im)^faqs:?\s*$",
-    r"(?im)^q:\s+.*$",
-    r"(?im)^a:\s+.*$",
-]
-
-NOISE_LINE_CONTAINS = [
-    "whatsapp channel",
-    "follow channel",
-    "read more news on",
-    "download the economic times news app",
-    "catch all the us news",
-    "international breaking news events",
-]
-
-
-def cleanup_markdown(markdown: str) -> str:
-    text = markdown
-    for pattern in NOISE_PATTERNS:
-        text = re.sub(pattern, "", text)
-
-    cleaned_lines: list[str] = []
-    for line in text.splitlines():
-        normalized = line.strip().lower()
-        if not normalized:
-            cleaned_lines.append("")
-            continue
-        if any(fragment in normalized for fragment in NOISE_LINE_CONTAINS):
-            continue
-        cleaned_lines.append(line)
-
-    text = "\n".join(cleaned_lines)
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
-
-
-def html_to_clean_markdown(title: str, html: str) -> str:
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from miniflux_prompt_compiler.core.noise_filter import (
+    DEFAULT_NOISE_RULES,
+    NOISE_LINE_CONTAINS,  # noqa: F401
+    NOISE_PATTERNS,  # noqa: F401
+    NoiseFilter,
+    NoiseRules,
+)
+
+EXTRACTION_PLACEHOLDER = "_Nie udało się wyciągnąć treści artykułu_"
+
+
+def cleanup_markdown(markdown: str, noise_filter: NoiseFilter | None = None) -> str:
+    return (noise_filter or DEFAULT_NOISE_RULES.for_url(None)).clean(markdown)
+
+
+def html_to_clean_markdown(
+    title: str,
+    html: str,
+    url: str | None = None,
+    noise_rules: NoiseRules | None = None,
+) -> str:
+    # Decyzja: import przy pierwszej konwersji, bo trafilatura z lxml to
+    # najdrozszy import pakietu, a `--links` i tresci z cache go nie potrzebuja.
+    import trafilatura
+
     content = trafilatura.extract(
         html,
         output_format="markdown",
@@ -59,7 +37,60 @@ def html_to_clean_markdown(title: str, html: str) -> str:
         favor_precision=True,
         with_metadata=False,
     ) or ""
-    content = cleanup_markdown(content)
+    rules = noise_rules or DEFAULT_NOISE_RULES
+    content = cleanup_markdown(content, rules.for_url(url))
     if not content:
-        content = "_Nie udało się wyciągnąć treści artykułu_"
-    return f"# {title}\n\n{content}"
+        content = EXTRACTION_PLACEHOLDER
+    return titled_markdown(title, content)
+
+
+def titled_markdown(title: str, body: str) -> str:
+    return f"# {title}\n\n{body}"
+
+
+def markdown_body(markdown: str) -> str:
+    """Tresc wyniku `html_to_clean_markdown` bez naglowka z tytulem."""
+    _, _, body = markdown.partition("\n\n")
+    return body
+
+
+class MarkdownExtractionPool:
+    """Etap konwersji HTML -> markdown w puli procesow.
+
+    Pula startuje leniwie przy pierwszym zadaniu, wiec przebiegi bez tresci
+    z Miniflux nie placa za uruchomienie procesow.
+    """
+
+    def __init__(
+        self, max_workers: int | None = None, noise_rules: NoiseRules | None = None
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.noise_rules = noise_rules
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, title: str, html: str, url: str | None = None) -> "Future[str]":
+        with self._lock:
+            if self._executor is None:
+                # Decyzja: `spawn`, bo pula startuje z procesu z dzialajacymi
+                # watkami `--workers`, a `fork` moze wtedy zakleszczyc potomka.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            executor = self._executor
+        return executor.submit(
+            html_to_clean_markdown, title, html, url, self.noise_rules
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "MarkdownExtractionPool":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
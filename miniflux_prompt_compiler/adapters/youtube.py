@@ -1,6 +1,14 @@
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from miniflux_prompt_compiler.adapters.retry import DEFAULT_RETRY_POLICY, RetryPolicy
 from miniflux_prompt_compiler.types import ContentFetchError
 
+if TYPE_CHECKING:
+    import requests
+
 
 def _extract_text(item: object) -> str:
     if isinstance(item, dict):
@@ -11,7 +19,13 @@ def _extract_text(item: object) -> str:
     return ""
 
 
-def fetch_youtube_transcript(video_id: str, preferred_language: str = "en") -> str:
+def fetch_youtube_transcript(
+    video_id: str,
+    preferred_language: str = "en",
+    session: requests.Session | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> str:
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
     try:
         from youtube_transcript_api import YouTubeTranscriptApi
     except ImportError as exc:
@@ -19,19 +33,29 @@ def fetch_youtube_transcript(video_id: str, preferred_language: str = "en") -> s
             "Brak zaleznosci youtube_transcript_api w srodowisku."
         ) from exc
 
-    try:
-        # Decyzja: obslugujemy oba API (stare get_transcript i nowe fetch),
-        # bo biblioteka zmieniala sposob wywolania miedzy wersjami.
-        get_transcript = getattr(YouTubeTranscriptApi, "get_transcript", None)
-        fetch = getattr(YouTubeTranscriptApi, "fetch", None)
+    # Decyzja: obslugujemy oba API (stare get_transcript i nowe fetch),
+    # bo biblioteka zmieniala sposob wywolania miedzy wersjami.
+    get_transcript = getattr(YouTubeTranscriptApi, "get_transcript", None)
+    fetch = getattr(YouTubeTranscriptApi, "fetch", None)
+
+    def attempt() -> object:
         if callable(get_transcript):
-            transcript = get_transcript(video_id, languages=[preferred_language])
-        elif callable(fetch):
-            transcript = YouTubeTranscriptApi().fetch(
-                video_id, languages=[preferred_language]
+            return get_transcript(video_id, languages=[preferred_language])
+        if callable(fetch):
+            # Decyzja: sesje przekazujemy tylko do nowego API; stare
+            # `get_transcript` nie przyjmuje klienta HTTP.
+            api = (
+                YouTubeTranscriptApi(http_client=session)
+                if session is not None
+                else YouTubeTranscriptApi()
             )
-        else:
-            raise ContentFetchError("Nieznany interfejs youtube_transcript_api.")
+            return api.fetch(video_id, languages=[preferred_language])
+        raise ContentFetchError("Nieznany interfejs youtube_transcript_api.")
+
+    try:
+        # Decyzja: ponawiamy tylko bledy HTTP i sieci (takze opakowane w
+        # YouTubeRequestFailed); brak transkrypcji i blokada IP wracaja od razu.
+        transcript = retry_policy.call(attempt, "youtube")
     except Exception as exc:  # youtube_transcript_api rzuca kilka typow wyjatkow
         raise ContentFetchError(f"Brak transkrypcji YouTube: {exc}") from exc
 
@@ -1,55 +1,85 @@
+import asyncio
 import logging
 import os
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
+from typing import TextIO
 
 from miniflux_prompt_compiler.adapters.clipboard import copy_to_clipboard
-from miniflux_prompt_compiler.adapters.jina import fetch_article_with_fallback
+from miniflux_prompt_compiler.adapters.content_cache import (
+    ContentCache,
+    cached_article_fetcher,
+    cached_markdown_converter,
+    cached_markdown_submitter,
+    cached_youtube_fetcher,
+)
+from miniflux_prompt_compiler.adapters.http_client import (
+    HTTP_POOL_SIZE,
+    create_session,
+)
+from miniflux_prompt_compiler.adapters.jina import (
+    JINA_READER_URL,
+    fetch_article_markdown,
+)
 from miniflux_prompt_compiler.adapters.miniflux_http import (
+    BatchReadMarker,
     fetch_entry_content,
-    fetch_unread_entries,
-    mark_entry_read,
+    iter_unread_entries,
 )
-from miniflux_prompt_compiler.adapters.playwright_fetch import (
-    fetch_article_with_playwright,
+from miniflux_prompt_compiler.adapters.playwright_fetch import PlaywrightBrowserPool
+from miniflux_prompt_compiler.adapters.retry import RetryBudget, RetryPolicy
+from miniflux_prompt_compiler.adapters.run_journal import (
+    STATE_DELIVERED,
+    JournalEntry,
+    RunJournal,
+)
+from miniflux_prompt_compiler.adapters.source_routing import (
+    Hedging,
+    SourceRouter,
+    fetch_routed,
 )
 from miniflux_prompt_compiler.adapters.trafilatura_markdown import (
+    MarkdownExtractionPool,
     html_to_clean_markdown,
+    markdown_body,
+    titled_markdown,
 )
 from miniflux_prompt_compiler.adapters.youtube import fetch_youtube_transcript
-from miniflux_prompt_compiler.config import load_env
-from miniflux_prompt_compiler.core.chunking import build_prompts_with_chunking
-from miniflux_prompt_compiler.core.prompting import build_prompt
-from miniflux_prompt_compiler.core.tokenization import (
-    MAX_PROMPT_TOKENS,
-    count_tokens,
-    label_for_tokens,
+from miniflux_prompt_compiler.concurrency import (
+    HostRateLimiter,
+    UpstreamLimiter,
+    ordered_map,
+)
+from miniflux_prompt_compiler.config import (
+    load_env,
+    load_noise_rules,
+    parse_rate_limits,
 )
+from miniflux_prompt_compiler.core.compression import ContentCompressor
+from miniflux_prompt_compiler.core.dedup import Deduplicator
+from miniflux_prompt_compiler.core.noise_filter import NoiseRules
 from miniflux_prompt_compiler.core.url_classify import (
     extract_youtube_id,
     is_youtube_shorts,
     is_youtube_url,
 )
-from miniflux_prompt_compiler.types import ContentFetchError, MinifluxEntry, ProcessedItem
-
-ANSI_RESET = "\033[0m"
-ANSI_GREEN = "\033[32m"
-ANSI_YELLOW = "\033[33m"
+from miniflux_prompt_compiler.delivery import PromptStream, deliver_results
+from miniflux_prompt_compiler.metrics import RunMetrics
+from miniflux_prompt_compiler.options import RunOptions
+from miniflux_prompt_compiler.types import MinifluxEntry, ProcessedItem, PromptChunk
 
+# Zrodlo routowane: tresc z Miniflux juz po konwersji, bez naglowka z tytulem.
+MINIFLUX_MARKDOWN_SOURCE = "miniflux-markdown"
 
-def color_label(label: str) -> str:
-    if label == "GPT-Instant":
-        return f"{ANSI_GREEN}{label}{ANSI_RESET}"
-    if label == "GPT-Thinking":
-        return f"{ANSI_YELLOW}{label}{ANSI_RESET}"
-    return label
 
-
-def process_entry(
+def entry_target(
     entry: MinifluxEntry,
-    article_fetcher: Callable[[int | None, str], str | tuple[str, str]],
-    youtube_fetcher: Callable[[str], str],
-) -> tuple[bool, ProcessedItem | None]:
+) -> tuple[str, str, int | None, str | None] | None:
+    """Zwraca (title, url, entry_id, video_id) albo None dla pominietego wpisu."""
     title = (entry.get("title") or "").strip()
     url = (entry.get("url") or "").strip()
     entry_id_raw = entry.get("id")
@@ -61,31 +91,215 @@ def process_entry(
             entry_id = None
     if not url:
         logging.info("Brak URL, pomijam wpis.")
-        return False, None
+        return None
 
     logging.info("Start: %s", title or url)
     if is_youtube_url(url):
         if is_youtube_shorts(url):
             logging.info("Pomijam: YouTube Shorts")
-            return False, None
+            return None
         video_id = extract_youtube_id(url)
         if not video_id:
             logging.info("Niepoprawny link YouTube")
-            return False, None
+            return None
         logging.info("Typ: YouTube")
-        content = youtube_fetcher(video_id)
-        return True, ProcessedItem(title=title, content=content)
+        return title, url, entry_id, video_id
 
     logging.info("Typ: artykul")
-    content_result = article_fetcher(entry_id, url)
-    source = "unknown"
+    return title, url, entry_id, None
+
+
+def split_source(content_result: str | tuple[str, str]) -> tuple[str, str]:
     if isinstance(content_result, tuple):
-        content, source = content_result
-    else:
-        content = content_result
+        return content_result
+    return content_result, "unknown"
+
+
+def routed_result(content: str, source: str) -> tuple[str, str]:
+    """Oznacza przekonwertowana w routingu tresc z Miniflux."""
     if source == "miniflux":
-        content = html_to_clean_markdown(title=title, html=content)
-    return True, ProcessedItem(title=title, content=content)
+        return content, MINIFLUX_MARKDOWN_SOURCE
+    return content, source
+
+
+def fetch_entry(
+    entry: MinifluxEntry,
+    article_fetcher: Callable[[int | None, str], str | tuple[str, str]],
+    youtube_fetcher: Callable[[str], str],
+) -> tuple[bool, ProcessedItem | None, bool]:
+    """Etap sieciowy: zwraca (processed, item, needs_markdown).
+
+    Dla tresci z Miniflux `item.content` zawiera surowy HTML, ktory trzeba
+    jeszcze przepuscic przez konwersje do markdown.
+    """
+    target = entry_target(entry)
+    if target is None:
+        return False, None, False
+    title, url, entry_id, video_id = target
+    if video_id is not None:
+        content = youtube_fetcher(video_id)
+        item = ProcessedItem(title=title, content=content, entry_id=entry_id)
+        return True, item, False
+
+    content, source = split_source(article_fetcher(entry_id, url))
+    if source == MINIFLUX_MARKDOWN_SOURCE:
+        content = titled_markdown(title, content)
+    item = ProcessedItem(title=title, content=content, entry_id=entry_id)
+    return True, item, source == "miniflux"
+
+
+def process_entry(
+    entry: MinifluxEntry,
+    article_fetcher: Callable[[int | None, str], str | tuple[str, str]],
+    youtube_fetcher: Callable[[str], str],
+    markdown_converter: Callable[..., str] | None = None,
+) -> tuple[bool, ProcessedItem | None]:
+    processed, item, needs_markdown = fetch_entry(
+        entry, article_fetcher, youtube_fetcher
+    )
+    if item is not None and needs_markdown:
+        converter = markdown_converter or html_to_clean_markdown
+        url = (entry.get("url") or "").strip()
+        item.content = converter(title=item.title, html=item.content, url=url)
+    return processed, item
+
+
+def log_marked(entry_ids: list[int]) -> None:
+    if entry_ids:
+        marked = ", ".join(str(entry_id) for entry_id in entry_ids)
+        logging.info("Oznaczono jako read: %s", marked)
+
+
+def log_retries(retry_policy: RetryPolicy) -> None:
+    budget = retry_policy.budget
+    if budget.spent:
+        limit = "bez limitu" if budget.limit is None else str(budget.limit)
+        logging.info("Retry: wykonano %d ponowien (budzet: %s)", budget.spent, limit)
+
+
+def export_metrics(
+    metrics: RunMetrics,
+    counts: dict[str, object],
+    metrics_path: Path | None,
+    prometheus_path: Path | None,
+) -> None:
+    slowest = [
+        f"{row['stage']}"
+        + (f"/{row['source']}" if row["source"] else "")
+        + f" {row['seconds_total']:.1f}s"
+        for row in metrics.stages()[:3]
+    ]
+    if slowest:
+        logging.info("Metryki: najdluzsze etapy: %s", ", ".join(slowest))
+    if metrics_path is not None:
+        metrics.write_json(metrics_path, counts)
+        logging.info("Metryki: raport JSON zapisany w %s", metrics_path)
+    if prometheus_path is not None:
+        metrics.write_prometheus(prometheus_path, counts)
+        logging.info("Metryki: plik Prometheus zapisany w %s", prometheus_path)
+
+
+def entry_id_for_marking(entry: MinifluxEntry) -> int | None:
+    entry_id_raw = entry.get("id")
+    if entry_id_raw is None:
+        logging.info("Brak ID wpisu, pomijam oznaczanie jako read.")
+        return None
+    try:
+        entry_id = int(entry_id_raw)
+    except (TypeError, ValueError):
+        entry_id = 0
+    if entry_id <= 0:
+        logging.info(
+            "Niepoprawny ID wpisu (%s), pomijam oznaczanie jako read.",
+            entry_id_raw,
+        )
+        return None
+    return entry_id
+
+
+def resumed_entry(
+    entry: MinifluxEntry, resumed: dict[int, JournalEntry]
+) -> JournalEntry | None:
+    """Wpis z dziennika wznawianego przebiegu (tylko dla poprawnego ID)."""
+    if not resumed:
+        return None
+    try:
+        return resumed.get(int(entry.get("id")))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+def is_delivered(journaled: JournalEntry | None) -> bool:
+    return journaled is not None and journaled.state == STATE_DELIVERED
+
+
+def deduplicated_entry(
+    entry: MinifluxEntry, deduplicator: Deduplicator
+) -> MinifluxEntry | None:
+    """Wpis bez zmian albo None, gdy ten sam URL juz byl w przebiegu.
+
+    Decyzja: oczyszczony URL jest tylko kluczem deduplikacji; pobieramy
+    `entry["url"]` tak, jak zapisal go Miniflux (np. podpisane URL).
+    """
+    url = (entry.get("url") or "").strip()
+    if not url:
+        return entry
+    title = (entry.get("title") or "").strip()
+    original = deduplicator.seen_url(url, title)
+    if original is not None:
+        logging.info("Duplikat URL: %s (jak: %s)", title or url, original)
+        return None
+    return entry
+
+
+def log_duplicates(deduplicator: Deduplicator | None) -> int:
+    if deduplicator is None or not deduplicator.duplicates:
+        return 0
+    logging.info(
+        "Dedup: %d duplikatow URL, %d duplikatow tresci "
+        "(%d znakow mniej w promptach)",
+        deduplicator.url_duplicates,
+        deduplicator.content_duplicates,
+        deduplicator.saved_chars,
+    )
+    return deduplicator.duplicates
+
+
+def log_compressed(compressor: ContentCompressor | None) -> None:
+    if compressor is not None and compressor.compressed:
+        logging.info(
+            "Kompresja: skrocono %d wpisow do %d tokenow na wpis",
+            compressor.compressed,
+            compressor.max_tokens,
+        )
+
+
+def entry_feed(entry: MinifluxEntry) -> tuple[str | None, str | None]:
+    """Tytul feedu i kategorii wpisu (do `--group-by`)."""
+    feed = entry.get("feed") or {}
+    category = feed.get("category") or {}
+    return feed.get("title") or None, category.get("title") or None
+
+
+def chunk_entry_ids(
+    chunk: PromptChunk, delivered_parts: dict[int, int] | None = None
+) -> list[int]:
+    """ID wpisow dostarczonych w calosci z chunkiem.
+
+    Wpis podzielony na czesci jest zwracany dopiero z ostatnia dostarczona
+    czescia; `delivered_parts` liczy juz dostarczone czesci.
+    """
+    delivered_parts = {} if delivered_parts is None else delivered_parts
+    entry_ids: list[int] = []
+    for item in chunk.items:
+        if item.entry_id is None:
+            continue
+        if item.parts > 1:
+            delivered_parts[item.entry_id] = delivered_parts.get(item.entry_id, 0) + 1
+            if delivered_parts[item.entry_id] < item.parts:
+                continue
+        entry_ids.append(item.entry_id)
+    return entry_ids
 
 
 def collect_article_links(entry: MinifluxEntry) -> tuple[bool, str | None]:
@@ -105,22 +319,10 @@ def collect_article_links(entry: MinifluxEntry) -> tuple[bool, str | None]:
     return True, url
 
 
-def run(
-    env_path: Path = Path(".env"),
-    environ: dict[str, str] | None = None,
-    base_url: str | None = None,
-    fetcher: Callable[[str, str], list[MinifluxEntry]] | None = None,
-    article_fetcher: Callable[[int | None, str], str | tuple[str, str]] | None = None,
-    youtube_fetcher: Callable[[str], str] | None = None,
-    marker: Callable[[str, str, int], None] | None = None,
-    clipboard: Callable[[str], None] | None = None,
-    use_playwright: bool = False,
-    interactive: bool = True,
-    input_reader: Callable[[], str] | None = None,
-    max_tokens: int = MAX_PROMPT_TOKENS,
-    tokenizer: str = "auto",
-    links_only: bool = False,
-) -> str:
+def resolve_connection(
+    env_path: Path, environ: dict[str, str] | None, base_url: str | None
+) -> tuple[str, str]:
+    """Zwraca token API i URL instancji Miniflux (argument > ENV > .env)."""
     env = environ or os.environ
     file_env = load_env(env_path)
     token = env.get("MINIFLUX_API_TOKEN") or file_env.get("MINIFLUX_API_TOKEN")
@@ -140,164 +342,603 @@ def run(
             "MINIFLUX_BASE_URL nie ustawiony, uzywam domyslnego: %s",
             resolved_base_url,
         )
-    fetcher = fetcher or fetch_unread_entries
-    entries = fetcher(resolved_base_url, token)
-    logging.info("Pobrano %d wpisow unread.", len(entries))
-    if article_fetcher is None:
-        fallback_fetcher = fetch_article_with_playwright if use_playwright else None
+    return token, resolved_base_url
 
-        def article_fetcher(entry_id: int | None, url: str) -> tuple[str, str]:
-            if entry_id is None:
-                logging.info("Brak ID wpisu, pomijam Miniflux fetch-content.")
+
+def resolve_jina_reader_url(env_path: Path, environ: dict[str, str] | None) -> str:
+    """Adres czytnika Jina (ENV > .env > r.jina.ai), np. lokalny w benchmarkach."""
+    env = environ or os.environ
+    return (
+        env.get("JINA_READER_URL")
+        or load_env(env_path).get("JINA_READER_URL")
+        or JINA_READER_URL
+    )
+
+
+def resolve_rate_limits(
+    env_path: Path,
+    environ: dict[str, str] | None,
+    overrides: dict[str, tuple[float, int]] | None,
+) -> dict[str, tuple[float, int]]:
+    """Limity zapytan per host: domyslne < RATE_LIMITS z ENV/.env < argument."""
+    env = environ or os.environ
+    value = env.get("RATE_LIMITS") or load_env(env_path).get("RATE_LIMITS") or ""
+    try:
+        limits = parse_rate_limits(value)
+    except ValueError as exc:
+        raise RuntimeError(f"Niepoprawne RATE_LIMITS: {exc}") from exc
+    limits.update(overrides or {})
+    return limits
+
+
+def resolve_pool_size(http_pool_size: int | None, parallelism: int) -> int:
+    """Pula polaczen per host: co najmniej tyle, ile wpisow jest w locie."""
+    return http_pool_size or max(HTTP_POOL_SIZE, parallelism)
+
+
+def resolve_extract_processes(extract_processes: int | None, parallelism: int) -> int:
+    if extract_processes is not None:
+        return extract_processes
+    # Decyzja: pula procesow ma sens dopiero, gdy etap sieciowy jest
+    # rownolegly; przy jednym wpisie w locie konwersja zostaje na miejscu.
+    return (os.cpu_count() or 1) if parallelism > 1 else 0
+
+
+def load_markdown_converter(
+    noise_rules_path: Path | None,
+) -> tuple[NoiseRules | None, Callable[..., str]]:
+    """Reguly szumu z pliku i konwerter HTML -> markdown, ktory ich uzywa."""
+    if noise_rules_path is None:
+        return None, html_to_clean_markdown
+    noise_rules = load_noise_rules(noise_rules_path)
+    return noise_rules, partial(html_to_clean_markdown, noise_rules=noise_rules)
+
+
+class RunState:
+    """Stan przebiegu wspolny dla `run()` i `run_async()`.
+
+    Petle obu trybow tylko pobieraja wpisy; filtr listy (`admit`), obsluga
+    wyniku (`handle_result`), dostarczenie, oznaczanie read i metryki sa
+    tutaj, zeby oba tryby liczyly i zapisywaly przebieg tak samo.
+    """
+
+    def __init__(
+        self,
+        metrics: RunMetrics,
+        links_only: bool,
+        dedup: bool,
+        compressor: ContentCompressor | None,
+        stream: bool,
+        max_tokens: int,
+        tokenizer: str,
+        encoding: str,
+        output: TextIO | None = None,
+    ) -> None:
+        self.metrics = metrics
+        self.links_only = links_only
+        self.deduplicator = Deduplicator() if dedup else None
+        self.compressor = compressor
+        self.journal: RunJournal | None = None
+        self.resumed: dict[int, JournalEntry] = {}
+        self.unread_count = 0
+        self.success = 0
+        self.failed = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.processed_items: list[ProcessedItem] = []
+        self.collected_links: list[str] = []
+        # Wpisy do oznaczenia jako read po dostarczeniu wyniku.
+        self.delivered_ids: list[int] = []
+        self._delivered_parts: dict[int, int] = {}
+        # Decyzja: w trybie strumieniowym prompty wychodza w trakcie przebiegu,
+        # a w pamieci zostaja tylko elementy biezacego chunka.
+        self.prompt_stream = (
+            PromptStream(
+                max_tokens, tokenizer, encoding, output, metrics, self.journal_prompt
+            )
+            if stream and not links_only
+            else None
+        )
+
+    def open_journal(self, journal: RunJournal, resume: bool) -> None:
+        self.journal = journal
+        self.resumed = journal.begin("links" if self.links_only else "prompts", resume)
+        self.delivered_ids.extend(
+            entry_id
+            for entry_id, journaled in self.resumed.items()
+            if is_delivered(journaled)
+        )
+
+    def journal_prompt(self, prompt: int, chunk: PromptChunk) -> None:
+        if self.journal is not None:
+            self.journal.delivered(
+                chunk_entry_ids(chunk, self._delivered_parts), prompt
+            )
+
+    def admit(self, entry: MinifluxEntry) -> MinifluxEntry | None:
+        """Wpis z listy do pobrania albo None (dostarczony wczesniej, duplikat).
+
+        Decyzja: wpisy konsumujemy strumieniowo, wiec licznik unread znamy
+        dopiero po przejsciu calej listy.
+        """
+        if is_delivered(resumed_entry(entry, self.resumed)):
+            return None
+        self.unread_count += 1
+        if self.deduplicator is None:
+            return entry
+        unique = deduplicated_entry(entry, self.deduplicator)
+        if unique is None:
+            # Duplikat nie jest pobierany, ale tez trafia do oznaczenia read.
+            duplicate_id = entry_id_for_marking(entry)
+            if duplicate_id is not None:
+                self.delivered_ids.append(duplicate_id)
+        return unique
+
+    def journaled_result(
+        self, entry: MinifluxEntry
+    ) -> tuple[bool, ProcessedItem | str | None] | None:
+        """Wynik z dziennika wznawianego przebiegu (bez pobierania) albo None."""
+        journaled = resumed_entry(entry, self.resumed)
+        if journaled is None:
+            return None
+        logging.info("Dziennik: wpis %s bez pobierania", journaled.entry_id)
+        return True, journaled.result()
+
+    def handle_failure(self, exc: RuntimeError) -> None:
+        logging.info("Blad: %s", exc)
+        self.failed += 1
+
+    def handle_result(
+        self,
+        entry: MinifluxEntry,
+        processed: bool,
+        result: ProcessedItem | str | None,
+    ) -> None:
+        if not processed:
+            self.skipped += 1
+            return
+
+        entry_id = entry_id_for_marking(entry)
+        if entry_id is not None:
+            self.delivered_ids.append(entry_id)
+            if self.journal is not None and entry_id not in self.resumed:
+                self.journal.extracted(entry_id, result)
+        if self.deduplicator is not None and isinstance(result, ProcessedItem):
+            with self.metrics.span("dedup", entry_id, cpu=True):
+                original = self.deduplicator.near_duplicate(result)
+            if original is not None:
+                logging.info("Duplikat tresci: %s (jak: %s)", result.title, original)
+                return
+        if self.compressor is not None and isinstance(result, ProcessedItem):
+            with self.metrics.span("compress", entry_id, cpu=True):
+                self.compressor.compress_item(result, entry.get("url"))
+        logging.info("Sukces")
+        self.success += 1
+        if isinstance(result, ProcessedItem):
+            result.feed, result.category = entry_feed(entry)
+            if self.prompt_stream is not None:
+                self.prompt_stream.add(result)
             else:
-                try:
-                    content = fetch_entry_content(resolved_base_url, token, entry_id)
-                    logging.info("Content source selected: miniflux")
-                    return content, "miniflux"
-                except ContentFetchError as exc:
-                    logging.info("Miniflux fetch-content error (%s)", exc)
-            return fetch_article_with_fallback(
-                url, use_playwright=use_playwright, fallback_fetcher=fallback_fetcher
-            ), "fallback"
-    youtube_fetcher = youtube_fetcher or fetch_youtube_transcript
-    marker = marker or mark_entry_read
-    clipboard = clipboard or copy_to_clipboard
-
-    success = 0
-    failed = 0
-    skipped = 0
-    processed_items: list[ProcessedItem] = []
-    collected_links: list[str] = []
-    for entry in entries:
-        if links_only:
-            processed, link = collect_article_links(entry)
-            item = None
-            if processed and link is not None:
-                collected_links.append(link)
-        else:
+                self.processed_items.append(result)
+        elif result is not None:
+            self.collected_links.append(result)
+
+    def deliver(
+        self,
+        interactive: bool,
+        input_reader: Callable[[], str] | None,
+        clipboard: Callable[[str], None],
+        max_tokens: int,
+        tokenizer: str,
+        encoding: str,
+        packing: str,
+        group_by: str | None,
+    ) -> str:
+        logging.info("Pobrano %d wpisow unread.", self.unread_count)
+        self.duplicates = log_duplicates(self.deduplicator)
+        log_compressed(self.compressor)
+        summary = (
+            f"Unread entries: {self.unread_count}; Success: {self.success}; "
+            f"Failed: {self.failed}; Skipped: {self.skipped}"
+        ) + (f"; Duplicates: {self.duplicates}" if self.duplicates else "")
+        if self.prompt_stream is not None:
+            return self.prompt_stream.finish(summary)
+        return deliver_results(
+            summary,
+            self.processed_items,
+            self.collected_links,
+            links_only=self.links_only,
+            interactive=interactive,
+            input_reader=input_reader,
+            clipboard=clipboard,
+            max_tokens=max_tokens,
+            tokenizer=tokenizer,
+            encoding=encoding,
+            packing=packing,
+            group_by=group_by,
+            metrics=self.metrics,
+            on_delivered=self.journal_prompt,
+        )
+
+    def record_marked(self, entry_ids: list[int]) -> None:
+        log_marked(entry_ids)
+        if self.journal is not None:
+            self.journal.read(entry_ids)
+
+    def mark_delivered(
+        self,
+        mark_read: Callable[[int], None],
+        flush: Callable[[], list[int]] | None = None,
+    ) -> None:
+        """Oznacza read dostarczone wpisy; `flush` wysyla ostatnia paczke.
+
+        Decyzja: oznaczanie read dopiero po dostarczeniu wyniku, zeby
+        przerwany przebieg nie gubil wpisow, ktore nie trafily do promptu.
+        """
+        if self.journal is not None:
+            self.journal.delivered(self.delivered_ids)
+        for entry_id in self.delivered_ids:
             try:
-                processed, item = process_entry(
-                    entry,
-                    article_fetcher=article_fetcher,
-                    youtube_fetcher=youtube_fetcher,
-                )
+                mark_read(entry_id)
             except RuntimeError as exc:
-                logging.info("Blad: %s", exc)
-                failed += 1
-                continue
+                logging.info("Blad oznaczania read: %s", exc)
+        if flush is not None:
+            try:
+                with self.metrics.span("mark-read"):
+                    flushed = flush()
+                self.record_marked(flushed)
+            except RuntimeError as exc:
+                logging.info("Blad oznaczania read: %s", exc)
+        if self.journal is not None:
+            self.journal.finish()
 
-        if processed:
-            entry_id_raw = entry.get("id")
-            if entry_id_raw is None:
-                logging.info("Brak ID wpisu, pomijam oznaczanie jako read.")
-            else:
-                try:
-                    entry_id = int(entry_id_raw)
-                except (TypeError, ValueError):
-                    logging.info(
-                        "Niepoprawny ID wpisu (%s), pomijam oznaczanie jako read.",
-                        entry_id_raw,
-                    )
-                else:
-                    if entry_id <= 0:
-                        logging.info(
-                            "Niepoprawny ID wpisu (%s), pomijam oznaczanie jako read.",
-                            entry_id_raw,
-                        )
-                    else:
-                        try:
-                            marker(resolved_base_url, token, entry_id)
-                            logging.info("Oznaczono jako read: %s", entry_id)
-                        except RuntimeError as exc:
-                            logging.info("Blad oznaczania read: %s", exc)
-            logging.info("Sukces")
-            success += 1
-            if item is not None:
-                processed_items.append(item)
-        else:
-            skipped += 1
+    async def mark_delivered_async(
+        self,
+        mark_read: Callable[[int], Awaitable[None]],
+        flush: Callable[[], Awaitable[list[int]]] | None = None,
+    ) -> None:
+        """Wersja `mark_delivered` dla trybu asyncio."""
+        if self.journal is not None:
+            self.journal.delivered(self.delivered_ids)
+        for entry_id in self.delivered_ids:
+            try:
+                await mark_read(entry_id)
+            except RuntimeError as exc:
+                logging.info("Blad oznaczania read: %s", exc)
+        if flush is not None:
+            try:
+                with self.metrics.span("mark-read"):
+                    flushed = await flush()
+                self.record_marked(flushed)
+            except RuntimeError as exc:
+                logging.info("Blad oznaczania read: %s", exc)
+        if self.journal is not None:
+            self.journal.finish()
 
-    if links_only:
-        summary = (
-            f"Unread entries: {len(entries)}; Success: {success}; "
-            f"Failed: {failed}; Skipped: {skipped}"
+    def finish(
+        self,
+        retry_policy: RetryPolicy,
+        rate_limiter: HostRateLimiter,
+        hedging: Hedging | None,
+        metrics_path: Path | None,
+        prometheus_path: Path | None,
+    ) -> None:
+        log_retries(retry_policy)
+        rate_limiter.log_stats()
+        if hedging is not None:
+            hedging.log_stats()
+        export_metrics(
+            self.metrics,
+            {
+                "unread": self.unread_count,
+                "success": self.success,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "duplicates": self.duplicates,
+            },
+            metrics_path,
+            prometheus_path,
         )
-        links_output = "\n".join(collected_links)
-        if not links_output:
-            logging.info("Brak przetworzonych wpisow, schowek nie jest nadpisywany.")
-            return summary
-
-        if interactive:
-            input_reader = input_reader or (lambda: input())
-            logging.info("Press [Enter] to copy links")
-            input_reader()
-            clipboard(links_output)
-            logging.info("Copied links (%s)", len(collected_links))
-        else:
-            print(links_output)
-        return f"{summary}; Links: {len(collected_links)}"
 
-    full_prompt = build_prompt(processed_items)
-    prompts = build_prompts_with_chunking(
-        processed_items, max_tokens=max_tokens, tokenizer=tokenizer
+
+def run(
+    options: RunOptions | None = None,
+    *,
+    environ: dict[str, str] | None = None,
+    fetcher: Callable[[str, str], Iterable[MinifluxEntry]] | None = None,
+    article_fetcher: Callable[[int | None, str], str | tuple[str, str]] | None = None,
+    youtube_fetcher: Callable[[str], str] | None = None,
+    marker: Callable[[str, str, int], None] | None = None,
+    clipboard: Callable[[str], None] | None = None,
+    input_reader: Callable[[], str] | None = None,
+    **overrides: object,
+) -> str:
+    """Przebieg: lista wpisow, pobranie tresci, dostarczenie, oznaczenie read.
+
+    Ustawienia przychodza w `options` (budowane w `cli`); `overrides` nadpisuja
+    pojedyncze pola `RunOptions`, a pozostale argumenty podmieniaja zaleznosci.
+    """
+    options = replace(options or RunOptions(), **overrides)
+    if options.async_mode:
+        # Decyzja: import lokalny, bo async_app korzysta z helperow tego modulu.
+        from miniflux_prompt_compiler.async_app import run_async
+
+        return asyncio.run(
+            run_async(
+                options,
+                environ=environ,
+                fetcher=fetcher,
+                article_fetcher=article_fetcher,
+                youtube_fetcher=youtube_fetcher,
+                marker=marker,
+                clipboard=clipboard,
+                input_reader=input_reader,
+            )
+        )
+    token, resolved_base_url = resolve_connection(
+        options.env_path, environ, options.base_url
+    )
+    metrics = RunMetrics()
+    # Decyzja: tryb --links nie wykonuje I/O na wpis, wiec zostaje sekwencyjny.
+    entry_workers = 1 if options.links_only else options.workers
+    # Decyzja: jedna sesja z pula keep-alive dla Miniflux i Jiny oraz osobna dla
+    # YouTube, bo youtube_transcript_api modyfikuje naglowki i cookies sesji.
+    pool_size = resolve_pool_size(options.http_pool_size, entry_workers)
+    rate_limiter = HostRateLimiter(
+        resolve_rate_limits(options.env_path, environ, options.rate_limits)
+    )
+    session = create_session(pool_size, rate_limiter=rate_limiter)
+    youtube_session = create_session(pool_size, rate_limiter=rate_limiter)
+    # Decyzja: jedna polityka i jeden budzet ponowien dla wszystkich upstreamow,
+    # zeby throttling jednego serwisu nie mnozyl ponowien w kazdym watku.
+    retry_policy = RetryPolicy(
+        attempts=options.retry_attempts, budget=RetryBudget(options.retry_budget)
     )
-    summary = (
-        f"Unread entries: {len(entries)}; Success: {success}; "
-        f"Failed: {failed}; Skipped: {skipped}"
+    fetcher = fetcher or partial(
+        iter_unread_entries, session=session, retry_policy=retry_policy
     )
-    if not full_prompt or not prompts:
-        logging.info("Brak przetworzonych wpisow, schowek nie jest nadpisywany.")
-        return summary
-
-    total_tokens = count_tokens(full_prompt, tokenizer=tokenizer)
-    total_label = label_for_tokens(total_tokens)
-
-    if len(prompts) == 1:
-        if interactive:
-            input_reader = input_reader or (lambda: input())
-            logging.info("Press [Enter] to copy prompt 1/1")
-            input_reader()
-            clipboard(prompts[0])
-            logging.info(
-                "Copied prompt 1/1 (%s tokenow - %s)",
-                total_tokens,
-                color_label(total_label),
+    extract_processes = resolve_extract_processes(
+        options.extract_processes, entry_workers
+    )
+    noise_rules, markdown_converter = load_markdown_converter(
+        options.noise_rules_path
+    )
+    state = RunState(
+        metrics,
+        links_only=options.links_only,
+        dedup=options.dedup,
+        compressor=(
+            ContentCompressor(
+                options.max_item_tokens,
+                options.tokenizer,
+                options.encoding,
+                noise_rules,
             )
-        else:
-            token_count = count_tokens(prompts[0], tokenizer=tokenizer)
-            label = label_for_tokens(token_count)
-            print(f"Prompt 1/1 ({token_count} tokenow - {color_label(label)})")
-            print(prompts[0])
-        return f"{summary}; Tokens: {total_tokens}; Label: {total_label}"
-
-    logging.info("Total tokens: %s -> %s", total_tokens, color_label(total_label))
-    logging.info("Generated prompts: %s", len(prompts))
-    if interactive:
-        input_reader = input_reader or (lambda: input())
-        for index, prompt in enumerate(prompts, start=1):
-            logging.info("Press [Enter] to copy prompt %s/%s", index, len(prompts))
-            input_reader()
-            clipboard(prompt)
-            token_count = count_tokens(prompt, tokenizer=tokenizer)
-            label = label_for_tokens(token_count)
-            logging.info(
-                "Copied prompt %s/%s (%s tokenow - %s)",
-                index,
-                len(prompts),
-                token_count,
-                color_label(label),
+            if options.max_item_tokens is not None and not options.links_only
+            else None
+        ),
+        stream=options.stream,
+        max_tokens=options.max_tokens,
+        tokenizer=options.tokenizer,
+        encoding=options.encoding,
+        output=options.output,
+    )
+
+    def counted_entries() -> Iterator[MinifluxEntry]:
+        for entry in metrics.timed_iter("list", fetcher(resolved_base_url, token)):
+            admitted = state.admit(entry)
+            if admitted is not None:
+                yield admitted
+
+    limiter = UpstreamLimiter(options.upstream_limits)
+    browser_pool: PlaywrightBrowserPool | None = None
+    router: SourceRouter | None = None
+    hedging: Hedging | None = None
+    if article_fetcher is None:
+        fallback_fetcher = None
+        if options.use_playwright:
+            # Decyzja: jedna przegladarka na przebieg, startowana leniwie przy
+            # pierwszym fallbacku i zamykana razem z zasobami `run()`.
+            browser_pool = PlaywrightBrowserPool(max_pages=options.playwright_pages)
+            fallback_fetcher = browser_pool.fetch
+        # Decyzja: statystyki zrodel sa trwale tylko razem z cache; bez niego
+        # router uczy sie w obrebie jednego przebiegu.
+        router = (
+            SourceRouter.in_dir(
+                options.cache_dir, probe_rate=options.route_probe_rate
+            )
+            if options.cache_dir is not None
+            else SourceRouter(probe_rate=options.route_probe_rate)
+        )
+        active_router = router
+        if options.hedge_percentile is not None:
+            # Decyzja: osobna pula dla zapytan wyscigu, zeby porzucone zapytania
+            # nie blokowaly watkow przetwarzajacych wpisy.
+            hedging = Hedging(
+                options.hedge_percentile,
+                executor=ThreadPoolExecutor(
+                    max_workers=2 * options.workers + 2, thread_name_prefix="hedge"
+                ),
             )
-    else:
-        for index, prompt in enumerate(prompts, start=1):
-            token_count = count_tokens(prompt, tokenizer=tokenizer)
-            label = label_for_tokens(token_count)
-            print(
-                f"Prompt {index}/{len(prompts)} "
-                f"({token_count} tokenow - {color_label(label)})"
+        active_hedging = hedging
+        jina_fetcher = limiter.wrap(
+            "jina",
+            partial(
+                fetch_article_markdown,
+                session=session,
+                retry_policy=retry_policy,
+                reader_url=resolve_jina_reader_url(options.env_path, environ),
+            ),
+        )
+
+        def miniflux_fetcher(entry_id: int, url: str) -> str:
+            with limiter.slot("miniflux"):
+                html = fetch_entry_content(
+                    resolved_base_url,
+                    token,
+                    entry_id,
+                    session=session,
+                    retry_policy=retry_policy,
+                )
+            # Decyzja: konwersja w zrodle, bo dopiero jej wynik mowi, czy
+            # Miniflux dal tresc, czy routing ma sprobowac kolejnego zrodla.
+            # Tytul dokleja `fetch_entry`, wiec wynik nie zalezy od wpisu.
+            if submit_markdown is not None:
+                return markdown_body(submit_markdown("", html, url).result())
+            return markdown_body(markdown_converter(title="", html=html, url=url))
+
+        def article_fetcher(entry_id: int | None, url: str) -> tuple[str, str]:
+            sources: dict[str, Callable[[], str]] = {}
+            if entry_id is None:
+                logging.info("Brak ID wpisu, pomijam Miniflux fetch-content.")
+            else:
+                sources["miniflux"] = partial(miniflux_fetcher, entry_id, url)
+            sources["jina"] = partial(jina_fetcher, url)
+            if fallback_fetcher is not None:
+                sources["playwright"] = partial(fallback_fetcher, url)
+            timed_sources = {
+                name: metrics.timed("article", fetch, entry_id, name)
+                for name, fetch in sources.items()
+            }
+            return routed_result(
+                *fetch_routed(active_router, url, timed_sources, active_hedging)
             )
-            print(prompt)
+    youtube_fetcher = metrics.timed(
+        "youtube",
+        limiter.wrap(
+            "youtube",
+            youtube_fetcher
+            or partial(
+                fetch_youtube_transcript,
+                session=youtube_session,
+                retry_policy=retry_policy,
+            ),
+        ),
+    )
+    batch_marker: BatchReadMarker | None = None
+    if marker is None:
+        batch_marker = BatchReadMarker(
+            resolved_base_url,
+            token,
+            batch_size=options.mark_batch_size,
+            session=session,
+            retry_policy=retry_policy,
+        )
 
-    return (
-        f"{summary}; Prompts: {len(prompts)}; "
-        f"Tokens: {total_tokens}; Label: {total_label}"
+    def mark_read(entry_id: int) -> None:
+        marked = [entry_id]
+        with metrics.span("mark-read", entry_id):
+            if marker is not None:
+                marker(resolved_base_url, token, entry_id)
+            elif batch_marker is not None:
+                marked = batch_marker.add(entry_id)
+        state.record_marked(marked)
+
+    clipboard = metrics.timed("clipboard", clipboard or copy_to_clipboard)
+
+    markdown_converter = metrics.timed("trafilatura", markdown_converter)
+
+    with ExitStack() as resources:
+        resources.enter_context(session)
+        resources.enter_context(youtube_session)
+        if browser_pool is not None:
+            resources.enter_context(browser_pool)
+        if router is not None:
+            resources.enter_context(router)
+        if hedging is not None and hedging.executor is not None:
+            # Decyzja: bez czekania na porzucone zapytania przegrane w wyscigu.
+            resources.callback(
+                hedging.executor.shutdown, wait=False, cancel_futures=True
+            )
+        submit_markdown: Callable[[str, str, str], Future[str]] | None = None
+        if extract_processes > 0 and not options.links_only:
+            pool = resources.enter_context(
+                MarkdownExtractionPool(
+                    max_workers=extract_processes, noise_rules=noise_rules
+                )
+            )
+            # Decyzja: czas konwersji w puli liczony do zakonczenia zadania,
+            # wiec obejmuje tez czekanie w kolejce procesow.
+            submit_markdown = metrics.timed_submitter("trafilatura", pool.submit)
+        if options.cache_dir is not None:
+            cache = resources.enter_context(ContentCache.in_dir(options.cache_dir))
+            article_fetcher = cached_article_fetcher(cache, article_fetcher)
+            youtube_fetcher = cached_youtube_fetcher(cache, youtube_fetcher)
+            # Decyzja: odcisk regul w kluczu, zeby zmiana pliku regul
+            # uniewaznila zapisany markdown.
+            rules_key = noise_rules.fingerprint if noise_rules else ""
+            markdown_converter = cached_markdown_converter(
+                cache, markdown_converter, rules_key
+            )
+            if submit_markdown is not None:
+                submit_markdown = cached_markdown_submitter(
+                    cache, submit_markdown, rules_key
+                )
+
+        # Decyzja: dziennik w osobnym katalogu stanu, zeby wylaczenie cache
+        # tresci nie wylaczalo wznawiania przerwanego przebiegu.
+        if options.state_dir is not None:
+            state.open_journal(
+                resources.enter_context(RunJournal.in_dir(options.state_dir)),
+                options.resume,
+            )
+
+        def handle_entry(
+            entry: MinifluxEntry,
+        ) -> tuple[bool, ProcessedItem | str | None, Future[str] | None]:
+            journaled = state.journaled_result(entry)
+            if journaled is not None:
+                return *journaled, None
+            if options.links_only:
+                return *collect_article_links(entry), None
+            if submit_markdown is None:
+                return *process_entry(
+                    entry,
+                    article_fetcher=article_fetcher,
+                    youtube_fetcher=youtube_fetcher,
+                    markdown_converter=markdown_converter,
+                ), None
+            # Decyzja: watek sieciowy tylko zleca konwersje i wraca po kolejny
+            # wpis; wynik odbiera petla glowna w kolejnosci wpisow.
+            processed, item, needs_markdown = fetch_entry(
+                entry, article_fetcher, youtube_fetcher
+            )
+            if item is None or not needs_markdown:
+                return processed, item, None
+            url = (entry.get("url") or "").strip()
+            return processed, item, submit_markdown(item.title, item.content, url)
+
+        for entry, outcome in ordered_map(
+            handle_entry, counted_entries(), workers=entry_workers
+        ):
+            try:
+                processed, result, markdown = outcome.result()
+                if markdown is not None and isinstance(result, ProcessedItem):
+                    result.content = markdown.result()
+            except RuntimeError as exc:
+                state.handle_failure(exc)
+                continue
+            state.handle_result(entry, processed, result)
+
+        message = state.deliver(
+            interactive=options.interactive,
+            input_reader=input_reader,
+            clipboard=clipboard,
+            max_tokens=options.max_tokens,
+            tokenizer=options.tokenizer,
+            encoding=options.encoding,
+            packing=options.packing,
+            group_by=options.group_by,
+        )
+        state.mark_delivered(
+            mark_read, batch_marker.flush if batch_marker is not None else None
+        )
+
+    state.finish(
+        retry_policy,
+        rate_limiter,
+        hedging,
+        options.metrics_path,
+        options.prometheus_path,
     )
+    return message
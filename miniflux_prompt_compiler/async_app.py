@@ -0,0 +1,377 @@
+import asyncio
+import inspect
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AsyncExitStack
+from dataclasses import replace
+from functools import partial
+
+from miniflux_prompt_compiler.adapters.clipboard import copy_to_clipboard
+from miniflux_prompt_compiler.adapters.content_cache import (
+    ContentCache,
+    cached_article_fetcher_async,
+    cached_markdown_converter,
+    cached_markdown_submitter,
+    cached_youtube_fetcher,
+)
+from miniflux_prompt_compiler.adapters.http_client import (
+    create_async_client,
+    create_session,
+)
+from miniflux_prompt_compiler.adapters.jina import fetch_article_markdown_async
+from miniflux_prompt_compiler.adapters.miniflux_http import (
+    AsyncBatchReadMarker,
+    fetch_entry_content_async,
+    iter_unread_entries_async,
+)
+from miniflux_prompt_compiler.adapters.playwright_fetch import PlaywrightBrowserPool
+from miniflux_prompt_compiler.adapters.retry import RetryBudget, RetryPolicy
+from miniflux_prompt_compiler.adapters.run_journal import RunJournal
+from miniflux_prompt_compiler.adapters.source_routing import (
+    Hedging,
+    SourceRouter,
+    fetch_routed_async,
+)
+from miniflux_prompt_compiler.adapters.trafilatura_markdown import (
+    MarkdownExtractionPool,
+    markdown_body,
+    titled_markdown,
+)
+from miniflux_prompt_compiler.adapters.youtube import fetch_youtube_transcript
+from miniflux_prompt_compiler.app import (
+    MINIFLUX_MARKDOWN_SOURCE,
+    RunState,
+    collect_article_links,
+    entry_target,
+    load_markdown_converter,
+    resolve_connection,
+    resolve_extract_processes,
+    resolve_jina_reader_url,
+    resolve_pool_size,
+    resolve_rate_limits,
+    routed_result,
+    split_source,
+)
+from miniflux_prompt_compiler.concurrency import (
+    HostRateLimiter,
+    UpstreamLimiter,
+    ordered_map_async,
+)
+from miniflux_prompt_compiler.core.compression import ContentCompressor
+from miniflux_prompt_compiler.metrics import RunMetrics
+from miniflux_prompt_compiler.options import RunOptions
+from miniflux_prompt_compiler.types import MinifluxEntry, ProcessedItem
+
+ASYNC_CONCURRENCY = 64
+
+
+async def call_maybe_async(func: Callable[..., object], *args: object) -> object:
+    """Wywoluje funkcje async bezposrednio, a blokujaca w watku pomocniczym."""
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+async def iterate_entries(
+    fetcher: Callable[[str, str], object], base_url: str, token: str
+) -> AsyncIterator[MinifluxEntry]:
+    if inspect.isasyncgenfunction(fetcher):
+        source = fetcher(base_url, token)
+    else:
+        source = await asyncio.to_thread(fetcher, base_url, token)
+    if hasattr(source, "__aiter__"):
+        async for entry in source:  # type: ignore[union-attr]
+            yield entry
+        return
+    # Decyzja: zrodlo synchroniczne (np. paginator `requests`) jest pobierane
+    # w watku pomocniczym element po elemencie, zeby czekanie na kolejna strone
+    # nie blokowalo petli zdarzen i pobierania tresci juz wpuszczonych wpisow.
+    iterator = iter(source)  # type: ignore[call-overload]
+    done = object()
+    while True:
+        entry = await asyncio.to_thread(next, iterator, done)
+        if entry is done:
+            return
+        yield entry
+
+
+async def run_async(
+    options: RunOptions | None = None,
+    *,
+    environ: dict[str, str] | None = None,
+    fetcher: Callable[[str, str], object] | None = None,
+    article_fetcher: Callable[[int | None, str], object] | None = None,
+    youtube_fetcher: Callable[[str], str] | None = None,
+    marker: Callable[[str, str, int], object] | None = None,
+    clipboard: Callable[[str], None] | None = None,
+    input_reader: Callable[[], str] | None = None,
+    **overrides: object,
+) -> str:
+    """Przebieg w jednej petli asyncio; wynik i efekty jak w `run()`.
+
+    Wpisy sa przetwarzane wspolbieznie (do `concurrency` w locie), a wyniki
+    odbierane w kolejnosci wpisow. Blokujace elementy (YouTube, konwersja
+    HTML bez puli procesow, wstrzykniete funkcje synchroniczne) ida przez
+    `asyncio.to_thread`.
+    """
+    options = replace(options or RunOptions(), **overrides)
+    concurrency = options.async_concurrency or ASYNC_CONCURRENCY
+    token, resolved_base_url = resolve_connection(
+        options.env_path, environ, options.base_url
+    )
+    metrics = RunMetrics()
+    limiter = UpstreamLimiter(options.upstream_limits)
+    retry_policy = RetryPolicy(
+        attempts=options.retry_attempts, budget=RetryBudget(options.retry_budget)
+    )
+    entry_limit = 1 if options.links_only else concurrency
+    pool_size = resolve_pool_size(options.http_pool_size, entry_limit)
+    rate_limiter = HostRateLimiter(
+        resolve_rate_limits(options.env_path, environ, options.rate_limits)
+    )
+    extract_processes = resolve_extract_processes(
+        options.extract_processes, entry_limit
+    )
+    noise_rules, markdown_converter = load_markdown_converter(
+        options.noise_rules_path
+    )
+    state = RunState(
+        metrics,
+        links_only=options.links_only,
+        dedup=options.dedup,
+        compressor=(
+            ContentCompressor(
+                options.max_item_tokens,
+                options.tokenizer,
+                options.encoding,
+                noise_rules,
+            )
+            if options.max_item_tokens is not None and not options.links_only
+            else None
+        ),
+        stream=options.stream,
+        max_tokens=options.max_tokens,
+        tokenizer=options.tokenizer,
+        encoding=options.encoding,
+        output=options.output,
+    )
+    clipboard = metrics.timed("clipboard", clipboard or copy_to_clipboard)
+
+    # Decyzja: w asyncio wyscig nie potrzebuje puli; przegrany jest anulowany.
+    hedging = (
+        Hedging(options.hedge_percentile)
+        if options.hedge_percentile is not None
+        else None
+    )
+
+    async with AsyncExitStack() as resources:
+        client = await resources.enter_async_context(
+            create_async_client(pool_size, rate_limiter=rate_limiter)
+        )
+        # Decyzja: YouTube idzie przez watki, ale kubelki tokenow sa wspolne,
+        # bo `HostRateLimiter` rezerwuje tokeny pod blokada watkowa.
+        youtube_session = resources.enter_context(
+            create_session(pool_size, rate_limiter=rate_limiter)
+        )
+
+        if fetcher is None:
+            fetcher = partial(
+                iter_unread_entries_async, client, retry_policy=retry_policy
+            )
+
+        router: SourceRouter | None = None
+        if article_fetcher is None:
+            fallback_fetcher = None
+            if options.use_playwright:
+                browser_pool = resources.enter_context(
+                    PlaywrightBrowserPool(max_pages=options.playwright_pages)
+                )
+                fallback_fetcher = browser_pool.fetch_async
+
+            reader_url = resolve_jina_reader_url(options.env_path, environ)
+
+            async def jina_fetcher(url: str) -> str:
+                async with limiter.async_slot("jina"):
+                    return await fetch_article_markdown_async(
+                        client, url, retry_policy=retry_policy, reader_url=reader_url
+                    )
+
+            async def miniflux_fetcher(entry_id: int, url: str) -> str:
+                async with limiter.async_slot("miniflux"):
+                    html = await fetch_entry_content_async(
+                        client,
+                        resolved_base_url,
+                        token,
+                        entry_id,
+                        retry_policy=retry_policy,
+                    )
+                # Decyzja: konwersja w zrodle, jak w `run()`, zeby pusta
+                # ekstrakcja przelaczala routing na kolejne zrodlo.
+                return markdown_body(await to_markdown("", html, url))
+
+            router = resources.enter_context(
+                SourceRouter.in_dir(
+                    options.cache_dir, probe_rate=options.route_probe_rate
+                )
+                if options.cache_dir is not None
+                else SourceRouter(probe_rate=options.route_probe_rate)
+            )
+
+            async def fetch_article(entry_id: int | None, url: str) -> tuple[str, str]:
+                sources: dict[str, Callable[[], Awaitable[str]]] = {}
+                if entry_id is None:
+                    logging.info("Brak ID wpisu, pomijam Miniflux fetch-content.")
+                else:
+                    sources["miniflux"] = partial(miniflux_fetcher, entry_id, url)
+                sources["jina"] = partial(jina_fetcher, url)
+                if fallback_fetcher is not None:
+                    sources["playwright"] = partial(fallback_fetcher, url)
+                timed_sources = {
+                    name: metrics.timed_async("article", fetch, entry_id, name)
+                    for name, fetch in sources.items()
+                }
+                return routed_result(
+                    *await fetch_routed_async(router, url, timed_sources, hedging)
+                )
+
+            article_source = fetch_article
+        else:
+            injected = article_fetcher
+
+            async def article_source(
+                entry_id: int | None, url: str
+            ) -> str | tuple[str, str]:
+                return await call_maybe_async(injected, entry_id, url)  # type: ignore[return-value]
+
+        markdown_converter = metrics.timed("trafilatura", markdown_converter)
+        youtube_source = metrics.timed(
+            "youtube",
+            youtube_fetcher
+            or partial(
+                fetch_youtube_transcript,
+                session=youtube_session,
+                retry_policy=retry_policy,
+            ),
+        )
+
+        submit_markdown = None
+        if extract_processes > 0 and not options.links_only:
+            pool = resources.enter_context(
+                MarkdownExtractionPool(
+                    max_workers=extract_processes, noise_rules=noise_rules
+                )
+            )
+            submit_markdown = metrics.timed_submitter("trafilatura", pool.submit)
+        if options.cache_dir is not None:
+            cache = resources.enter_context(ContentCache.in_dir(options.cache_dir))
+            article_source = cached_article_fetcher_async(cache, article_source)
+            youtube_source = cached_youtube_fetcher(cache, youtube_source)
+            rules_key = noise_rules.fingerprint if noise_rules else ""
+            markdown_converter = cached_markdown_converter(
+                cache, markdown_converter, rules_key
+            )
+            if submit_markdown is not None:
+                submit_markdown = cached_markdown_submitter(
+                    cache, submit_markdown, rules_key
+                )
+        if options.state_dir is not None:
+            state.open_journal(
+                resources.enter_context(RunJournal.in_dir(options.state_dir)),
+                options.resume,
+            )
+
+        batch_marker: AsyncBatchReadMarker | None = None
+        if marker is None:
+            batch_marker = AsyncBatchReadMarker(
+                client,
+                resolved_base_url,
+                token,
+                batch_size=options.mark_batch_size,
+                retry_policy=retry_policy,
+            )
+
+        async def mark_read(entry_id: int) -> None:
+            marked = [entry_id]
+            with metrics.span("mark-read", entry_id):
+                if marker is not None:
+                    await call_maybe_async(marker, resolved_base_url, token, entry_id)
+                elif batch_marker is not None:
+                    marked = await batch_marker.add(entry_id)
+            state.record_marked(marked)
+
+        async def to_markdown(title: str, html: str, url: str) -> str:
+            if submit_markdown is not None:
+                return await asyncio.wrap_future(submit_markdown(title, html, url))
+            return await asyncio.to_thread(
+                partial(markdown_converter, title=title, html=html, url=url)
+            )
+
+        async def handle_entry(
+            entry: MinifluxEntry,
+        ) -> tuple[bool, ProcessedItem | str | None]:
+            journaled = state.journaled_result(entry)
+            if journaled is not None:
+                return journaled
+            if options.links_only:
+                return collect_article_links(entry)
+            target = entry_target(entry)
+            if target is None:
+                return False, None
+            title, url, entry_id, video_id = target
+            if video_id is not None:
+                async with limiter.async_slot("youtube"):
+                    content = await asyncio.to_thread(youtube_source, video_id)
+                return True, ProcessedItem(
+                    title=title, content=content, entry_id=entry_id
+                )
+            content, source = split_source(await article_source(entry_id, url))
+            if source == "miniflux":
+                content = await to_markdown(title, content, url)
+            elif source == MINIFLUX_MARKDOWN_SOURCE:
+                content = titled_markdown(title, content)
+            return True, ProcessedItem(
+                title=title, content=content, entry_id=entry_id
+            )
+
+        async def counted_entries() -> AsyncIterator[MinifluxEntry]:
+            async for entry in metrics.timed_aiter(
+                "list", iterate_entries(fetcher, resolved_base_url, token)
+            ):
+                admitted = state.admit(entry)
+                if admitted is not None:
+                    yield admitted
+
+        async for entry, task in ordered_map_async(
+            handle_entry, counted_entries(), limit=entry_limit
+        ):
+            try:
+                processed, result = task.result()
+            except RuntimeError as exc:
+                state.handle_failure(exc)
+                continue
+            state.handle_result(entry, processed, result)
+
+        message = state.deliver(
+            interactive=options.interactive,
+            input_reader=input_reader,
+            clipboard=clipboard,
+            max_tokens=options.max_tokens,
+            tokenizer=options.tokenizer,
+            encoding=options.encoding,
+            packing=options.packing,
+            group_by=options.group_by,
+        )
+        # Decyzja: oznaczanie read po dostarczeniu wyniku, jak w `run()`;
+        # klient HTTP musi byc jeszcze otwarty.
+        await state.mark_delivered_async(
+            mark_read, batch_marker.flush if batch_marker is not None else None
+        )
+
+    state.finish(
+        retry_policy,
+        rate_limiter,
+        hedging,
+        options.metrics_path,
+        options.prometheus_path,
+    )
+    return message
@@ -1,12 +1,71 @@
 import argparse
 import logging
 import sys
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TextIO
 
+from miniflux_prompt_compiler.adapters.http_client import HTTP_POOL_SIZE
+from miniflux_prompt_compiler.adapters.miniflux_http import MARK_READ_BATCH_SIZE
+from miniflux_prompt_compiler.adapters.playwright_fetch import PLAYWRIGHT_MAX_PAGES
+from miniflux_prompt_compiler.adapters.retry import RETRY_ATTEMPTS, RETRY_BUDGET
+from miniflux_prompt_compiler.adapters.run_journal import DEFAULT_STATE_DIR
 from miniflux_prompt_compiler.app import run
+from miniflux_prompt_compiler.async_app import ASYNC_CONCURRENCY
+from miniflux_prompt_compiler.concurrency import RATE_LIMITS, UPSTREAM_LIMITS
+from miniflux_prompt_compiler.config import parse_rate_limits
+from miniflux_prompt_compiler.core.chunking import GROUP_BY_OPTIONS, PACKING_OPTIONS
+from miniflux_prompt_compiler.core.source_routing import ROUTE_PROBE_RATE
 from miniflux_prompt_compiler.core.tokenization import (
+    DEFAULT_ENCODING,
+    ENCODING_OPTIONS,
     MAX_PROMPT_TOKENS,
     TOKENIZER_OPTIONS,
 )
+from miniflux_prompt_compiler.options import RunOptions
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Wartosc musi byc >= 1: {value}")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"Wartosc musi byc >= 0: {value}")
+    return number
+
+
+def probability(value: str) -> float:
+    number = float(value)
+    if not 0 <= number <= 1:
+        raise argparse.ArgumentTypeError(f"Wartosc musi byc z zakresu 0-1: {value}")
+    return number
+
+
+def percentile(value: str) -> float:
+    number = float(value)
+    if not 0 < number < 100:
+        raise argparse.ArgumentTypeError(
+            f"Percentyl musi byc z zakresu (0, 100): {value}"
+        )
+    return number
+
+
+def rate_limit_spec(value: str) -> dict[str, tuple[float, int]]:
+    try:
+        return parse_rate_limits(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def format_rate_limits(limits: dict[str, tuple[float, int]]) -> str:
+    return ", ".join(
+        f"{host}={rate:g}:{burst}" for host, (rate, burst) in limits.items()
+    )
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
@@ -16,6 +75,15 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         action="store_true",
         help="Wlacz fallback Playwright po bledzie Jiny.",
     )
+    parser.add_argument(
+        "--playwright-pages",
+        type=positive_int,
+        default=PLAYWRIGHT_MAX_PAGES,
+        help=(
+            "Maksymalna liczba jednoczesnych stron Playwright we wspolnej "
+            f"przegladarce (domyslnie {PLAYWRIGHT_MAX_PAGES})."
+        ),
+    )
     interactive_group = parser.add_mutually_exclusive_group()
     interactive_group.add_argument(
         "--interactive",
@@ -30,18 +98,67 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         help="Wylacz tryb interaktywny (wypisz prompty do stdout).",
     )
     parser.set_defaults(interactive=True)
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Wypisuj kazdy prompt, gdy tylko sie zapelni, w trakcie pobierania "
+            "kolejnych wpisow (wymaga --no-interactive)."
+        ),
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help=(
+            "Plik lub pipe na prompty w trybie --stream ('-' lub domyslnie "
+            "stdout)."
+        ),
+    )
     parser.add_argument(
         "--max-tokens",
         type=int,
         default=MAX_PROMPT_TOKENS,
         help="Maksymalna liczba tokenow na prompt (domyslnie 50000).",
     )
+    parser.add_argument(
+        "--max-item-tokens",
+        type=positive_int,
+        default=None,
+        help=(
+            "Budzet tokenow tresci jednego wpisu: dluzsza tresc jest kompresowana "
+            "(poczatek, koniec i najbardziej informacyjne akapity; domyslnie bez "
+            "limitu)."
+        ),
+    )
+    parser.add_argument(
+        "--packing",
+        choices=PACKING_OPTIONS,
+        default="greedy",
+        help=(
+            "Podzial na prompty: greedy (kolejnosc wpisow) lub optimal "
+            "(first-fit-decreasing, mniej i pelniejszych promptow)."
+        ),
+    )
+    parser.add_argument(
+        "--group-by",
+        choices=GROUP_BY_OPTIONS,
+        help="Nie mieszaj w jednym promptcie wpisow z roznych feedow lub kategorii.",
+    )
     parser.add_argument(
         "--tokenizer",
         choices=sorted(TOKENIZER_OPTIONS),
         default="auto",
         help="Wybor tokenizera: auto, tiktoken, approx.",
     )
+    parser.add_argument(
+        "--encoding",
+        choices=sorted(ENCODING_OPTIONS),
+        default=DEFAULT_ENCODING,
+        help=(
+            "Kodowanie tiktoken docelowego modelu: cl100k_base (GPT-4) "
+            "lub o200k_base (GPT-4o, GPT-5)."
+        ),
+    )
     parser.add_argument(
         "--base-url",
         help="Nadpisz URL instancji Miniflux (ENV: MINIFLUX_BASE_URL).",
@@ -51,24 +168,254 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         action="store_true",
         help="Zwracaj tylko linki do wpisow artykulowych bez pobierania tresci.",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Liczba wpisow przetwarzanych rownolegle (domyslnie 1).",
+    )
+    for upstream, limit in UPSTREAM_LIMITS.items():
+        parser.add_argument(
+            f"--{upstream}-concurrency",
+            type=positive_int,
+            default=limit,
+            help=(
+                f"Maksymalna liczba rownoleglych zapytan do {upstream} "
+                f"(domyslnie {limit})."
+            ),
+        )
+    parser.add_argument(
+        "--async",
+        action="store_true",
+        dest="async_mode",
+        help="Przetwarzaj wpisy w jednej petli asyncio zamiast puli watkow.",
+    )
+    parser.add_argument(
+        "--async-concurrency",
+        type=positive_int,
+        default=ASYNC_CONCURRENCY,
+        help=(
+            "Maksymalna liczba wpisow w locie w trybie --async "
+            f"(domyslnie {ASYNC_CONCURRENCY})."
+        ),
+    )
+    parser.add_argument(
+        "--http-pool-size",
+        type=positive_int,
+        default=None,
+        help=(
+            "Liczba polaczen keep-alive utrzymywanych do jednego hosta "
+            f"(domyslnie wieksza z {HTTP_POOL_SIZE} i --workers)."
+        ),
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=rate_limit_spec,
+        action="append",
+        default=[],
+        metavar="HOST=RPS[:BURST]",
+        help=(
+            "Limit zapytan na sekunde (i burst) dla hosta, wspolny dla wszystkich "
+            "workerow; mozna podac wielokrotnie, rps 0 wylacza limit "
+            f"(domyslnie {format_rate_limits(RATE_LIMITS)}; ENV: RATE_LIMITS)."
+        ),
+    )
+    parser.add_argument(
+        "--retry-attempts",
+        type=positive_int,
+        default=RETRY_ATTEMPTS,
+        help=(
+            "Maksymalna liczba prob jednego zapytania do Miniflux, Jiny i YouTube "
+            f"(domyslnie {RETRY_ATTEMPTS})."
+        ),
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=non_negative_int,
+        default=RETRY_BUDGET,
+        help=(
+            "Laczna liczba ponowien na caly przebieg; po jej wyczerpaniu bledy "
+            f"nie sa ponawiane (domyslnie {RETRY_BUDGET})."
+        ),
+    )
+    parser.add_argument(
+        "--mark-batch-size",
+        type=positive_int,
+        default=MARK_READ_BATCH_SIZE,
+        help=(
+            "Liczba wpisow oznaczanych jako read jednym zapytaniem "
+            f"(domyslnie {MARK_READ_BATCH_SIZE})."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Wlacz cache pobranej tresci (TTL 7 dni, do 256 MB) i trwale "
+            "statystyki zrodel w tym katalogu (domyslnie bez cache)."
+        ),
+    )
+    parser.add_argument(
+        "--state-dir",
+        type=Path,
+        default=DEFAULT_STATE_DIR,
+        help=(
+            "Katalog dziennika przebiegu do --resume, niezalezny od cache "
+            f"(domyslnie {DEFAULT_STATE_DIR})."
+        ),
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Wylacz dziennik przebiegu (bez mozliwosci --resume).",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_false",
+        dest="dedup",
+        help=(
+            "Wylacz deduplikacje wpisow (kanoniczny URL przed pobraniem i "
+            "prawie identyczna tresc po ekstrakcji)."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Dokoncz przerwany przebieg z dziennika w --state-dir: bez "
+            "ponownego pobierania tresci i dostarczania gotowych promptow."
+        ),
+    )
+    parser.add_argument(
+        "--route-probe-rate",
+        type=probability,
+        default=ROUTE_PROBE_RATE,
+        help=(
+            "Prawdopodobienstwo ponownej proby zdegradowanego zrodla tresci dla "
+            f"domeny (domyslnie {ROUTE_PROBE_RATE})."
+        ),
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=percentile,
+        default=None,
+        help=(
+            "Wyslij zapasowe zapytanie do kolejnego zrodla tresci, gdy pierwsze "
+            "nie odpowie w czasie danego percentyla latencji (np. 95; "
+            "domyslnie wylaczone)."
+        ),
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=Path,
+        help=(
+            "Zapisz raport przebiegu (czasy, rozmiary i wyniki etapow per wpis) "
+            "do pliku JSON."
+        ),
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=Path,
+        help=(
+            "Zapisz metryki etapow w formacie tekstowym Prometheus "
+            "(np. dla textfile collectora node_exportera)."
+        ),
+    )
+    parser.add_argument(
+        "--extract-processes",
+        type=non_negative_int,
+        default=None,
+        help=(
+            "Liczba procesow konwersji HTML -> markdown; 0 = w watku glownym "
+            "(domyslnie liczba rdzeni przy --workers > 1, inaczej 0)."
+        ),
+    )
+    parser.add_argument(
+        "--noise-rules",
+        type=Path,
+        help=(
+            "Plik TOML z dodatkowymi regulami usuwania noise "
+            "(sekcje [default] i [sites.\"domena\"])."
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.stream and args.interactive:
+        parser.error("--stream wymaga --no-interactive")
+    if args.stream and (args.packing != "greedy" or args.group_by):
+        parser.error("--stream dziala tylko z --packing greedy bez --group-by")
+    if args.stream and args.links:
+        parser.error("--stream nie dziala z --links")
+    if args.output is not None and not args.stream:
+        parser.error("--output wymaga --stream")
+    if args.resume and args.no_journal:
+        parser.error("--resume wymaga dziennika przebiegu (bez --no-journal)")
+    return args
+
+
+def build_options(args: argparse.Namespace, output: TextIO | None) -> RunOptions:
+    """Ustawienia przebiegu z argumentow; `output` to juz otwarty plik `--output`."""
+    return RunOptions(
+        use_playwright=args.playwright,
+        playwright_pages=args.playwright_pages,
+        interactive=args.interactive,
+        max_tokens=args.max_tokens,
+        tokenizer=args.tokenizer,
+        encoding=args.encoding,
+        base_url=args.base_url,
+        links_only=args.links,
+        workers=args.workers,
+        async_mode=args.async_mode,
+        async_concurrency=args.async_concurrency,
+        http_pool_size=args.http_pool_size,
+        mark_batch_size=args.mark_batch_size,
+        retry_attempts=args.retry_attempts,
+        retry_budget=args.retry_budget,
+        rate_limits={
+            host: limit for limits in args.rate_limit for host, limit in limits.items()
+        },
+        cache_dir=args.cache_dir,
+        state_dir=None if args.no_journal else args.state_dir,
+        extract_processes=args.extract_processes,
+        noise_rules_path=args.noise_rules,
+        route_probe_rate=args.route_probe_rate,
+        hedge_percentile=args.hedge_percentile,
+        metrics_path=args.metrics_json,
+        prometheus_path=args.metrics_prom,
+        stream=args.stream,
+        output=output,
+        resume=args.resume,
+        dedup=args.dedup,
+        packing=args.packing,
+        group_by=args.group_by,
+        max_item_tokens=args.max_item_tokens,
+        upstream_limits={
+            upstream: getattr(args, f"{upstream}_concurrency")
+            for upstream in UPSTREAM_LIMITS
+        },
+    )
 
 
 def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(message)s")
-    try:
-        args = parse_args(sys.argv[1:])
-        message = run(
-            use_playwright=args.playwright,
-            interactive=args.interactive,
-            max_tokens=args.max_tokens,
-            tokenizer=args.tokenizer,
-            base_url=args.base_url,
-            links_only=args.links,
-        )
-    except RuntimeError as exc:
-        logging.error(str(exc))
-        return 1
+    args = parse_args(sys.argv[1:])
+    with ExitStack() as resources:
+        # Decyzja: plik otwierany dopiero po walidacji argumentow, zeby
+        # odrzucona kombinacja flag nie czyscila istniejacego pliku.
+        output = None
+        if args.output is not None and str(args.output) != "-":
+            try:
+                output = resources.enter_context(
+                    args.output.open("w", encoding="utf-8")
+                )
+            except OSError as exc:
+                logging.error("Nie mozna otworzyc --output: %s", exc)
+                return 1
+        try:
+            message = run(build_options(args, output))
+        except RuntimeError as exc:
+            logging.error(str(exc))
+            return 1
 
     logging.info(message)
     return 0
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+)
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+UPSTREAM_LIMITS = {
+    "miniflux": 4,
+    "jina": 4,
+    "youtube": 2,
+}
+
+
+class UpstreamLimiter:
+    def __init__(self, limits: dict[str, int] | None = None) -> None:
+        resolved = dict(UPSTREAM_LIMITS)
+        resolved.update(limits or {})
+        self.limits = resolved
+        self._semaphores = {
+            name: threading.BoundedSemaphore(max(1, limit))
+            for name, limit in resolved.items()
+        }
+        # Decyzja: semafory asyncio tworzone osobno, bo tryb `--async` dziala
+        # w jednej petli i nie moze blokowac jej semaforem watkowym.
+        self._async_semaphores = {
+            name: asyncio.BoundedSemaphore(max(1, limit))
+            for name, limit in resolved.items()
+        }
+
+    @contextmanager
+    def slot(self, upstream: str) -> Iterator[None]:
+        semaphore = self._semaphores.get(upstream)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    @asynccontextmanager
+    async def async_slot(self, upstream: str) -> AsyncIterator[None]:
+        semaphore = self._async_semaphores.get(upstream)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+    def wrap(self, upstream: str, func: Callable[..., R]) -> Callable[..., R]:
+        def limited(*args: object, **kwargs: object) -> R:
+            with self.slot(upstream):
+                return func(*args, **kwargs)
+
+        return limited
+
+
+# Limity (zapytania/s, burst) per host; regula dla domeny obejmuje subdomeny.
+# Decyzja: r.jina.ai bez klucza API dopuszcza ok. 20 zapytan/min.
+RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "r.jina.ai": (0.33, 5),
+    "youtube.com": (2.0, 4),
+}
+
+
+class TokenBucket:
+    """Kubelek tokenow z rezerwacja: kazde zapytanie dostaje swoj termin startu.
+
+    `reserve()` zwraca czas oczekiwania, a samo czekanie (`time.sleep` albo
+    `asyncio.sleep`) odbywa sie poza blokada, wiec kubelek dziala w watkach
+    i w petli asyncio.
+    """
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated
+            self._updated = now
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+@dataclass
+class RateWaitStats:
+    requests: int = 0
+    delayed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class HostRateLimiter:
+    """Wspolne dla wszystkich watkow limity zapytan per host (token bucket)."""
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        resolved = dict(RATE_LIMITS)
+        resolved.update(limits or {})
+        # Decyzja: rate <= 0 wylacza limit hosta (rowniez domyslny).
+        self.limits = {
+            host.lower(): (rate, burst)
+            for host, (rate, burst) in resolved.items()
+            if rate > 0
+        }
+        self._buckets = {
+            host: TokenBucket(rate, burst, clock)
+            for host, (rate, burst) in self.limits.items()
+        }
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats: dict[str, RateWaitStats] = {}
+
+    def _bucket_for(self, url: str) -> tuple[str, TokenBucket] | None:
+        host = (urlsplit(url).hostname or "").lower()
+        while host:
+            bucket = self._buckets.get(host)
+            if bucket is not None:
+                return host, bucket
+            _, _, host = host.partition(".")
+        return None
+
+    def _reserve(self, url: str) -> float:
+        match = self._bucket_for(url)
+        if match is None:
+            return 0.0
+        host, bucket = match
+        wait = bucket.reserve()
+        with self._lock:
+            stats = self.stats.setdefault(host, RateWaitStats())
+            stats.requests += 1
+            if wait > 0:
+                stats.delayed += 1
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+        return wait
+
+    def acquire(self, url: str) -> float:
+        """Czeka na token dla hosta `url` i zwraca czas oczekiwania w sekundach."""
+        wait = self._reserve(url)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    async def acquire_async(self, url: str) -> float:
+        wait = self._reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def log_stats(self) -> None:
+        for host, stats in sorted(self.stats.items()):
+            logging.info(
+                "Rate limit %s: zapytan %d, czekalo %d, laczne czekanie %.1fs, "
+                "max %.1fs",
+                host,
+                stats.requests,
+                stats.delayed,
+                stats.total_wait,
+                stats.max_wait,
+            )
+
+
+def ordered_map(
+    func: Callable[[T], R], items: Iterable[T], workers: int = 1
+) -> Iterator[tuple[T, "Future[R]"]]:
+    # Decyzja: wyniki oddajemy w kolejnosci wejscia, a liczba zadan w locie jest
+    # ograniczona, zeby nie materializowac calego iterable przy dlugich backlogach.
+    if workers <= 1:
+        for item in items:
+            future: Future[R] = Future()
+            try:
+                future.set_result(func(item))
+            except Exception as exc:
+                future.set_exception(exc)
+            yield item, future
+        return
+
+    window = workers * 2
+    pending: deque[tuple[T, Future[R]]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= window:
+                head_item, head_future = pending.popleft()
+                head_future.exception()
+                yield head_item, head_future
+        while pending:
+            head_item, head_future = pending.popleft()
+            head_future.exception()
+            yield head_item, head_future
+
+
+async def ordered_map_async(
+    func: Callable[[T], Awaitable[R]],
+    items: AsyncIterable[T],
+    limit: int = 1,
+) -> AsyncIterator[tuple[T, "asyncio.Task[R]"]]:
+    """Asynchroniczny odpowiednik `ordered_map` z limitem zadan w locie."""
+    pending: deque[tuple[T, asyncio.Task[R]]] = deque()
+    try:
+        async for item in items:
+            pending.append((item, asyncio.create_task(func(item))))
+            if len(pending) >= max(1, limit):
+                head_item, head_task = pending.popleft()
+                await asyncio.wait([head_task])
+                yield head_item, head_task
+        while pending:
+            head_item, head_task = pending.popleft()
+            await asyncio.wait([head_task])
+            yield head_item, head_task
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -1,5 +1,8 @@
+import tomllib
 from pathlib import Path
 
+from miniflux_prompt_compiler.core.noise_filter import NoiseRules
+
 
 def load_env(path: Path) -> dict[str, str]:
     values: dict[str, str] = {}
@@ -15,3 +18,37 @@ def load_env(path: Path) -> dict[str, str]:
         key, value = line.split("=", 1)
         values[key.strip()] = value.strip().strip('"').strip("'")
     return values
+
+
+def load_noise_rules(path: Path) -> NoiseRules:
+    """Wczytuje reguly noise z pliku TOML (`[default]` i `[sites."host"]`)."""
+    try:
+        with path.open("rb") as handle:
+            data = tomllib.load(handle)
+        return NoiseRules.from_mapping(data)
+    except (OSError, tomllib.TOMLDecodeError, ValueError) as exc:
+        raise RuntimeError(f"Nie mozna wczytac regul noise z {path}: {exc}") from exc
+
+
+def parse_rate_limits(value: str) -> dict[str, tuple[float, int]]:
+    """Parsuje `host=rps[:burst]` rozdzielone przecinkami (np. `r.jina.ai=0.5:5`)."""
+    limits: dict[str, tuple[float, int]] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, separator, spec = part.partition("=")
+        rate_text, _, burst_text = spec.partition(":")
+        try:
+            if not separator or not host.strip():
+                raise ValueError("brak hosta")
+            rate = float(rate_text)
+            burst = int(burst_text) if burst_text else max(1, round(rate))
+            if burst < 1:
+                raise ValueError("burst musi byc >= 1")
+        except ValueError as exc:
+            raise ValueError(
+                f"Niepoprawny limit zapytan: {part} (oczekiwano host=rps[:burst])"
+            ) from exc
+        limits[host.strip().lower()] = (rate, burst)
+    return limits
@@ -1,42 +1,459 @@
 import logging
+from collections.abc import Sequence
+from dataclasses import replace
 
-from miniflux_prompt_compiler.core.prompting import build_prompt
-from miniflux_prompt_compiler.core.tokenization import count_tokens
-from miniflux_prompt_compiler.types import ProcessedItem
+from miniflux_prompt_compiler.core.prompting import (
+    PROMPT_FOOTER,
+    PROMPT_HEADER,
+    SECTION_SEPARATOR,
+    build_prompt,
+    build_section,
+)
+from miniflux_prompt_compiler.core.tokenization import (
+    DEFAULT_ENCODING,
+    Tokenizer,
+    get_tokenizer,
+    label_for_tokens,
+)
+from miniflux_prompt_compiler.types import ProcessedItem, PromptChunk
 
 ANSI_RESET = "\033[0m"
 ANSI_RED = "\033[31m"
 
+PACKING_OPTIONS = ("greedy", "optimal")
+GROUP_BY_OPTIONS = ("feed", "category")
+# Granice ciecia tresci ponad limit, od najlepszej: akapit, linia, zdanie, slowo.
+SPLIT_BOUNDARIES = ("\n\n", "\n", ". ", "! ", "? ", "; ", " ")
+SPLIT_ATTEMPTS = 5
 
-def build_prompts_with_chunking(
-    items: list[ProcessedItem], max_tokens: int, tokenizer: str = "auto"
-) -> list[str]:
-    prompts: list[str] = []
-    current: list[ProcessedItem] = []
-
-    for item in items:
-        current.append(item)
-        prompt = build_prompt(current)
-        if not prompt:
-            current.pop()
+
+class PromptMeter:
+    """Liczy tokeny promptu z sumy kosztow sekcji, bez skladania calego tekstu.
+
+    Naglowek i kazda sekcja sa tokenizowane raz. Granice miedzy naglowkiem,
+    sekcjami i stopka zawsze wypadaja na granicy pre-tokenow tiktoken
+    (`---` i `</` zaczynaja nowy pre-token), wiec suma jest rowna wynikowi
+    `count_tokens(build_prompt(items))`. Dla `approx` sumowane sa znaki.
+    """
+
+    def __init__(
+        self, tokenizer: str | Tokenizer = "auto", encoding: str = DEFAULT_ENCODING
+    ) -> None:
+        if isinstance(tokenizer, str):
+            tokenizer = get_tokenizer(tokenizer, encoding)
+        self.tokenizer = tokenizer
+        self.approx = tokenizer.name == "approx"
+        self.header, self.footer = self._units(
+            [PROMPT_HEADER, PROMPT_FOOTER.lstrip("\n")]
+        )
+
+    def _units(self, texts: list[str]) -> list[int]:
+        if self.approx:
+            return [len(text) for text in texts]
+        return self.tokenizer.count_batch(texts)
+
+    def item_units(self, item: ProcessedItem) -> tuple[int, int]:
+        """Koszt sekcji jako (nie-ostatnia, ostatnia) w promptcie."""
+        return self.items_units([item])[0]
+
+    def items_units(self, items: list[ProcessedItem]) -> list[tuple[int, int]]:
+        texts: list[str] = []
+        for item in items:
+            section = build_section(item)
+            texts.extend((section + SECTION_SEPARATOR, section + "\n"))
+        units = self._units(texts)
+        return list(zip(units[0::2], units[1::2]))
+
+    def budget(self, max_tokens: int) -> int:
+        """Najwiekszy koszt jedynej sekcji, przy ktorym prompt miesci sie w limicie."""
+        if self.approx:
+            return 4 * max_tokens + 3 - self.header - self.footer
+        return max_tokens - self.header - self.footer
+
+    def tokens(self, middle_units: int, last_units: int) -> int:
+        units = self.header + middle_units + last_units + self.footer
+        if self.approx:
+            return max(1, units // 4)
+        return units
+
+    def prompt_tokens(self, items: list[ProcessedItem]) -> int:
+        """Liczba tokenow `build_prompt(items)` bez skladania promptu."""
+        if not items:
+            return 0
+        costs = self.items_units(items)
+        middle = sum(cost[0] for cost in costs[:-1])
+        return self.tokens(middle, costs[-1][1])
+
+
+def part_title(title: str, part: int, parts: int) -> str:
+    return f"{title} (część {part}/{parts})"
+
+
+def cut_position(text: str, limit: int) -> int:
+    """Miejsce ciecia tekstu przed `limit` znakow, na najlepszej granicy."""
+    if len(text) <= limit:
+        return len(text)
+    for boundary in SPLIT_BOUNDARIES:
+        position = text.rfind(boundary, limit // 2, limit)
+        if position > 0:
+            return position + len(boundary)
+    return limit
+
+
+def cut_text(text: str, limit: int) -> list[str]:
+    pieces: list[str] = []
+    text = text.strip()
+    while text:
+        position = cut_position(text, limit)
+        piece = text[:position].strip()
+        if piece:
+            pieces.append(piece)
+        text = text[position:].lstrip()
+    return pieces
+
+
+def split_oversized(
+    item: ProcessedItem,
+    meter: PromptMeter,
+    max_tokens: int,
+    units: tuple[int, int] | None = None,
+) -> list[tuple[ProcessedItem, tuple[int, int]]]:
+    """Dzieli element ponad limit na czesci "część i/n" z kosztami sekcji.
+
+    Tresc jest cieta na granicach akapitow, zdan lub slow, a dlugosc czesci
+    wynika z kosztu calego elementu na znak. Czesci sa tokenizowane raz
+    (jedna partia); tylko gdy ktoras mimo to przekracza limit, ciecie jest
+    powtarzane z mniejsza dlugoscia. Pusta lista, gdy limit nie miesci nawet
+    samego tytulu.
+    """
+    _, item_last = units or meter.item_units(item)
+    budget = meter.budget(max_tokens)
+    framing = meter.item_units(
+        ProcessedItem(title=part_title(item.title, 999, 999), content="")
+    )[1]
+    if budget <= framing:
+        return []
+    section_chars = len(build_section(item)) + 1
+    limit = int((budget - framing) * section_chars / max(item_last, 1) * 0.95)
+    for _ in range(SPLIT_ATTEMPTS):
+        pieces = cut_text(item.content, max(limit, 1))
+        parts = [
+            replace(
+                item,
+                title=part_title(item.title, index, len(pieces)),
+                content=piece,
+                parts=len(pieces),
+            )
+            for index, piece in enumerate(pieces, start=1)
+        ]
+        costs = meter.items_units(parts)
+        largest = max((cost[1] for cost in costs), default=0)
+        if largest <= budget:
+            logging.info(
+                "Element ponad limit tokenow podzielony na %d czesci: %s",
+                len(parts),
+                item.title,
+            )
+            return list(zip(parts, costs))
+        limit = int(limit * (budget - framing) / (largest - framing) * 0.95)
+    return []
+
+
+def make_chunk(items: list[ProcessedItem], token_count: int) -> PromptChunk:
+    return PromptChunk(
+        text=build_prompt(items),
+        token_count=token_count,
+        label=label_for_tokens(token_count),
+        items=items,
+    )
+
+
+def count_prompt_tokens(
+    items: list[ProcessedItem],
+    tokenizer: str | Tokenizer = "auto",
+    encoding: str = DEFAULT_ENCODING,
+) -> int:
+    return PromptMeter(tokenizer, encoding).prompt_tokens(items)
+
+
+class PromptChunker:
+    """Przyrostowy chunker: `add` zwraca zamkniety chunk, gdy element sie nie miesci.
+
+    Pamieta tylko elementy biezacego chunka, wiec nadaje sie do wypisywania
+    promptow w trakcie pobierania kolejnych wpisow. `total_tokens` to koszt
+    jednego promptu ze wszystkich dodanych elementow (jak `count_prompt_tokens`).
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        tokenizer: str | Tokenizer = "auto",
+        encoding: str = DEFAULT_ENCODING,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.meter = PromptMeter(tokenizer, encoding)
+        self.current: list[ProcessedItem] = []
+        self.current_tokens = 0
+        # Suma kosztow "nie-ostatnich" sekcji biezacego chunka oraz koszt ostatniej
+        # sekcji liczony tak, jakby miala po sobie kolejna.
+        self._middle_units = 0
+        self._last_as_middle = 0
+        self._total_middle = 0
+        self._total_last: int | None = None
+        self._total_last_as_middle = 0
+
+    def add(
+        self, item: ProcessedItem, units: tuple[int, int] | None = None
+    ) -> PromptChunk | None:
+        """Dodaje element; element ponad limit jest pomijany (zob. `add_parts`)."""
+        item_middle, item_last = units or self.meter.item_units(item)
+        self._count_total(item_middle, item_last)
+        return self._place(item, item_middle, item_last)
+
+    def add_parts(
+        self, item: ProcessedItem, units: tuple[int, int] | None = None
+    ) -> list[PromptChunk]:
+        """Jak `add`, ale element ponad limit dzieli na czesci (`split_oversized`).
+
+        Zwraca wszystkie chunki zamkniete przez element lub jego czesci;
+        `total_tokens` liczy element w calosci, jak `count_prompt_tokens`.
+        """
+        item_middle, item_last = units or self.meter.item_units(item)
+        self._count_total(item_middle, item_last)
+        if self.meter.tokens(0, item_last) <= self.max_tokens:
+            chunk = self._place(item, item_middle, item_last)
+            return [chunk] if chunk is not None else []
+        parts = split_oversized(
+            item, self.meter, self.max_tokens, (item_middle, item_last)
+        )
+        if not parts:
+            log_oversized()
+            return []
+        chunks: list[PromptChunk] = []
+        for part, (part_middle, part_last) in parts:
+            chunk = self._place(part, part_middle, part_last)
+            if chunk is not None:
+                chunks.append(chunk)
+        return chunks
+
+    def _count_total(self, item_middle: int, item_last: int) -> None:
+        if self._total_last is not None:
+            self._total_middle += self._total_last_as_middle
+        self._total_last = item_last
+        self._total_last_as_middle = item_middle
+
+    def _place(
+        self, item: ProcessedItem, item_middle: int, item_last: int
+    ) -> PromptChunk | None:
+        current = self.current
+        candidate_middle = self._middle_units + self._last_as_middle if current else 0
+        candidate_tokens = self.meter.tokens(candidate_middle, item_last)
+        if candidate_tokens <= self.max_tokens:
+            current.append(item)
+            self.current_tokens = candidate_tokens
+            self._middle_units = candidate_middle
+            self._last_as_middle = item_middle
+            return None
+
+        closed = self.flush()
+        single_tokens = self.meter.tokens(0, item_last)
+        if closed is not None and single_tokens <= self.max_tokens:
+            self.current = [item]
+            self.current_tokens = single_tokens
+            self._middle_units = 0
+            self._last_as_middle = item_middle
+            return closed
+
+        log_oversized()
+        return closed
+
+    def flush(self) -> PromptChunk | None:
+        if not self.current:
+            return None
+        chunk = make_chunk(self.current, self.current_tokens)
+        self.current = []
+        self.current_tokens = 0
+        self._middle_units = 0
+        self._last_as_middle = 0
+        return chunk
+
+    @property
+    def total_tokens(self) -> int:
+        if self._total_last is None:
+            return 0
+        return self.meter.tokens(self._total_middle, self._total_last)
+
+
+def log_oversized() -> None:
+    logging.info(
+        "%sItem exceeds max token limit and was skipped%s", ANSI_RED, ANSI_RESET
+    )
+
+
+def item_group(item: ProcessedItem, group_by: str | None) -> str:
+    if group_by == "feed":
+        return item.feed or ""
+    if group_by == "category":
+        return item.category or ""
+    return ""
+
+
+def group_items(
+    items: list[ProcessedItem], group_by: str | None
+) -> list[list[int]]:
+    """Indeksy elementow pogrupowane po feedzie/kategorii w kolejnosci wystapien."""
+    groups: dict[str, list[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(item_group(item, group_by), []).append(index)
+    return list(groups.values())
+
+
+def expand_oversized(
+    items: list[ProcessedItem],
+    costs: list[tuple[int, int]],
+    meter: PromptMeter,
+    max_tokens: int,
+) -> tuple[list[ProcessedItem], list[tuple[int, int]], list[list[int]]]:
+    """Zastepuje elementy ponad limit ich czesciami (z kosztami sekcji).
+
+    Zwraca tez indeksy czesci kazdego podzielonego elementu w kolejnosci czesci.
+    """
+    expanded: list[ProcessedItem] = []
+    expanded_costs: list[tuple[int, int]] = []
+    runs: list[list[int]] = []
+    for item, cost in zip(items, costs):
+        if meter.tokens(0, cost[1]) <= max_tokens:
+            expanded.append(item)
+            expanded_costs.append(cost)
             continue
-        if count_tokens(prompt, tokenizer=tokenizer) <= max_tokens:
+        parts = split_oversized(item, meter, max_tokens, cost)
+        if not parts:
+            log_oversized()
             continue
+        runs.append(list(range(len(expanded), len(expanded) + len(parts))))
+        for part, part_cost in parts:
+            expanded.append(part)
+            expanded_costs.append(part_cost)
+    return expanded, expanded_costs, runs
 
-        current.pop()
-        if current:
-            prompts.append(build_prompt(current))
-            current = [item]
-            prompt = build_prompt(current)
-            if prompt and count_tokens(prompt, tokenizer=tokenizer) <= max_tokens:
-                continue
 
-        logging.info(
-            "%sItem exceeds max token limit and was skipped%s", ANSI_RED, ANSI_RESET
-        )
-        current = []
+def pack_first_fit_decreasing(
+    costs: list[tuple[int, int]],
+    meter: PromptMeter,
+    max_tokens: int,
+    runs: Sequence[list[int]] = (),
+) -> list[tuple[list[int], int]]:
+    """Pakuje sekcje (koszty z `items_units`) w prompty metoda first-fit-decreasing.
+
+    Zwraca (indeksy w kolejnosci wejsciowej, liczba tokenow) dla kazdego promptu.
+    Ostatnia sekcja promptu kosztuje inaczej niz pozostale, wiec koszt kandydata
+    jest liczony dokladnie dla elementu, ktory po posortowaniu bedzie ostatni.
+    `runs` to czesci podzielonych elementow: trafiaja do kolejnych promptow po
+    kolei, zanim reszta zostanie dopakowana first-fit-decreasing.
+    """
+    bins: list[list[int]] = []
+    # Suma kosztow "nie-ostatnich" wszystkich sekcji i indeks ostatniej sekcji.
+    middles: list[int] = []
+    lasts: list[int] = []
+    tokens: list[int] = []
+    # Klucz kolejnosci promptu; None oznacza najmniejszy indeks w promptcie.
+    keys: list[int | None] = []
+
+    def candidate(position: int, index: int) -> tuple[int, int, int]:
+        new_last = max(lasts[position], index)
+        total_middle = middles[position] + costs[index][0]
+        count = meter.tokens(total_middle - costs[new_last][0], costs[new_last][1])
+        return count, total_middle, new_last
+
+    def place(position: int, index: int) -> bool:
+        count, total_middle, new_last = candidate(position, index)
+        if count > max_tokens:
+            return False
+        bins[position].append(index)
+        middles[position] = total_middle
+        lasts[position] = new_last
+        tokens[position] = count
+        return True
+
+    def open_bin(index: int, key: int | None) -> None:
+        bins.append([index])
+        middles.append(costs[index][0])
+        lasts.append(index)
+        tokens.append(meter.tokens(0, costs[index][1]))
+        keys.append(key)
+
+    # Decyzja: czesci jednego elementu ida do tego samego lub kolejnego promptu,
+    # a prompt z czescia ma staly klucz kolejnosci, zeby "część 1/n" zawsze
+    # poprzedzala "część 2/n" niezaleznie od dopakowanych krotkich elementow.
+    in_runs: set[int] = set()
+    for run in runs:
+        for index in run:
+            in_runs.add(index)
+            if not bins or not place(len(bins) - 1, index):
+                open_bin(index, index)
+    order = sorted(
+        (index for index in range(len(costs)) if index not in in_runs),
+        key=lambda index: -costs[index][0],
+    )
+    for index in order:
+        if meter.tokens(0, costs[index][1]) > max_tokens:
+            log_oversized()
+            continue
+        if not any(place(position, index) for position in range(len(bins))):
+            open_bin(index, None)
+    packed = [
+        (sorted(members), count, min(members) if key is None else key)
+        for members, count, key in zip(bins, tokens, keys)
+    ]
+    packed.sort(key=lambda chunk: chunk[2])
+    return [(members, count) for members, count, _ in packed]
+
+
+def build_prompts_with_chunking(
+    items: list[ProcessedItem],
+    max_tokens: int,
+    tokenizer: str | Tokenizer = "auto",
+    encoding: str = DEFAULT_ENCODING,
+    packing: str = "greedy",
+    group_by: str | None = None,
+) -> list[PromptChunk]:
+    """Dzieli elementy na prompty do `max_tokens`.
+
+    `greedy` zachowuje kolejnosc i zamyka chunk, gdy kolejny element sie nie
+    miesci; `optimal` pakuje elementy first-fit-decreasing w mniej, pelniejszych
+    promptow (kolejnosc w promptcie zostaje wejsciowa). `group_by` (`feed` lub
+    `category`) nie miesza grup w jednym promptcie. Element ponad limit jest
+    dzielony na czesci pakowane jak pozostale elementy.
+    """
+    if packing not in PACKING_OPTIONS:
+        raise ValueError(f"Nieznany tryb pakowania: {packing}")
+    chunker = PromptChunker(max_tokens, tokenizer, encoding)
+    chunks: list[PromptChunk] = []
+    # Decyzja: koszty sekcji liczone jedna partia, bo tokenizacja wsadowa jest
+    # szybsza niz element po elemencie.
+    costs = chunker.meter.items_units(items)
+    for group in group_items(items, group_by):
+        if packing == "optimal":
+            packed_items, packed_costs, runs = expand_oversized(
+                [items[index] for index in group],
+                [costs[index] for index in group],
+                chunker.meter,
+                max_tokens,
+            )
+            for members, token_count in pack_first_fit_decreasing(
+                packed_costs, chunker.meter, max_tokens, runs
+            ):
+                chunks.append(
+                    make_chunk([packed_items[index] for index in members], token_count)
+                )
+            continue
+        for index in group:
+            chunks.extend(chunker.add_parts(items[index], costs[index]))
+        chunk = chunker.flush()
+        if chunk is not None:
+            chunks.append(chunk)
+    return chunks
 
-    if current:
-        prompts.append(build_prompt(current))
 
-    return prompts
+def fill_ratios(chunks: list[PromptChunk], max_tokens: int) -> list[float]:
+    return [chunk.token_count / max_tokens for chunk in chunks]
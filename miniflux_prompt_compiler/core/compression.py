@@ -0,0 +1,234 @@
+import logging
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+
+from miniflux_prompt_compiler.core.chunking import cut_text
+from miniflux_prompt_compiler.core.noise_filter import DEFAULT_NOISE_RULES, NoiseRules
+from miniflux_prompt_compiler.core.tokenization import (
+    DEFAULT_ENCODING,
+    Tokenizer,
+    get_tokenizer,
+)
+from miniflux_prompt_compiler.types import ProcessedItem
+
+# Znacznik pominietego fragmentu tresci miedzy zachowanymi akapitami.
+OMISSION = "[...]"
+PARAGRAPH_SEPARATOR = "\n\n"
+# Akapity dluzsze niz 1/8 budzetu sa ciete na mniejsze segmenty, zeby jeden
+# dlugi akapit (np. transkrypt w jednej linii) nie zajmowal calego budzetu.
+SEGMENTS_PER_BUDGET = 8
+# Krotkie linie powtorzone w tresci (menu, CTA, "Reklama") sa boilerplate.
+REPEATED_LINE_CHARS = 80
+
+_INLINE_SPACE = re.compile(r"[ \t\u00a0\u200b]+")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+_LINK_ONLY = re.compile(r"(?:!?\[[^\]]*\]\([^)]*\)[\s|•·-]*)+")
+_WORDS = re.compile(r"\w+")
+_FENCE = re.compile(r"\s*(?:```|~~~)")
+_INDENT = re.compile(r"[ \t]*")
+
+
+def code_lines(lines: list[str]) -> list[bool]:
+    """Flagi linii nalezacych do blokow kodu (razem z liniami ogrodzenia)."""
+    flags: list[bool] = []
+    inside = False
+    for line in lines:
+        fence = bool(_FENCE.match(line))
+        flags.append(inside or fence)
+        if fence:
+            inside = not inside
+    return flags
+
+
+def normalize_whitespace(text: str) -> str:
+    """Scala biale znaki wewnatrz linii i puste linie; wciecia i bloki kodu
+    zostaja bez zmian (listy zagniezdzone, kod).
+    """
+    lines = text.splitlines()
+    normalized: list[str] = []
+    for line, is_code in zip(lines, code_lines(lines)):
+        if is_code:
+            normalized.append(line.rstrip())
+            continue
+        indent = _INDENT.match(line).group()  # type: ignore[union-attr]
+        body = _INLINE_SPACE.sub(" ", line[len(indent) :]).strip()
+        normalized.append(f"{indent}{body}" if body else "")
+    return _BLANK_RUNS.sub("\n\n", "\n".join(normalized)).strip("\n")
+
+
+def drop_boilerplate(text: str) -> str:
+    """Usuwa linie z samych linkow/obrazkow i kolejne kopie powtorzonych
+    krotkich linii tekstu; kod i wiersze tabel nie sa ruszane.
+    """
+    lines = text.splitlines()
+    seen: set[str] = set()
+    kept: list[str] = []
+    for line, is_code in zip(lines, code_lines(lines)):
+        stripped = line.strip()
+        # Decyzja: za boilerplate uznajemy tylko linie ze slowami; `}` czy
+        # `|---|` powtarzaja sie w kodzie i tabelach z definicji.
+        prose = (
+            not is_code
+            and not stripped.startswith("|")
+            and _WORDS.search(stripped) is not None
+        )
+        if prose and _LINK_ONLY.fullmatch(stripped):
+            continue
+        if prose and len(stripped) <= REPEATED_LINE_CHARS:
+            if stripped in seen:
+                continue
+            seen.add(stripped)
+        kept.append(line)
+    return _BLANK_RUNS.sub("\n\n", "\n".join(kept)).strip("\n")
+
+
+def information_scores(segments: list[str]) -> list[float]:
+    """Sredni TF-IDF slowa segmentu; IDF liczony w obrebie jednego tekstu."""
+    words = [_WORDS.findall(segment.lower()) for segment in segments]
+    document_frequency = Counter(word for bag in words for word in set(bag))
+    total = len(segments)
+    scores: list[float] = []
+    for bag in words:
+        if not bag:
+            scores.append(0.0)
+            continue
+        weight = sum(
+            count * (math.log((1 + total) / (1 + document_frequency[word])) + 1)
+            for word, count in Counter(bag).items()
+        )
+        scores.append(weight / len(bag))
+    return scores
+
+
+class ContentCompressor:
+    """Deterministyczna kompresja tresci elementu do budzetu tokenow.
+
+    Najpierw normalizuje biale znaki i usuwa boilerplate; gdy to nie wystarcza,
+    zostawia pierwszy i ostatni akapit oraz akapity o najwyzszym TF-IDF, w
+    kolejnosci z tekstu, z `[...]` w miejscu pominietych. Segmenty sa
+    tokenizowane raz (jedna partia), a koszt wyboru jest sumowany
+    przyrostowo; pelny wynik jest liczony tylko raz na koniec.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        tokenizer: str | Tokenizer = "auto",
+        encoding: str = DEFAULT_ENCODING,
+        noise_rules: NoiseRules | None = None,
+    ) -> None:
+        if isinstance(tokenizer, str):
+            tokenizer = get_tokenizer(tokenizer, encoding)
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer
+        self.noise_rules = noise_rules or DEFAULT_NOISE_RULES
+        # Dla `approx` budzet liczymy w znakach, zeby suma segmentow byla dokladna.
+        self.approx = tokenizer.name == "approx"
+        self.budget = 4 * max_tokens + 3 if self.approx else max_tokens
+        self.separator, self.omission = self._units(
+            [PARAGRAPH_SEPARATOR, f"{OMISSION}{PARAGRAPH_SEPARATOR}"]
+        )
+        self.compressed = 0
+
+    def _units(self, texts: list[str]) -> list[int]:
+        if self.approx:
+            return [len(text) for text in texts]
+        return self.tokenizer.count_batch(texts)
+
+    def compress(self, content: str, url: str | None = None) -> str:
+        return self._compress(content, url)[0]
+
+    def _compress(self, content: str, url: str | None) -> tuple[str, bool]:
+        """Zwraca (tresc, czy pominieto akapity).
+
+        Tresc mieszczaca sie w budzecie wraca bez zmian; czyszczenie dotyczy
+        tylko tresci, ktore trzeba skrocic.
+        """
+        if self._units([content])[0] <= self.budget:
+            return content, False
+        text = drop_boilerplate(
+            self.noise_rules.for_url(url).clean(normalize_whitespace(content))
+        )
+        (units,) = self._units([text])
+        if units <= self.budget:
+            return text, False
+        segment_chars = max(
+            1, len(text) * self.budget // units // SEGMENTS_PER_BUDGET
+        )
+        segments = [
+            piece
+            for paragraph in text.split(PARAGRAPH_SEPARATOR)
+            for piece in cut_text(paragraph, segment_chars)
+        ]
+        costs = self._units(segments)
+        scores = information_scores(segments)
+        last = len(segments) - 1
+        # Decyzja: poczatek i koniec zawsze zostaja (lead i podsumowanie),
+        # reszta wedlug gestosci informacji; remisy rozstrzyga kolejnosc.
+        order = [0, last] + sorted(
+            range(1, last), key=lambda index: (-scores[index], index)
+        )
+        kept = self._select(order, costs)
+        while kept:
+            result = self._assemble(segments, kept)
+            if self._units([result])[0] <= self.budget:
+                return result, True
+            # Granice segmentow moga sie scalic w inne tokeny; usuwamy najmniej
+            # wartosciowy segment i sprawdzamy ponownie.
+            kept.discard(min(kept, key=lambda index: (scores[index], -index)))
+        head = segments[0][: segment_chars // 2]
+        return f"{head}{PARAGRAPH_SEPARATOR}{OMISSION}", True
+
+    def _select(self, order: list[int], costs: list[int]) -> set[int]:
+        """Dobiera segmenty w kolejnosci `order`, dopoki miesci sie budzet.
+
+        Koszt wyboru jest aktualizowany o roznice: koszt segmentu, separator
+        i zmiane liczby znacznikow `[...]` miedzy sasiadami w tekscie.
+        """
+
+        def gap(left: int, right: int) -> int:
+            return int(right - left > 1)
+
+        kept: list[int] = []
+        total = 0
+        for index in order:
+            position = bisect_left(kept, index)
+            if position < len(kept) and kept[position] == index:
+                continue
+            left = kept[position - 1] if position else -1
+            right = kept[position] if position < len(kept) else len(costs)
+            delta = costs[index] + self.omission * (
+                gap(left, index) + gap(index, right)
+            )
+            if kept:
+                delta += self.separator - self.omission * gap(left, right)
+            if total + delta <= self.budget:
+                kept.insert(position, index)
+                total += delta
+        return set(kept)
+
+    def _assemble(self, segments: list[str], kept: set[int]) -> str:
+        parts: list[str] = []
+        previous = -1
+        for index in sorted(kept):
+            if index - previous > 1:
+                parts.append(OMISSION)
+            parts.append(segments[index])
+            previous = index
+        if previous < len(segments) - 1:
+            parts.append(OMISSION)
+        return PARAGRAPH_SEPARATOR.join(parts)
+
+    def compress_item(self, item: ProcessedItem, url: str | None = None) -> bool:
+        """Kompresuje tresc elementu w miejscu; True, gdy pominieto akapity."""
+        before = len(item.content)
+        item.content, trimmed = self._compress(item.content, url)
+        if not trimmed:
+            return False
+        self.compressed += 1
+        logging.info(
+            "Kompresja: %s (%d -> %d znakow)", item.title, before, len(item.content)
+        )
+        return True
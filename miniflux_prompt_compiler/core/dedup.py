@@ -0,0 +1,226 @@
+import hashlib
+import re
+from urllib.parse import (
+    parse_qsl,
+    unquote_plus,
+    urlencode,
+    urlsplit,
+    urlunsplit,
+)
+
+from miniflux_prompt_compiler.core.url_classify import (
+    extract_youtube_id,
+    is_youtube_url,
+)
+from miniflux_prompt_compiler.types import ProcessedItem
+
+# Parametry sledzace usuwane z URL (porownanie bez wielkosci liter).
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "mkt_tok",
+    "_hsenc",
+    "_hsmi",
+    "ocid",
+    "cmpid",
+    "ncid",
+    "sr_share",
+    "ref_src",
+    "ref_url",
+    "smid",
+    "taid",
+    "guccounter",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "pk_", "itm_")
+
+# Przekierowania, ktore niosa docelowy URL w parametrze zapytania.
+REDIRECTORS = {
+    "google.com": ("/url", "q", "url"),
+    "l.facebook.com": ("/l.php", "u"),
+    "lm.facebook.com": ("/l.php", "u"),
+    "l.instagram.com": ("/", "u"),
+    "duckduckgo.com": ("/l/", "uddg"),
+    "href.li": ("/", "url"),
+    "out.reddit.com": ("/", "url"),
+}
+
+MINHASH_BUCKETS = 128
+MINHASH_BANDS = 32
+MINHASH_SHINGLE = 3
+# Szacowane podobienstwo Jaccarda shingli, od ktorego tresc jest duplikatem.
+DEDUP_THRESHOLD = 0.6
+# Krotkie teksty (np. skroty wpisow) maja za malo shingli na wiarygodny odcisk.
+DEDUP_MIN_WORDS = 50
+_EMPTY = 1 << 64
+
+_WORDS = re.compile(r"\w+")
+
+
+def _host(hostname: str | None) -> str:
+    return (hostname or "").lower().removeprefix("www.")
+
+
+def _unwrap_redirect(url: str) -> str:
+    for _ in range(3):
+        parts = urlsplit(url)
+        redirector = REDIRECTORS.get(_host(parts.hostname))
+        if redirector is None:
+            return url
+        path, *params = redirector
+        if not parts.path.startswith(path):
+            return url
+        query = dict(parse_qsl(parts.query))
+        target = next((query[name] for name in params if query.get(name)), None)
+        if target is None or not target.startswith(("http://", "https://")):
+            return url
+        url = target
+    return url
+
+
+def _is_tracking(name: str) -> bool:
+    lowered = name.lower()
+    return lowered in TRACKING_PARAMS or lowered.startswith(TRACKING_PREFIXES)
+
+
+def clean_url(url: str) -> str:
+    """URL bez przekierowania w parametrze i bez parametrow sledzacych.
+
+    Pozostale segmenty zapytania zostaja w oryginalnej postaci (bez ponownego
+    kodowania), a URL bez parametrow sledzacych wraca bez zmian.
+    """
+    url = _unwrap_redirect(url.strip())
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    segments = parts.query.split("&")
+    kept = [
+        segment
+        for segment in segments
+        if not _is_tracking(unquote_plus(segment.split("=", 1)[0]))
+    ]
+    if len(kept) == len(segments):
+        return url
+    return urlunsplit(parts._replace(query="&".join(kept)))
+
+
+def canonical_url(url: str) -> str:
+    """Klucz deduplikacji URL: host bez `www.`, bez fragmentu i koncowego `/`,
+    parametry posortowane; filmy YouTube po ID.
+    """
+    cleaned = clean_url(url)
+    if is_youtube_url(cleaned):
+        video_id = extract_youtube_id(cleaned)
+        if video_id:
+            return f"youtube:{video_id}"
+    parts = urlsplit(cleaned)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip("/") or "/"
+    return f"{_host(parts.hostname)}{path}" + (f"?{query}" if query else "")
+
+
+def minhash(text: str) -> tuple[int, ...] | None:
+    """Sygnatura MinHash shingli slow; None dla zbyt krotkiego tekstu.
+
+    Jedna permutacja z kubelkami: kazdy shingiel jest haszowany raz, a
+    kubelek trzyma najmniejszy skrot, wiec koszt jest liniowy w dlugosci
+    tekstu zamiast `MINHASH_BUCKETS` razy wiekszy.
+    """
+    # Decyzja: MinHash zamiast SimHash, bo dla tekstow rzedu kilkuset slow
+    # odleglosc Hamminga SimHash nie rozdzielala duplikatow od artykulow ze
+    # wspolnym boilerplate, a szacunek Jaccarda rozdziela je wyraznie.
+    words = _WORDS.findall(text.lower())
+    if len(words) < DEDUP_MIN_WORDS:
+        return None
+    signature = [_EMPTY] * MINHASH_BUCKETS
+    for index in range(len(words) - MINHASH_SHINGLE + 1):
+        shingle = " ".join(words[index : index + MINHASH_SHINGLE])
+        value = int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        )
+        bucket = value % MINHASH_BUCKETS
+        if value < signature[bucket]:
+            signature[bucket] = value
+    return tuple(signature)
+
+
+def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    """Szacunek podobienstwa Jaccarda z sygnatur (puste kubelki pomijane)."""
+    filled = 0
+    matches = 0
+    for left, right in zip(first, second):
+        if left == _EMPTY and right == _EMPTY:
+            continue
+        filled += 1
+        matches += left == right
+    return matches / filled if filled else 0.0
+
+
+class Deduplicator:
+    """Deduplikacja wpisow przebiegu: po kanonicznym URL przed pobraniem i po
+    MinHash tresci po ekstrakcji.
+
+    Indeks LSH dzieli sygnature na `MINHASH_BANDS` pasm; kandydatami sa
+    tylko elementy z identycznym pasmem, a o duplikacie decyduje szacowane
+    podobienstwo calej sygnatury.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._urls: dict[str, str] = {}
+        self._index: dict[tuple[int, tuple[int, ...]], list[int]] = {}
+        self._signatures: list[tuple[int, ...]] = []
+        self._titles: list[str] = []
+        self.url_duplicates = 0
+        self.content_duplicates = 0
+        self.saved_chars = 0
+
+    def seen_url(self, url: str, title: str = "") -> str | None:
+        """Zwraca tytul wczesniejszego wpisu z tym samym kanonicznym URL."""
+        if not url.strip():
+            return None
+        key = canonical_url(url)
+        original = self._urls.get(key)
+        if original is None:
+            self._urls[key] = title or url
+            return None
+        self.url_duplicates += 1
+        return original
+
+    def near_duplicate(self, item: ProcessedItem) -> str | None:
+        """Zwraca tytul wczesniejszego elementu o prawie identycznej tresci."""
+        signature = minhash(item.content)
+        if signature is None:
+            return None
+        rows = MINHASH_BUCKETS // MINHASH_BANDS
+        bands = [
+            (band, signature[band * rows : (band + 1) * rows])
+            for band in range(MINHASH_BANDS)
+        ]
+        bands = [key for key in bands if any(value != _EMPTY for value in key[1])]
+        checked: set[int] = set()
+        for key in bands:
+            for candidate in self._index.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                score = similarity(signature, self._signatures[candidate])
+                if score >= self.threshold:
+                    self.content_duplicates += 1
+                    self.saved_chars += len(item.content)
+                    return self._titles[candidate]
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._titles.append(item.title)
+        for key in bands:
+            self._index.setdefault(key, []).append(position)
+        return None
+
+    @property
+    def duplicates(self) -> int:
+        return self.url_duplicates + self.content_duplicates
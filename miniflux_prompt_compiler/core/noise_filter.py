@@ -0,0 +1,190 @@
+import hashlib
+import re
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+# Wzorce dopasowywane do calej linii (bez wielkosci liter, po obcieciu spacji).
+NOISE_PATTERNS = [
+    r"follow us",
+    r"font size",
+    r"save",
+    r"print",
+    r"rate story",
+    r"listen",
+    r"loading\.\.\.",
+    r"live events",
+    r"read more news on",
+    r"download the .* app.*",
+    r"you can now subscribe to our .*?",
+    r"catch all the .*?",
+    r"faqs:?",
+    r"q:\s+.*",
+    r"a:\s+.*",
+]
+
+# Fragmenty, po ktorych cala linia jest usuwana (porownanie po lower()).
+NOISE_LINE_CONTAINS = [
+    "whatsapp channel",
+    "follow channel",
+    "read more news on",
+    "download the economic times news app",
+    "catch all the us news",
+    "international breaking news events",
+]
+
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+class NoiseFilter:
+    """Jednoprzebiegowy filtr linii z prekompilowanymi regulami.
+
+    Wszystkie wzorce linii sa skladane w jedna alternatywe dopasowywana raz na
+    linie, a fragmenty sa wyszukiwane w calym tekscie przed jednym przebiegiem
+    po liniach.
+    """
+
+    def __init__(
+        self, line_patterns: Iterable[str], line_contains: Iterable[str]
+    ) -> None:
+        self.line_patterns = tuple(dict.fromkeys(line_patterns))
+        self.line_contains = tuple(
+            dict.fromkeys(fragment.lower() for fragment in line_contains)
+        )
+        self._pattern = _alternation(self.line_patterns)
+
+    def _contains_hits(self, lowered: str) -> list[int]:
+        # Decyzja: fragmenty szukamy `str.find` na calym tekscie zamiast automatu
+        # Aho-Corasick; kazdy przebieg idzie w C i wychodzi szybciej niz
+        # alternatywa regex czy automat w czystym Pythonie per linia.
+        hits: list[int] = []
+        for fragment in self.line_contains:
+            start = lowered.find(fragment)
+            while start != -1:
+                hits.append(start)
+                start = lowered.find(fragment, start + 1)
+        hits.sort()
+        return hits
+
+    def clean(self, markdown: str) -> str:
+        pattern = self._pattern
+        lowered = markdown.lower()
+        hits = self._contains_hits(lowered)
+        hit_index = 0
+        offset = 0
+        cleaned_lines: list[str] = []
+        for line, lowered_line in zip(
+            markdown.splitlines(), lowered.splitlines(keepends=True)
+        ):
+            line_end = offset + len(lowered_line)
+            contains_noise = False
+            while hit_index < len(hits) and hits[hit_index] < line_end:
+                contains_noise = True
+                hit_index += 1
+            offset = line_end
+            normalized = line.strip()
+            if not normalized:
+                cleaned_lines.append("")
+                continue
+            if pattern is not None and pattern.fullmatch(normalized):
+                cleaned_lines.append("")
+                continue
+            if contains_noise:
+                continue
+            cleaned_lines.append(line)
+        return _BLANK_RUNS.sub("\n\n", "\n".join(cleaned_lines)).strip()
+
+
+def _alternation(patterns: Iterable[str]) -> re.Pattern[str] | None:
+    parts = [f"(?:{pattern})" for pattern in patterns]
+    if not parts:
+        return None
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+@dataclass
+class NoiseRules:
+    """Reguly domyslne i per domena; reguly domeny rozszerzaja domyslne."""
+
+    line_patterns: list[str] = field(default_factory=lambda: list(NOISE_PATTERNS))
+    line_contains: list[str] = field(
+        default_factory=lambda: list(NOISE_LINE_CONTAINS)
+    )
+    sites: dict[str, tuple[list[str], list[str]]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._default = NoiseFilter(self.line_patterns, self.line_contains)
+        self._site_filters: dict[str, NoiseFilter] = {}
+        for host, (patterns, contains) in self.sites.items():
+            self._site_filters[host.lower()] = NoiseFilter(
+                [*self.line_patterns, *patterns],
+                [*self.line_contains, *contains],
+            )
+        digest = hashlib.sha256(
+            repr(
+                (self.line_patterns, self.line_contains, sorted(self.sites.items()))
+            ).encode("utf-8")
+        )
+        self.fingerprint = digest.hexdigest()[:16]
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, object]) -> "NoiseRules":
+        default = data.get("default") or {}
+        if not isinstance(default, Mapping):
+            raise ValueError("Sekcja [default] regul noise musi byc tabela.")
+        sites_data = data.get("sites") or {}
+        if not isinstance(sites_data, Mapping):
+            raise ValueError("Sekcja [sites] regul noise musi byc tabela.")
+        sites: dict[str, tuple[list[str], list[str]]] = {}
+        for host, site in sites_data.items():
+            if not isinstance(site, Mapping):
+                raise ValueError(f"Reguly noise dla {host} musza byc tabela.")
+            sites[host] = (
+                _string_list(site, "line_patterns", host),
+                _string_list(site, "line_contains", host),
+            )
+        return cls(
+            line_patterns=[
+                *NOISE_PATTERNS,
+                *_string_list(default, "line_patterns", "default"),
+            ],
+            line_contains=[
+                *NOISE_LINE_CONTAINS,
+                *_string_list(default, "line_contains", "default"),
+            ],
+            sites=sites,
+        )
+
+    def for_url(self, url: str | None) -> NoiseFilter:
+        if not url or not self._site_filters:
+            return self._default
+        host = (urlparse(url).hostname or "").lower()
+        # Decyzja: regula dla `example.com` obejmuje tez subdomeny (`www.`, `m.`).
+        while host:
+            site_filter = self._site_filters.get(host)
+            if site_filter is not None:
+                return site_filter
+            _, _, host = host.partition(".")
+        return self._default
+
+
+def _string_list(section: Mapping[str, object], key: str, where: str) -> list[str]:
+    values = section.get(key) or []
+    if not isinstance(values, list) or not all(
+        isinstance(value, str) for value in values
+    ):
+        raise ValueError(
+            f"Pole {key} w regulach noise ({where}) musi byc lista napisow."
+        )
+    for value in values:
+        if key == "line_patterns":
+            try:
+                re.compile(value)
+            except re.error as exc:
+                raise ValueError(
+                    f"Niepoprawny wzorzec noise ({where}): {value} ({exc})"
+                ) from exc
+    return values
+
+
+DEFAULT_NOISE_RULES = NoiseRules()
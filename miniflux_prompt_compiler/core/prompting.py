@@ -72,20 +72,18 @@ Zakończ odpowiedź po ostatnim punkcie. Nie dodawaj komentarzy o tym, jak wykon
 """
 
 
+PROMPT_HEADER = f"{PROMPT}\n\n<lista_artykułów_i_transkrypcji>\n"
+PROMPT_FOOTER = "\n</lista_artykułów_i_transkrypcji>"
+SECTION_SEPARATOR = "\n\n"
+
+
+def build_section(item: ProcessedItem) -> str:
+    return f"---\n\nTytuł: {item.title}\nTreść:\n{item.content}"
+
+
 def build_prompt(items: list[ProcessedItem]) -> str:
     if not items:
         return ""
 
-    sections: list[str] = []
-    for item in items:
-        title = item.title
-        content = item.content
-        section = f"---\n\nTytuł: {title}\nTreść:\n{content}"
-        sections.append(section)
-    items_block = "\n\n".join(sections)
-    return (
-        f"{PROMPT}\n\n"
-        "<lista_artykułów_i_transkrypcji>\n"
-        f"{items_block}\n"
-        "</lista_artykułów_i_transkrypcji>"
-    )
+    items_block = SECTION_SEPARATOR.join(build_section(item) for item in items)
+    return f"{PROMPT_HEADER}{items_block}{PROMPT_FOOTER}"
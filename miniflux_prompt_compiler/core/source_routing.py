@@ -0,0 +1,151 @@
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+ROUTE_PROBE_RATE = 0.1
+ROUTE_MIN_SAMPLES = 3
+ROUTE_PRIOR = 0.5
+ROUTE_MIN_LENGTH = 200
+# Po przekroczeniu okna liczniki sa polowione, zeby zmiany zachowania domeny
+# (np. nowy paywall) przewazyly stara historie.
+ROUTE_WINDOW = 50
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 10
+
+
+@dataclass
+class SourceStats:
+    attempts: float = 0.0
+    successes: float = 0.0
+    latency_total: float = 0.0
+    length_total: float = 0.0
+    length_samples: float = 0.0
+    last_attempt: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency_total / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_length(self) -> float:
+        return self.length_total / self.length_samples if self.length_samples else 0.0
+
+
+def source_domain(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host.removeprefix("www.")
+
+
+class RoutingPolicy:
+    """Kolejnosc zrodel tresci per domena na podstawie zebranych statystyk.
+
+    Zrodlo z co najmniej `ROUTE_MIN_SAMPLES` probami jest oceniane po odsetku
+    udanych ekstrakcji, a przy remisie po sredniej latencji; przy rownych
+    ocenach obowiazuje kolejnosc domyslna. Z prawdopodobienstwem
+    `probe_rate` zdegradowane zrodlo jest probowane jako pierwsze, zeby
+    statystyki nadazaly za zmianami po stronie domeny. Statystyki sa tylko
+    w pamieci; zapis miedzy przebiegami dodaje `adapters.source_routing`.
+    """
+
+    def __init__(
+        self,
+        probe_rate: float = ROUTE_PROBE_RATE,
+        random_source: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.probe_rate = probe_rate
+        self._random = random_source
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], SourceStats] = {}
+        # Latencje per zrodlo (wszystkie domeny) do wyznaczania progu hedgingu;
+        # nie sa zapisywane, bo opisuja biezace obciazenie upstreamow.
+        self._latencies: dict[str, deque[float]] = {}
+
+    def stats(self, domain: str, source: str) -> SourceStats:
+        with self._lock:
+            return self._stats.get((domain, source), SourceStats())
+
+    def _score(self, stats: SourceStats) -> tuple[float, float]:
+        # Decyzja: zrodlo bez historii dostaje ocene neutralna, zeby przy
+        # zdegradowanym zrodle domyslnym kolejne zrodla tez zbieraly statystyki.
+        if stats.attempts < ROUTE_MIN_SAMPLES:
+            return ROUTE_PRIOR, 0.0
+        # Odsetek sukcesu zaokraglamy do 0.1, zeby drobne roznice nie
+        # przestawialy zrodel, a o remisie decydowala latencja.
+        return round(stats.success_rate, 1), -stats.mean_latency
+
+    def order(self, domain: str, sources: list[str]) -> list[str]:
+        with self._lock:
+            known = {
+                source: self._stats.get((domain, source), SourceStats())
+                for source in sources
+            }
+        # Sortowanie jest stabilne, wiec przy rownych ocenach zostaje
+        # kolejnosc domyslna.
+        ranked = sorted(
+            sources, key=lambda source: self._score(known[source]), reverse=True
+        )
+        demoted = [
+            source
+            for position, source in enumerate(sources)
+            if ranked.index(source) > position
+        ]
+        if demoted and self._random() < self.probe_rate:
+            probe = min(demoted, key=lambda source: known[source].last_attempt)
+            ranked.remove(probe)
+            ranked.insert(0, probe)
+            logging.info("Routing: %s ponowna proba zrodla %s", domain, probe)
+        return ranked
+
+    def _update(self, domain: str, source: str) -> SourceStats:
+        return self._stats.setdefault((domain, source), SourceStats())
+
+    def record_fetch(
+        self, domain: str, source: str, ok: bool, latency: float
+    ) -> None:
+        with self._lock:
+            stats = self._update(domain, source)
+            if stats.attempts >= ROUTE_WINDOW:
+                for name in (
+                    "attempts",
+                    "successes",
+                    "latency_total",
+                    "length_total",
+                    "length_samples",
+                ):
+                    setattr(stats, name, getattr(stats, name) / 2)
+            stats.attempts += 1
+            stats.successes += 1 if ok else 0
+            stats.latency_total += latency
+            stats.last_attempt = self._clock()
+            self._latencies.setdefault(source, deque(maxlen=LATENCY_WINDOW)).append(
+                latency
+            )
+
+    def latency_percentile(self, source: str, percentile: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._latencies.get(source, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = max(0, math.ceil(percentile / 100 * len(samples)) - 1)
+        return samples[index]
+
+    def record_extraction(self, domain: str, source: str, length: int) -> None:
+        """Dlugosc wyciagnietej tresci; zbyt krotka zamienia sukces na porazke."""
+        with self._lock:
+            stats = self._update(domain, source)
+            stats.length_total += length
+            stats.length_samples += 1
+            if length < ROUTE_MIN_LENGTH:
+                stats.successes = max(0.0, stats.successes - 1)
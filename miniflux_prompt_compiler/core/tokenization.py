@@ -1,4 +1,9 @@
+import hashlib
 import logging
+import os
+import threading
+from collections.abc import Sequence
+from functools import cache
 
 TOKEN_LABELS = (
     (32000, "GPT-Instant"),
@@ -6,27 +11,93 @@ TOKEN_LABELS = (
 )
 MAX_PROMPT_TOKENS = 50_000
 TOKENIZER_OPTIONS = {"auto", "tiktoken", "approx"}
+DEFAULT_ENCODING = "cl100k_base"
+# cl100k_base: GPT-4 / GPT-3.5; o200k_base: GPT-4o, GPT-4.1, o-series, GPT-5.
+ENCODING_OPTIONS = {"cl100k_base", "o200k_base"}
 
 
-def count_tokens(text: str, tokenizer: str = "auto") -> int:
+def resolve_tokenizer(tokenizer: str = "auto") -> str:
+    """Zwraca faktycznie uzywany tokenizer: `tiktoken` albo `approx`."""
     if tokenizer not in TOKENIZER_OPTIONS:
         raise ValueError(f"Nieznany tokenizer: {tokenizer}")
+    if tokenizer == "approx":
+        return "approx"
+    try:
+        import tiktoken  # noqa: F401
+    except ImportError as exc:
+        if tokenizer == "tiktoken":
+            raise RuntimeError(
+                "Tokenizer tiktoken nie jest dostepny w srodowisku."
+            ) from exc
+        return "approx"
+    return "tiktoken"
 
-    if tokenizer in {"auto", "tiktoken"}:
-        try:
+
+class Tokenizer:
+    """Licznik tokenow z jednorazowo ladowanym enkoderem i pamiecia wynikow.
+
+    Wyniki sa zapamietywane po hashu tresci, wiec ponowne liczenie tego samego
+    tekstu (np. sekcji w chunkowaniu i w podsumowaniu) nie tokenizuje go drugi raz.
+    """
+
+    def __init__(
+        self, tokenizer: str = "auto", encoding: str = DEFAULT_ENCODING
+    ) -> None:
+        if encoding not in ENCODING_OPTIONS:
+            raise ValueError(f"Nieznane kodowanie tokenizera: {encoding}")
+        self.name = resolve_tokenizer(tokenizer)
+        self.encoding_name = encoding
+        self._encoding = None
+        if self.name == "tiktoken":
             import tiktoken
-        except ImportError as exc:
-            if tokenizer == "tiktoken":
-                raise RuntimeError(
-                    "Tokenizer tiktoken nie jest dostepny w srodowisku."
-                ) from exc
+
+            self._encoding = tiktoken.get_encoding(encoding)
+        elif tokenizer == "auto":
             logging.info("Tokenizer: approx (fallback, wynik szacunkowy)")
-            return max(1, len(text) // 4)
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
+        else:
+            logging.info("Tokenizer: approx (wynik szacunkowy)")
+        self._memo: dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        if self._encoding is None:
+            return [max(1, len(text) // 4) for text in texts]
+        keys = [
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            for text in texts
+        ]
+        with self._lock:
+            missing = {
+                key: text for key, text in zip(keys, texts) if key not in self._memo
+            }
+        if missing:
+            # Decyzja: encode_ordinary traktuje tekst jak zwykla tresc, takze gdy
+            # artykul zawiera napisy tokenow specjalnych (np. "<|endoftext|>").
+            encoded = self._encoding.encode_ordinary_batch(
+                list(missing.values()), num_threads=os.cpu_count() or 1
+            )
+            with self._lock:
+                self._memo.update(
+                    zip(missing.keys(), (len(tokens) for tokens in encoded))
+                )
+        with self._lock:
+            return [self._memo[key] for key in keys]
+
+
+@cache
+def get_tokenizer(
+    tokenizer: str = "auto", encoding: str = DEFAULT_ENCODING
+) -> Tokenizer:
+    return Tokenizer(tokenizer, encoding)
+
 
-    logging.info("Tokenizer: approx (wynik szacunkowy)")
-    return max(1, len(text) // 4)
+def count_tokens(
+    text: str, tokenizer: str = "auto", encoding: str = DEFAULT_ENCODING
+) -> int:
+    return get_tokenizer(tokenizer, encoding).count(text)
 
 
 def label_for_tokens(count: int) -> str:
@@ -0,0 +1,204 @@
+import logging
+import sys
+from collections.abc import Callable
+from typing import TextIO
+
+from miniflux_prompt_compiler.core.chunking import (
+    PromptChunker,
+    build_prompts_with_chunking,
+    count_prompt_tokens,
+    fill_ratios,
+)
+from miniflux_prompt_compiler.core.tokenization import label_for_tokens
+from miniflux_prompt_compiler.metrics import RunMetrics, text_bytes
+from miniflux_prompt_compiler.types import ProcessedItem, PromptChunk
+
+ANSI_RESET = "\033[0m"
+ANSI_GREEN = "\033[32m"
+ANSI_YELLOW = "\033[33m"
+
+
+def color_label(label: str) -> str:
+    if label == "GPT-Instant":
+        return f"{ANSI_GREEN}{label}{ANSI_RESET}"
+    if label == "GPT-Thinking":
+        return f"{ANSI_YELLOW}{label}{ANSI_RESET}"
+    return label
+
+
+def log_fill(chunks: list[PromptChunk], max_tokens: int) -> None:
+    ratios = fill_ratios(chunks, max_tokens)
+    logging.info(
+        "Wypelnienie promptow: %s (srednio %.0f%%)",
+        ", ".join(f"{index}: {ratio:.0%}" for index, ratio in enumerate(ratios, 1)),
+        100 * sum(ratios) / len(ratios),
+    )
+
+
+class PromptStream:
+    """Wypisuje prompt, gdy tylko chunk sie zapelni (`--stream`).
+
+    Liczba promptow nie jest znana z gory, wiec naglowek nie zawiera sumy.
+    Kolory etykiet tylko na terminalu, zeby plik lub pipe dostal czysty tekst.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        tokenizer: str,
+        encoding: str,
+        output: TextIO | None = None,
+        metrics: RunMetrics | None = None,
+        on_delivered: Callable[[int, PromptChunk], None] | None = None,
+    ) -> None:
+        self.chunker = PromptChunker(max_tokens, tokenizer, encoding)
+        self.output = output or sys.stdout
+        self.metrics = metrics or RunMetrics()
+        self.on_delivered = on_delivered
+        self.prompts = 0
+        self._colors = self.output.isatty()
+
+    def add(self, item: ProcessedItem) -> None:
+        with self.metrics.span("chunk", cpu=True):
+            chunks = self.chunker.add_parts(item)
+        for chunk in chunks:
+            self._emit(chunk)
+
+    def _emit(self, chunk: PromptChunk) -> None:
+        self.prompts += 1
+        label = color_label(chunk.label) if self._colors else chunk.label
+        with self.metrics.span("output") as span:
+            print(
+                f"Prompt {self.prompts} ({chunk.token_count} tokenow - {label})",
+                file=self.output,
+            )
+            print(chunk.text, file=self.output, flush=True)
+            span.size = text_bytes(chunk.text)
+        if self.on_delivered is not None:
+            self.on_delivered(self.prompts, chunk)
+        logging.info("Wypisano prompt %s (%s tokenow)", self.prompts, chunk.token_count)
+
+    def finish(self, summary: str) -> str:
+        chunk = self.chunker.flush()
+        if chunk is not None:
+            self._emit(chunk)
+        if not self.prompts:
+            logging.info("Brak przetworzonych wpisow, nic nie wypisano.")
+            return summary
+        total_tokens = self.chunker.total_tokens
+        total_label = label_for_tokens(total_tokens)
+        logging.info("Total tokens: %s -> %s", total_tokens, color_label(total_label))
+        return (
+            f"{summary}; Prompts: {self.prompts}; "
+            f"Tokens: {total_tokens}; Label: {total_label}"
+        )
+
+
+def deliver_results(
+    summary: str,
+    processed_items: list[ProcessedItem],
+    collected_links: list[str],
+    links_only: bool,
+    interactive: bool,
+    input_reader: Callable[[], str] | None,
+    clipboard: Callable[[str], None],
+    max_tokens: int,
+    tokenizer: str,
+    encoding: str,
+    packing: str = "greedy",
+    group_by: str | None = None,
+    metrics: RunMetrics | None = None,
+    on_delivered: Callable[[int, PromptChunk], None] | None = None,
+) -> str:
+    """Dostarcza linki albo prompty; `on_delivered` dostaje numer i chunk promptu."""
+    metrics = metrics or RunMetrics()
+    on_delivered = on_delivered or (lambda prompt, chunk: None)
+    if links_only:
+        links_output = "\n".join(collected_links)
+        if not links_output:
+            logging.info("Brak przetworzonych wpisow, schowek nie jest nadpisywany.")
+            return summary
+
+        if interactive:
+            input_reader = input_reader or (lambda: input())
+            logging.info("Press [Enter] to copy links")
+            input_reader()
+            clipboard(links_output)
+            logging.info("Copied links (%s)", len(collected_links))
+        else:
+            print(links_output)
+        return f"{summary}; Links: {len(collected_links)}"
+
+    with metrics.span("chunk", cpu=True) as span:
+        chunks = build_prompts_with_chunking(
+            processed_items,
+            max_tokens=max_tokens,
+            tokenizer=tokenizer,
+            encoding=encoding,
+            packing=packing,
+            group_by=group_by,
+        )
+        span.size = sum(text_bytes(chunk.text) for chunk in chunks)
+    if not chunks:
+        logging.info("Brak przetworzonych wpisow, schowek nie jest nadpisywany.")
+        return summary
+    log_fill(chunks, max_tokens)
+
+    # Decyzja: suma liczona z kosztow sekcji zapamietanych przy chunkowaniu,
+    # bez skladania i tokenizacji pelnego promptu.
+    with metrics.span("tokenize", cpu=True):
+        total_tokens = count_prompt_tokens(
+            processed_items, tokenizer=tokenizer, encoding=encoding
+        )
+    total_label = label_for_tokens(total_tokens)
+
+    if len(chunks) == 1:
+        chunk = chunks[0]
+        if interactive:
+            input_reader = input_reader or (lambda: input())
+            logging.info("Press [Enter] to copy prompt 1/1")
+            input_reader()
+            clipboard(chunk.text)
+            logging.info(
+                "Copied prompt 1/1 (%s tokenow - %s)",
+                total_tokens,
+                color_label(total_label),
+            )
+        else:
+            print(
+                f"Prompt 1/1 ({chunk.token_count} tokenow - "
+                f"{color_label(chunk.label)})"
+            )
+            print(chunk.text)
+        on_delivered(1, chunk)
+        return f"{summary}; Tokens: {total_tokens}; Label: {total_label}"
+
+    logging.info("Total tokens: %s -> %s", total_tokens, color_label(total_label))
+    logging.info("Generated prompts: %s", len(chunks))
+    if interactive:
+        input_reader = input_reader or (lambda: input())
+        for index, chunk in enumerate(chunks, start=1):
+            logging.info("Press [Enter] to copy prompt %s/%s", index, len(chunks))
+            input_reader()
+            clipboard(chunk.text)
+            logging.info(
+                "Copied prompt %s/%s (%s tokenow - %s)",
+                index,
+                len(chunks),
+                chunk.token_count,
+                color_label(chunk.label),
+            )
+            on_delivered(index, chunk)
+    else:
+        for index, chunk in enumerate(chunks, start=1):
+            print(
+                f"Prompt {index}/{len(chunks)} "
+                f"({chunk.token_count} tokenow - {color_label(chunk.label)})"
+            )
+            print(chunk.text)
+            on_delivered(index, chunk)
+
+    return (
+        f"{summary}; Prompts: {len(chunks)}; "
+        f"Tokens: {total_tokens}; Label: {total_label}"
+    )
@@ -0,0 +1,337 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+)
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+METRICS_PREFIX = "miniflux_prompt_compiler"
+REPORT_VERSION = 1
+
+
+@dataclass
+class Span:
+    """Pojedynczy pomiar etapu; `entry_id` jest pusty dla etapow calego przebiegu."""
+
+    stage: str
+    duration: float
+    outcome: str = "ok"
+    entry_id: int | None = None
+    source: str | None = None
+    size: int | None = None
+    error: str | None = None
+    cpu: float | None = None
+
+
+@dataclass
+class SpanHandle:
+    """Uchwyt `RunMetrics.span`, przez ktory etap ustawia rozmiar i zrodlo."""
+
+    source: str | None = None
+    size: int | None = None
+    outcome: str = "ok"
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    index = max(0, math.ceil(percentile / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def text_bytes(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+class RunMetrics:
+    """Spany etapow przebiegu z eksportem do raportu JSON i formatu Prometheus.
+
+    Spany zbiera sie z watkow workerow i z petli asyncio, wiec lista jest
+    chroniona blokada. Blad wewnatrz `span` jest zapisywany jako `outcome`
+    "error" i propagowany dalej.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+        self.started_at = time.time()
+        self._started = clock()
+
+    @property
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def record(
+        self,
+        stage: str,
+        duration: float,
+        outcome: str = "ok",
+        entry_id: int | None = None,
+        source: str | None = None,
+        size: int | None = None,
+        error: str | None = None,
+        cpu: float | None = None,
+    ) -> None:
+        span = Span(stage, duration, outcome, entry_id, source, size, error, cpu)
+        with self._lock:
+            self._spans.append(span)
+
+    @contextmanager
+    def span(
+        self,
+        stage: str,
+        entry_id: int | None = None,
+        source: str | None = None,
+        cpu: bool = False,
+    ) -> Iterator[SpanHandle]:
+        """Mierzy blok kodu; `cpu=True` dodaje czas CPU watku.
+
+        Czas CPU ma sens tylko dla blokow bez `await` i bez oddawania pracy
+        innym watkom (np. tokenizacja i chunkowanie).
+        """
+        handle = SpanHandle(source=source)
+        started = self._clock()
+        cpu_started = time.thread_time() if cpu else None
+        try:
+            yield handle
+        except BaseException as exc:
+            # Decyzja: anulowanie (np. przegrany wyscigu hedgingu) to nie blad.
+            cancelled = isinstance(exc, asyncio.CancelledError)
+            self.record(
+                stage,
+                self._clock() - started,
+                "cancelled" if cancelled else "error",
+                entry_id,
+                handle.source,
+                handle.size,
+                f"{type(exc).__name__}: {exc}",
+            )
+            raise
+        self.record(
+            stage,
+            self._clock() - started,
+            handle.outcome,
+            entry_id,
+            handle.source,
+            handle.size,
+            cpu=None if cpu_started is None else time.thread_time() - cpu_started,
+        )
+
+    def timed(
+        self,
+        stage: str,
+        func: Callable[..., R],
+        entry_id: int | None = None,
+        source: str | None = None,
+    ) -> Callable[..., R]:
+        """Opakowuje funkcje zwracajaca tekst; rozmiar wyniku trafia do spanu."""
+
+        def measured(*args: object, **kwargs: object) -> R:
+            with self.span(stage, entry_id, source) as handle:
+                result = func(*args, **kwargs)
+                if isinstance(result, str):
+                    handle.size = text_bytes(result)
+                return result
+
+        return measured
+
+    def timed_async(
+        self,
+        stage: str,
+        func: Callable[..., Awaitable[R]],
+        entry_id: int | None = None,
+        source: str | None = None,
+    ) -> Callable[..., Awaitable[R]]:
+        async def measured(*args: object, **kwargs: object) -> R:
+            with self.span(stage, entry_id, source) as handle:
+                result = await func(*args, **kwargs)
+                if isinstance(result, str):
+                    handle.size = text_bytes(result)
+                return result
+
+        return measured
+
+    def timed_iter(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Jeden span z czasem spedzonym w iteratorze (bez czasu konsumenta)."""
+        elapsed = 0.0
+        iterator = iter(items)
+        while True:
+            started = self._clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += self._clock() - started
+            yield item
+        self.record(stage, elapsed)
+
+    async def timed_aiter(
+        self, stage: str, items: AsyncIterable[T]
+    ) -> AsyncIterator[T]:
+        elapsed = 0.0
+        iterator = aiter(items)
+        while True:
+            started = self._clock()
+            try:
+                item = await anext(iterator)
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += self._clock() - started
+            yield item
+        self.record(stage, elapsed)
+
+    def timed_submitter(
+        self, stage: str, submit: Callable[..., "Future[str]"]
+    ) -> Callable[..., "Future[str]"]:
+        """Jak `timed`, ale dla zadan puli; czas liczony do zakonczenia future."""
+
+        def measured(*args: object, **kwargs: object) -> "Future[str]":
+            started = self._clock()
+
+            def done(future: "Future[str]") -> None:
+                duration = self._clock() - started
+                if future.cancelled():
+                    self.record(stage, duration, "cancelled")
+                elif future.exception() is not None:
+                    self.record(
+                        stage, duration, "error", error=str(future.exception())
+                    )
+                else:
+                    self.record(stage, duration, size=text_bytes(future.result()))
+
+            future = submit(*args, **kwargs)
+            future.add_done_callback(done)
+            return future
+
+        return measured
+
+    def stages(self) -> list[dict[str, object]]:
+        """Agregaty per (etap, zrodlo, wynik) posortowane po lacznym czasie."""
+        groups: dict[tuple[str, str, str], list[Span]] = {}
+        for span in self.spans:
+            key = (span.stage, span.source or "", span.outcome)
+            groups.setdefault(key, []).append(span)
+        ordered = sorted(
+            groups.items(),
+            key=lambda group: sum(span.duration for span in group[1]),
+            reverse=True,
+        )
+        rows: list[dict[str, object]] = []
+        for (stage, source, outcome), spans in ordered:
+            durations = sorted(span.duration for span in spans)
+            rows.append(
+                {
+                    "stage": stage,
+                    "source": source or None,
+                    "outcome": outcome,
+                    "count": len(spans),
+                    "seconds_total": sum(durations),
+                    "seconds_p50": _percentile(durations, 50),
+                    "seconds_p95": _percentile(durations, 95),
+                    "seconds_max": durations[-1],
+                    "bytes_total": sum(span.size or 0 for span in spans),
+                    "cpu_seconds_total": sum(span.cpu or 0.0 for span in spans),
+                }
+            )
+        return rows
+
+    def report(self, summary: dict[str, object] | None = None) -> dict[str, object]:
+        return {
+            "version": REPORT_VERSION,
+            "started_at": self.started_at,
+            "duration": self._clock() - self._started,
+            "summary": summary or {},
+            "stages": self.stages(),
+            "spans": [asdict(span) for span in self.spans],
+        }
+
+    def write_json(self, path: Path, summary: dict[str, object] | None = None) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(self.report(summary), ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+
+    def prometheus_text(self, summary: dict[str, object] | None = None) -> str:
+        """Format tekstowy Prometheus (np. dla textfile collectora node_exportera)."""
+        prefix = METRICS_PREFIX
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Laczny czas etapu przebiegu.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        rows = self.stages()
+        for row in rows:
+            lines.append(
+                f"{prefix}_stage_seconds_total{{{_labels(row)}}} "
+                f"{row['seconds_total']:.6f}"
+            )
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Liczba wywolan etapu.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for row in rows:
+            lines.append(
+                f"{prefix}_stage_calls_total{{{_labels(row)}}} {row['count']}"
+            )
+        lines += [
+            f"# HELP {prefix}_stage_bytes_total Rozmiar danych etapu w bajtach.",
+            f"# TYPE {prefix}_stage_bytes_total counter",
+        ]
+        for row in rows:
+            lines.append(
+                f"{prefix}_stage_bytes_total{{{_labels(row)}}} {row['bytes_total']}"
+            )
+        lines += [
+            f"# HELP {prefix}_run_duration_seconds Czas calego przebiegu.",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds {self._clock() - self._started:.6f}",
+        ]
+        for key, value in (summary or {}).items():
+            if isinstance(value, int):
+                lines += [
+                    f"# TYPE {prefix}_run_{key} gauge",
+                    f"{prefix}_run_{key} {value}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(
+        self, path: Path, summary: dict[str, object] | None = None
+    ) -> None:
+        # Decyzja: zapis przez plik tymczasowy i rename, bo textfile collector
+        # node_exportera moze czytac plik w trakcie zapisu.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_text(self.prometheus_text(summary), encoding="utf-8")
+        temporary.replace(path)
+
+
+def _labels(row: dict[str, object]) -> str:
+    labels = {
+        "stage": row["stage"],
+        "source": row["source"] or "",
+        "outcome": row["outcome"],
+    }
+    return ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TextIO
+
+from miniflux_prompt_compiler.adapters.miniflux_http import MARK_READ_BATCH_SIZE
+from miniflux_prompt_compiler.adapters.playwright_fetch import PLAYWRIGHT_MAX_PAGES
+from miniflux_prompt_compiler.adapters.retry import RETRY_ATTEMPTS, RETRY_BUDGET
+from miniflux_prompt_compiler.core.source_routing import ROUTE_PROBE_RATE
+from miniflux_prompt_compiler.core.tokenization import (
+    DEFAULT_ENCODING,
+    MAX_PROMPT_TOKENS,
+)
+
+
+@dataclass
+class RunOptions:
+    """Ustawienia przebiegu wspolne dla `run()` i `run_async()`.
+
+    Budowane w `cli` z argumentow; domyslne wartosci odpowiadaja domyslnym
+    flagom. Wstrzykiwane zaleznosci (zrodla wpisow, schowek) nie sa tu
+    trzymane, bo nie sa ustawieniami, tylko punktami podmiany w testach.
+    """
+
+    env_path: Path = Path(".env")
+    base_url: str | None = None
+    use_playwright: bool = False
+    playwright_pages: int = PLAYWRIGHT_MAX_PAGES
+    interactive: bool = True
+    max_tokens: int = MAX_PROMPT_TOKENS
+    tokenizer: str = "auto"
+    encoding: str = DEFAULT_ENCODING
+    links_only: bool = False
+    workers: int = 1
+    # Domyslnie `ASYNC_CONCURRENCY` z `async_app`.
+    async_concurrency: int | None = None
+    async_mode: bool = False
+    upstream_limits: dict[str, int] | None = None
+    mark_batch_size: int = MARK_READ_BATCH_SIZE
+    cache_dir: Path | None = None
+    state_dir: Path | None = None
+    extract_processes: int | None = None
+    noise_rules_path: Path | None = None
+    http_pool_size: int | None = None
+    retry_attempts: int = RETRY_ATTEMPTS
+    retry_budget: int | None = RETRY_BUDGET
+    rate_limits: dict[str, tuple[float, int]] | None = None
+    route_probe_rate: float = ROUTE_PROBE_RATE
+    hedge_percentile: float | None = None
+    metrics_path: Path | None = None
+    prometheus_path: Path | None = None
+    stream: bool = False
+    output: TextIO | None = None
+    resume: bool = False
+    dedup: bool = True
+    packing: str = "greedy"
+    group_by: str | None = None
+    max_item_tokens: int | None = None
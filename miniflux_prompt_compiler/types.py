@@ -2,16 +2,39 @@ from dataclasses import dataclass
 from typing import TypedDict
 
 
+class MinifluxCategory(TypedDict, total=False):
+    title: str | None
+
+
+class MinifluxFeed(TypedDict, total=False):
+    title: str | None
+    category: MinifluxCategory | None
+
+
 class MinifluxEntry(TypedDict, total=False):
     id: int | str | None
     title: str | None
     url: str | None
+    feed: MinifluxFeed | None
 
 
 @dataclass
 class ProcessedItem:
     title: str
     content: str
+    entry_id: int | None = None
+    feed: str | None = None
+    category: str | None = None
+    # Liczba czesci, na ktore podzielono tresc wpisu ponad limit tokenow.
+    parts: int = 1
+
+
+@dataclass
+class PromptChunk:
+    text: str
+    token_count: int
+    label: str
+    items: list[ProcessedItem]
 
 
 class ContentFetchError(RuntimeError):
@@ -20,3 +43,15 @@ class ContentFetchError(RuntimeError):
 
 class MinifluxError(RuntimeError):
     pass
+
+
+class PartialMarkReadError(MinifluxError):
+    """Czesc wpisow nie zostala oznaczona jako read; `marked` to wpisy gotowe."""
+
+    def __init__(self, message: str, marked: list[int]) -> None:
+        super().__init__(message)
+        self.marked = marked
+
+
+class TransientFetchError(ContentFetchError):
+    """Blad pobrania, ktory ma sens ponowic (np. chwilowo pusta odpowiedz)."""
@@ -2,9 +2,8 @@ import io
 import re
 import tempfile
 import unittest
-import urllib.error
 import requests
-from contextlib import redirect_stdout
+from contextlib import redirect_stderr, redirect_stdout
 from pathlib import Path
 from unittest import mock
 
@@ -17,13 +16,23 @@ from miniflux_prompt_compiler.core.url_classify import (
     is_youtube_shorts,
     is_youtube_url,
 )
-from miniflux_prompt_compiler.types import ProcessedItem
+from miniflux_prompt_compiler.types import ProcessedItem, PromptChunk
 
 
 def strip_ansi(text: str) -> str:
     return re.sub(r"\x1b\[[0-9;]*m", "", text)
 
 
+def fake_response(status: int = 200, payload: object = None) -> requests.Response:
+    import json
+
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(payload).encode("utf-8")
+    response.url = "http://example.com"
+    return response
+
+
 class SmokeTest(unittest.TestCase):
     def test_run_reads_token_from_env_file(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -89,244 +98,2161 @@ class SmokeTest(unittest.TestCase):
         self.assertEqual(captured_base_urls, ["http://miniflux.local"])
 
 
-class MarkReadFallbackTest(unittest.TestCase):
-    def test_mark_entry_read_falls_back_on_400(self) -> None:
-        from miniflux_prompt_compiler.adapters.miniflux_http import mark_entry_read
+class ConcurrentRunTest(unittest.TestCase):
+    def test_run_with_workers_keeps_entry_order_and_accounting(self) -> None:
+        import time
 
-        calls: list[tuple[str, str]] = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
 
-        class DummyResponse:
-            def __enter__(self) -> "DummyResponse":
-                return self
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                entries: list[dict[str, object]] = [
+                    {
+                        "id": index,
+                        "title": f"Artykul {index}",
+                        "url": f"https://example.com/{index}",
+                    }
+                    for index in range(1, 7)
+                ]
+                entries.append(
+                    {"id": 7, "title": "Shorts", "url": "https://www.youtube.com/shorts/x"}
+                )
+                return entries
 
-            def __exit__(self, exc_type, exc, tb) -> None:
-                return None
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                # Wczesniejsze wpisy koncza sie pozniej, zeby wymusic przetasowanie.
+                time.sleep(0.01 * (7 - (entry_id or 0)))
+                if entry_id == 3:
+                    raise RuntimeError("fail")
+                return f"content {entry_id}"
 
-        def fake_urlopen(request, timeout=10):  # type: ignore[no-untyped-def]
-            calls.append((request.method, request.full_url))
-            if len(calls) == 1:
-                raise urllib.error.HTTPError(
-                    request.full_url, 400, "Bad Request", hdrs=None, fp=None
+            marked: list[int] = []
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                marked.append(entry_id)
+
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=fake_marker,
+                    interactive=False,
+                    tokenizer="approx",
+                    workers=4,
                 )
-            return DummyResponse()
 
-        with mock.patch("urllib.request.urlopen", side_effect=fake_urlopen):
-            mark_entry_read("http://example.com", "token", 123)
+        stdout = buffer.getvalue()
+        self.assertIn("Unread entries: 7; Success: 5; Failed: 1; Skipped: 1", output)
+        self.assertEqual(marked, [1, 2, 4, 5, 6])
+        positions = [
+            stdout.index(f"Tytuł: Artykul {index}") for index in (1, 2, 4, 5, 6)
+        ]
+        self.assertEqual(positions, sorted(positions))
 
-        self.assertEqual(
-            calls,
-            [
-                ("PUT", "http://example.com/v1/entries?status=read"),
-                ("PUT", "http://example.com/v1/entries"),
-            ],
-        )
+    def test_run_converts_miniflux_html_in_process_pool(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
 
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "HTML", "url": "https://example.com/1"},
+                    {"id": 2, "title": "Jina", "url": "https://example.com/2"},
+                ]
 
-class ClassificationTest(unittest.TestCase):
-    def test_youtube_detection_and_shorts(self) -> None:
-        self.assertTrue(is_youtube_url("https://youtube.com/watch?v=abc"))
-        self.assertTrue(is_youtube_url("https://www.youtube.com/watch?v=abc"))
-        self.assertTrue(is_youtube_url("https://youtu.be/abc"))
-        self.assertFalse(is_youtube_url("https://example.com/watch?v=abc"))
+            def fake_article_fetcher(
+                entry_id: int | None, url: str
+            ) -> tuple[str, str]:
+                if entry_id == 1:
+                    paragraph = "Akapit z procesu konwersji. " * 20
+                    html = (
+                        "<html><body><article><h1>HTML</h1>"
+                        f"<p>{paragraph}</p><p>{paragraph}</p>"
+                        "</article></body></html>"
+                    )
+                    return html, "miniflux"
+                return "Tresc z Jiny", "fallback"
 
-        self.assertTrue(is_youtube_shorts("https://www.youtube.com/shorts/xyz"))
-        self.assertFalse(is_youtube_shorts("https://www.youtube.com/watch?v=xyz"))
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=lambda *_: None,
+                    interactive=False,
+                    tokenizer="approx",
+                    workers=2,
+                    extract_processes=1,
+                )
 
-    def test_extract_youtube_id(self) -> None:
-        self.assertEqual(
-            extract_youtube_id("https://www.youtube.com/watch?v=abc123"), "abc123"
-        )
-        self.assertEqual(extract_youtube_id("https://youtu.be/xyz987"), "xyz987")
-        self.assertIsNone(extract_youtube_id("https://www.youtube.com/shorts/xyz"))
+        stdout = buffer.getvalue()
+        self.assertIn("Success: 2; Failed: 0; Skipped: 0", output)
+        self.assertIn("# HTML", stdout)
+        self.assertIn("Akapit z procesu konwersji.", stdout)
+        self.assertNotIn("<article>", stdout)
+        self.assertLess(stdout.index("# HTML"), stdout.index("Tresc z Jiny"))
+
+    def test_upstream_limiter_caps_parallel_calls(self) -> None:
+        import threading
+        import time
+
+        from miniflux_prompt_compiler.concurrency import UpstreamLimiter, ordered_map
+
+        limiter = UpstreamLimiter({"jina": 2})
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def call(item: int) -> int:
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return item * 2
+
+        limited = limiter.wrap("jina", call)
+        results = [
+            future.result() for _, future in ordered_map(limited, range(10), workers=6)
+        ]
 
+        self.assertEqual(results, [item * 2 for item in range(10)])
+        self.assertLessEqual(peak, 2)
 
-class PromptBuildTest(unittest.TestCase):
-    def test_build_prompt_wraps_items(self) -> None:
-        prompt = build_prompt(
-            [
-                ProcessedItem(title="Artykul", content="Tresc A"),
-                ProcessedItem(title="Video", content="Tresc B"),
-            ]
-        )
 
-        self.assertIn("<lista_artykułów_i_transkrypcji>", prompt)
-        self.assertIn("</lista_artykułów_i_transkrypcji>", prompt)
-        self.assertIn("Tytuł: Artykul", prompt)
-        self.assertIn("Treść:\nTresc A", prompt)
-        self.assertIn("Tytuł: Video", prompt)
-        self.assertIn("Treść:\nTresc B", prompt)
+class AsyncRunTest(unittest.TestCase):
+    def test_run_async_keeps_entry_order_and_accounting(self) -> None:
+        import asyncio
 
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
 
-class TokenLabelTest(unittest.TestCase):
-    def test_label_for_tokens_thresholds(self) -> None:
-        self.assertEqual(label_for_tokens(0), "GPT-Instant")
-        self.assertEqual(label_for_tokens(31_999), "GPT-Instant")
-        self.assertEqual(label_for_tokens(32_000), "GPT-Thinking")
-        self.assertEqual(label_for_tokens(49_999), "GPT-Thinking")
-        self.assertEqual(label_for_tokens(50_000), "CHUNKING")
+            async def fake_fetcher(base_url: str, token: str):  # type: ignore[no-untyped-def]
+                for index in range(1, 7):
+                    yield {
+                        "id": index,
+                        "title": f"Artykul {index}",
+                        "url": f"https://example.com/{index}",
+                    }
+                yield {"id": 7, "title": "Shorts", "url": "https://www.youtube.com/shorts/x"}
+
+            active = 0
+            peak = 0
+
+            async def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                # Wczesniejsze wpisy koncza sie pozniej, zeby wymusic przetasowanie.
+                await asyncio.sleep(0.01 * (7 - (entry_id or 0)))
+                active -= 1
+                if entry_id == 3:
+                    raise RuntimeError("fail")
+                return f"content {entry_id}"
 
-    def test_count_tokens_approx(self) -> None:
-        self.assertEqual(count_tokens("abcd", tokenizer="approx"), 1)
-        self.assertEqual(count_tokens("abcdefgh", tokenizer="approx"), 2)
-        with self.assertRaises(ValueError):
-            count_tokens("test", tokenizer="unknown")
+            marked: list[int] = []
 
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                marked.append(entry_id)
 
-class PromptChunkingTest(unittest.TestCase):
-    def test_build_prompts_with_chunking_splits_on_limit(self) -> None:
-        from miniflux_prompt_compiler.core import chunking
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=fake_marker,
+                    interactive=False,
+                    tokenizer="approx",
+                    async_mode=True,
+                    async_concurrency=4,
+                )
 
-        items = [
-            ProcessedItem(title="A", content="X"),
-            ProcessedItem(title="B", content="Y"),
-            ProcessedItem(title="C", content="Z"),
+        stdout = buffer.getvalue()
+        self.assertIn("Unread entries: 7; Success: 5; Failed: 1; Skipped: 1", output)
+        self.assertEqual(marked, [1, 2, 4, 5, 6])
+        self.assertGreater(peak, 1)
+        self.assertLessEqual(peak, 4)
+        positions = [
+            stdout.index(f"Tytuł: Artykul {index}") for index in (1, 2, 4, 5, 6)
         ]
+        self.assertEqual(positions, sorted(positions))
 
-        def fake_build_prompt(current):  # type: ignore[no-untyped-def]
-            return "|".join(item.title for item in current)
+    def test_run_and_run_async_take_the_same_options(self) -> None:
+        import asyncio
 
-        def fake_count_tokens(text: str, **kwargs) -> int:
-            return len(text.split("|")) if text else 0
+        from miniflux_prompt_compiler.async_app import run_async
+        from miniflux_prompt_compiler.options import RunOptions
 
-        with mock.patch.object(chunking, "build_prompt", side_effect=fake_build_prompt):
-            with mock.patch.object(chunking, "count_tokens", side_effect=fake_count_tokens):
-                prompts = build_prompts_with_chunking(items, max_tokens=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            options = RunOptions(
+                env_path=env_path, interactive=False, tokenizer="approx"
+            )
+            injected = {
+                "environ": {},
+                "fetcher": lambda base_url, token: [
+                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"}
+                ],
+                "article_fetcher": lambda entry_id, url: "content",
+                "marker": lambda base_url, token, entry_id: None,
+            }
+            with redirect_stdout(io.StringIO()):
+                outputs = [
+                    run(options, **injected),
+                    asyncio.run(run_async(options, **injected)),
+                    run(options, async_mode=True, **injected),
+                ]
+            with self.assertRaises(TypeError):
+                run(options, no_such_option=True, **injected)
 
-        self.assertEqual(prompts, ["A|B", "C"])
+        self.assertEqual(len(set(outputs)), 1)
+        self.assertIn("Unread entries: 1; Success: 1", outputs[0])
+        self.assertFalse(options.async_mode)
 
-    def test_build_prompts_with_chunking_skips_oversize(self) -> None:
-        from miniflux_prompt_compiler.core import chunking
+    def test_run_async_fetches_while_sync_source_waits(self) -> None:
+        import threading
 
-        items = [
-            ProcessedItem(title="A", content="X"),
-            ProcessedItem(title="BIG", content="Y"),
-            ProcessedItem(title="B", content="Z"),
-        ]
+        first_fetched = threading.Event()
+        overlapped: list[bool] = []
 
-        def fake_build_prompt(current):  # type: ignore[no-untyped-def]
-            return "|".join(item.title for item in current)
+        def slow_fetcher(base_url: str, token: str):  # type: ignore[no-untyped-def]
+            yield {"id": 1, "title": "Pierwszy", "url": "https://example.com/1"}
+            # Kolejna strona "czeka" az pobierze sie tresc pierwszego wpisu;
+            # gdyby zrodlo blokowalo petle zdarzen, pobranie nie mogloby ruszyc.
+            overlapped.append(first_fetched.wait(timeout=2))
+            yield {"id": 2, "title": "Drugi", "url": "https://example.com/2"}
 
-        def fake_count_tokens(text: str, **kwargs) -> int:
-            return 10 if "BIG" in text else len(text.split("|"))
+        async def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+            if entry_id == 1:
+                first_fetched.set()
+            return f"content {entry_id}"
 
-        with mock.patch.object(chunking, "build_prompt", side_effect=fake_build_prompt):
-            with mock.patch.object(chunking, "count_tokens", side_effect=fake_count_tokens):
-                with self.assertLogs(level="INFO") as logs:
-                    prompts = build_prompts_with_chunking(items, max_tokens=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            with redirect_stdout(io.StringIO()):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=slow_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=lambda base_url, token, entry_id: None,
+                    interactive=False,
+                    tokenizer="approx",
+                    async_mode=True,
+                )
 
-        self.assertEqual(prompts, ["A", "B"])
-        self.assertTrue(
-            any(
-                "Item exceeds max token limit and was skipped" in strip_ansi(message)
-                for message in logs.output
-            )
-        )
+        self.assertEqual(overlapped, [True])
+        self.assertIn("Unread entries: 2; Success: 2; Failed: 0; Skipped: 0", output)
 
+    def test_run_async_uses_async_adapters_by_default(self) -> None:
+        import json
 
-class InteractiveModeTest(unittest.TestCase):
-    def test_run_interactive_waits_for_enter_single_prompt(self) -> None:
-        from miniflux_prompt_compiler import app as app_module
+        import httpx
+
+        from miniflux_prompt_compiler import async_app
+
+        requests_seen: list[tuple[str, str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests_seen.append((request.method, str(request.url)))
+            path = request.url.path
+            if request.url.host == "r.jina.ai":
+                return httpx.Response(200, text="Tresc z Jiny")
+            if path == "/v1/entries" and request.method == "GET":
+                return httpx.Response(
+                    200,
+                    json={
+                        "entries": [
+                            {"id": 1, "title": "HTML", "url": "https://example.com/1"},
+                            {"id": 2, "title": "Jina", "url": "https://example.com/2"},
+                        ]
+                    },
+                )
+            if path == "/v1/entries/1/fetch-content":
+                paragraph = "Akapit z Minifluxa. " * 20
+                return httpx.Response(
+                    200,
+                    json={
+                        "content": (
+                            "<html><body><article><h1>HTML</h1>"
+                            f"<p>{paragraph}</p><p>{paragraph}</p>"
+                            "</article></body></html>"
+                        )
+                    },
+                )
+            if path == "/v1/entries/2/fetch-content":
+                return httpx.Response(500)
+            if path == "/v1/entries" and request.method == "PUT":
+                self.assertEqual(json.loads(request.content)["entry_ids"], [1, 2])
+                return httpx.Response(204)
+            return httpx.Response(404)
+
+        def fake_client(*args: object, **kwargs: object) -> httpx.AsyncClient:
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
 
         with tempfile.TemporaryDirectory() as tmpdir:
             env_path = Path(tmpdir) / ".env"
             env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            buffer = io.StringIO()
+            with mock.patch.object(async_app, "create_async_client", fake_client):
+                with redirect_stdout(buffer):
+                    output = run(
+                        env_path=env_path,
+                        environ={},
+                        base_url="http://miniflux.local",
+                        interactive=False,
+                        tokenizer="approx",
+                        extract_processes=0,
+                        async_mode=True,
+                    )
 
-            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
-                return [
-                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"},
-                ]
+        stdout = buffer.getvalue()
+        self.assertIn("Unread entries: 2; Success: 2; Failed: 0; Skipped: 0", output)
+        self.assertIn("# HTML", stdout)
+        self.assertNotIn("<article>", stdout)
+        self.assertIn("Tresc z Jiny", stdout)
+        self.assertIn(
+            ("PUT", "http://miniflux.local/v1/entries?status=read"), requests_seen
+        )
 
-            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
-                return "content"
+    def test_sync_and_async_share_pool_defaults(self) -> None:
+        from miniflux_prompt_compiler import app, async_app
+        from miniflux_prompt_compiler.adapters.http_client import (
+            create_async_client,
+            create_session,
+        )
 
-            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
-                return None
+        self.assertEqual(app.resolve_pool_size(None, 1), 10)
+        self.assertEqual(app.resolve_pool_size(None, 32), 32)
+        self.assertEqual(app.resolve_pool_size(4, 32), 4)
+        self.assertEqual(app.resolve_extract_processes(None, 1), 0)
+        self.assertEqual(app.resolve_extract_processes(2, 1), 2)
+        with mock.patch("os.cpu_count", return_value=6):
+            self.assertEqual(app.resolve_extract_processes(None, 8), 6)
 
-            events: list[str] = []
+        pool_sizes: list[tuple[str, int]] = []
 
-            def fake_input_reader() -> None:
-                events.append("input")
+        def sync_session(pool_size: int, **kwargs: object):  # type: ignore[no-untyped-def]
+            pool_sizes.append(("sync", pool_size))
+            return create_session(pool_size, **kwargs)
 
-            def fake_clipboard(text: str) -> None:
-                events.append(f"clipboard:{text}")
+        def async_client(pool_size: int, **kwargs: object):  # type: ignore[no-untyped-def]
+            pool_sizes.append(("async", pool_size))
+            return create_async_client(pool_size, **kwargs)
 
-            with mock.patch.object(
-                app_module,
-                "build_prompts_with_chunking",
-                return_value=["PROMPT1"],
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            with (
+                mock.patch.object(app, "create_session", sync_session),
+                mock.patch.object(async_app, "create_async_client", async_client),
             ):
-                with mock.patch.object(app_module, "count_tokens", return_value=10):
-                    output = run(
+                for async_mode in (False, True):
+                    run(
                         env_path=env_path,
                         environ={},
-                        fetcher=fake_fetcher,
-                        article_fetcher=fake_article_fetcher,
-                        marker=fake_marker,
-                        clipboard=fake_clipboard,
-                        input_reader=fake_input_reader,
-                        interactive=True,
+                        fetcher=lambda base_url, token: [],
+                        marker=lambda base_url, token, entry_id: None,
+                        interactive=False,
+                        tokenizer="approx",
+                        workers=16,
+                        async_concurrency=16,
+                        async_mode=async_mode,
                     )
 
-        self.assertEqual(events, ["input", "clipboard:PROMPT1"])
-        self.assertIn("Tokens: 10", output)
+        self.assertEqual(pool_sizes, [("sync", 16), ("sync", 16), ("async", 16)])
 
-    def test_run_no_interactive_outputs_prompts(self) -> None:
-        from miniflux_prompt_compiler import app as app_module
+    def test_ordered_map_async_limits_tasks_in_flight(self) -> None:
+        import asyncio
+
+        from miniflux_prompt_compiler.concurrency import ordered_map_async
+
+        active = 0
+        peak = 0
+
+        async def double(item: int) -> int:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001 * (10 - item))
+            active -= 1
+            return item * 2
+
+        async def items():  # type: ignore[no-untyped-def]
+            for item in range(10):
+                yield item
+
+        async def collect() -> list[int]:
+            return [
+                task.result()
+                async for _, task in ordered_map_async(double, items(), limit=3)
+            ]
+
+        self.assertEqual(asyncio.run(collect()), [item * 2 for item in range(10)])
+        self.assertLessEqual(peak, 3)
+
+
+class UnreadPaginationTest(unittest.TestCase):
+    def test_iter_unread_entries_pages_with_cursor_and_drops_content(self) -> None:
+        from urllib.parse import parse_qs, urlparse
+
+        from miniflux_prompt_compiler.adapters.miniflux_http import iter_unread_entries
+
+        pages = {
+            None: [
+                {
+                    "id": 1,
+                    "url": "u1",
+                    "content": "<p>x</p>",
+                    "feed": {
+                        "id": 7,
+                        "title": "Kanal",
+                        "site_url": "https://example.com",
+                        "category": {"id": 3, "title": "Tech", "user_id": 1},
+                    },
+                },
+                {"id": 2, "url": "u2"},
+            ],
+            "2": [{"id": 3, "url": "u3"}, {"id": 4, "url": "u4"}],
+            "4": [{"id": 5, "url": "u5", "content": "<p>y</p>"}],
+        }
+        queries: list[dict[str, list[str]]] = []
+
+        def fake_get(url, params=None, **kwargs):  # type: ignore[no-untyped-def]
+            request = requests.Request("GET", url, params=params).prepare()
+            query = parse_qs(urlparse(request.url).query)
+            queries.append(query)
+            cursor = query.get("after_entry_id", [None])[0]
+            return fake_response(payload={"entries": pages[cursor]})
+
+        session = mock.Mock(spec=requests.Session)
+        session.get.side_effect = fake_get
+        entries = list(
+            iter_unread_entries(
+                "http://example.com", "token", page_size=2, session=session
+            )
+        )
+
+        self.assertEqual([entry["id"] for entry in entries], [1, 2, 3, 4, 5])
+        self.assertTrue(all("content" not in entry for entry in entries))
+        self.assertEqual(
+            entries[0]["feed"], {"title": "Kanal", "category": {"title": "Tech"}}
+        )
+        self.assertNotIn("feed", entries[1])
+        self.assertEqual(
+            [query.get("after_entry_id") for query in queries], [None, ["2"], ["4"]]
+        )
+        self.assertTrue(all(query["limit"] == ["2"] for query in queries))
+        self.assertTrue(all(query["status"] == ["unread"] for query in queries))
 
+    def test_run_consumes_entries_lazily(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
             env_path = Path(tmpdir) / ".env"
             env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            events: list[str] = []
 
-            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
-                return [
-                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"},
-                    {"id": 2, "title": "Video", "url": "https://youtu.be/abc123"},
-                ]
+            def fake_fetcher(base_url: str, token: str):  # type: ignore[no-untyped-def]
+                for index in (1, 2):
+                    events.append(f"yield:{index}")
+                    yield {"id": index, "title": "A", "url": f"https://e.com/{index}"}
 
             def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                events.append(f"fetch:{entry_id}")
                 return "content"
 
-            def fake_youtube_fetcher(video_id: str) -> str:
-                return "transcript"
+            with redirect_stdout(io.StringIO()):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=lambda base_url, token, entry_id: None,
+                    interactive=False,
+                    tokenizer="approx",
+                )
 
-            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
-                return None
+        self.assertEqual(events, ["yield:1", "fetch:1", "yield:2", "fetch:2"])
+        self.assertIn("Unread entries: 2; Success: 2", output)
 
-            clipboard_values: list[str] = []
 
-            def fake_clipboard(text: str) -> None:
-                clipboard_values.append(text)
+class MarkReadFallbackTest(unittest.TestCase):
+    def test_mark_entry_read_falls_back_on_400(self) -> None:
+        from miniflux_prompt_compiler.adapters.miniflux_http import mark_entry_read
 
-            def fake_input_reader() -> None:
-                return None
+        calls: list[tuple[str, str]] = []
 
-            with mock.patch.object(
-                app_module,
-                "build_prompts_with_chunking",
-                return_value=["PROMPT1", "PROMPT2"],
-            ):
-                with mock.patch.object(
-                    app_module, "count_tokens", side_effect=[70_000, 10, 20]
-                ):
-                    buffer = io.StringIO()
-                    with self.assertLogs(level="INFO") as logs:
-                        with redirect_stdout(buffer):
-                            output = run(
-                                env_path=env_path,
-                                environ={},
-                                fetcher=fake_fetcher,
-                                article_fetcher=fake_article_fetcher,
-                                youtube_fetcher=fake_youtube_fetcher,
-                                marker=fake_marker,
-                                clipboard=fake_clipboard,
-                                interactive=False,
-                            )
+        def fake_request(method, url, **kwargs):  # type: ignore[no-untyped-def]
+            calls.append((method, url))
+            return fake_response(400 if len(calls) == 1 else 204)
 
-        stdout = strip_ansi(buffer.getvalue())
-        self.assertEqual(clipboard_values, [])
-        self.assertTrue(
-            any("Total tokens: 70000 -> CHUNKING" in message for message in logs.output)
-        )
+        session = mock.Mock(spec=requests.Session)
+        session.request.side_effect = fake_request
+        mark_entry_read("http://example.com", "token", 123, session=session)
+
+        self.assertEqual(
+            calls,
+            [
+                ("PUT", "http://example.com/v1/entries?status=read"),
+                ("PUT", "http://example.com/v1/entries"),
+            ],
+        )
+
+    def test_per_entry_variant_records_each_entry_and_skips_404(self) -> None:
+        from miniflux_prompt_compiler.adapters.miniflux_http import (
+            PER_ENTRY_VARIANT,
+            BatchReadMarker,
+            mark_entries_read,
+        )
+        from miniflux_prompt_compiler.types import PartialMarkReadError
+
+        statuses = {"1": 204, "2": 404, "3": 400, "4": 204}
+        calls: list[str] = []
+
+        def fake_request(method, url, **kwargs):  # type: ignore[no-untyped-def]
+            calls.append(url.rsplit("/", 1)[-1])
+            return fake_response(statuses[url.rsplit("/", 1)[-1]])
+
+        session = mock.Mock(spec=requests.Session)
+        session.request.side_effect = fake_request
+        with self.assertLogs(level="INFO") as logs:
+            with self.assertRaises(PartialMarkReadError) as raised:
+                mark_entries_read(
+                    "http://example.com",
+                    "token",
+                    [1, 2, 3, 4],
+                    variant=PER_ENTRY_VARIANT,
+                    session=session,
+                )
+
+        self.assertEqual(calls, ["1", "2", "3", "4"])
+        self.assertEqual(raised.exception.marked, [1, 2, 4])
+        self.assertTrue(any("wpis 2 nie istnieje" in line for line in logs.output))
+
+        calls.clear()
+        marker = BatchReadMarker(
+            "http://example.com", "token", batch_size=2, session=session
+        )
+        marker.variant = PER_ENTRY_VARIANT
+        with self.assertLogs(level="INFO") as logs:
+            flushed = [marker.add(entry_id) for entry_id in (1, 2, 3, 4)]
+
+        self.assertEqual(flushed, [[], [1, 2], [], [4]])
+        self.assertEqual(calls, ["1", "2", "3", "4"])
+        self.assertEqual(marker.variant, PER_ENTRY_VARIANT)
+        self.assertTrue(any("Blad oznaczania read" in line for line in logs.output))
+
+    def test_async_per_entry_variant_records_each_entry_and_skips_404(self) -> None:
+        import asyncio
+
+        import httpx
+
+        from miniflux_prompt_compiler.adapters.miniflux_http import (
+            PER_ENTRY_VARIANT,
+            AsyncBatchReadMarker,
+        )
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+
+        statuses = {"1": 204, "2": 404, "3": 503, "4": 204}
+        calls: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path.rsplit("/", 1)[-1])
+            return httpx.Response(statuses[calls[-1]])
+
+        async def scenario() -> list[int]:
+            async with httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)
+            ) as client:
+                marker = AsyncBatchReadMarker(
+                    client,
+                    "http://example.com",
+                    "token",
+                    batch_size=4,
+                    retry_policy=RetryPolicy(attempts=1),
+                )
+                marker.variant = PER_ENTRY_VARIANT
+                for entry_id in (1, 2, 3, 4):
+                    marked = await marker.add(entry_id)
+                return marked
+
+        with self.assertLogs(level="INFO"):
+            marked = asyncio.run(scenario())
+
+        self.assertEqual(marked, [1, 2, 4])
+        self.assertEqual(calls, ["1", "2", "3", "4"])
+
+
+class HttpSessionTest(unittest.TestCase):
+    def test_create_session_configures_pool_and_compression(self) -> None:
+        from miniflux_prompt_compiler.adapters.http_client import create_session
+
+        with create_session(pool_size=8, pool_hosts=3) as session:
+            adapter = session.get_adapter("https://r.jina.ai/")
+            self.assertEqual(adapter._pool_maxsize, 8)
+            self.assertEqual(adapter._pool_connections, 3)
+            self.assertIn("gzip", session.headers["Accept-Encoding"])
+
+    def test_miniflux_requests_reuse_one_connection(self) -> None:
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        from miniflux_prompt_compiler.adapters.http_client import create_session
+        from miniflux_prompt_compiler.adapters.miniflux_http import (
+            fetch_entry_content,
+        )
+
+        client_ports: set[int] = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                client_ports.add(self.client_address[1])
+                body = json.dumps({"content": "<p>HTML</p>"}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                return None
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with create_session() as session:
+                contents = [
+                    fetch_entry_content(base_url, "token", entry_id, session=session)
+                    for entry_id in range(5)
+                ]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(contents, ["<p>HTML</p>"] * 5)
+        self.assertEqual(len(client_ports), 1)
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_token_bucket_allows_burst_then_spaces_requests(self) -> None:
+        from miniflux_prompt_compiler.concurrency import TokenBucket
+
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0])
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_session_requests_wait_for_host_tokens_and_record_stats(self) -> None:
+        from requests.adapters import HTTPAdapter
+
+        from miniflux_prompt_compiler.adapters.http_client import create_session
+        from miniflux_prompt_compiler.concurrency import HostRateLimiter
+
+        waits: list[float] = []
+        limiter = HostRateLimiter(
+            {"example.com": (1.0, 1), "youtube.com": (0, 1)},
+            clock=lambda: 0.0,
+            sleep=waits.append,
+        )
+        with mock.patch.object(
+            HTTPAdapter, "send", return_value=fake_response(payload={})
+        ):
+            with create_session(rate_limiter=limiter) as session:
+                for _ in range(3):
+                    session.get("https://www.example.com/a")
+                session.get("https://www.youtube.com/watch?v=x")
+                session.get("https://other.org/")
+
+        self.assertEqual(waits, [1.0, 2.0])
+        self.assertEqual(list(limiter.stats), ["example.com"])
+        stats = limiter.stats["example.com"]
+        self.assertEqual((stats.requests, stats.delayed), (3, 2))
+        self.assertEqual((stats.total_wait, stats.max_wait), (3.0, 2.0))
+
+    def test_rate_limits_come_from_env_file_and_arguments(self) -> None:
+        from miniflux_prompt_compiler.app import resolve_rate_limits
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text(
+                "RATE_LIMITS=r.jina.ai=1:3, youtube.com=0.5\n", encoding="utf-8"
+            )
+            limits = resolve_rate_limits(
+                env_path, {}, {"r.jina.ai": (2.0, 4)}
+            )
+            env_path.write_text("RATE_LIMITS=r.jina.ai\n", encoding="utf-8")
+            with self.assertRaises(RuntimeError):
+                resolve_rate_limits(env_path, {}, None)
+
+        self.assertEqual(limits, {"r.jina.ai": (2.0, 4), "youtube.com": (0.5, 1)})
+
+
+class RunMetricsTest(unittest.TestCase):
+    def test_run_writes_json_report_and_prometheus_textfile(self) -> None:
+        import json
+
+        from miniflux_prompt_compiler import app as app_module
+        from miniflux_prompt_compiler.types import ContentFetchError
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            report_path = Path(tmpdir) / "report.json"
+            prom_path = Path(tmpdir) / "metrics.prom"
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "A1", "url": "https://example.com/1"},
+                    {"id": 2, "title": "A2", "url": "https://example.com/2"},
+                ]
+
+            def fake_content(base_url: str, token: str, entry_id: int, **_: object) -> str:
+                if entry_id == 2:
+                    raise ContentFetchError("pusto")
+                paragraph = f"<p>{'Tresc ' * 50}</p>"
+                return f"<html><body><article>{paragraph}</article></body></html>"
+
+            with mock.patch.object(
+                app_module, "fetch_entry_content", side_effect=fake_content
+            ), mock.patch.object(
+                app_module, "fetch_article_markdown", return_value="Jina " * 50
+            ), redirect_stdout(io.StringIO()):
+                run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    marker=lambda *_: None,
+                    interactive=False,
+                    tokenizer="approx",
+                    extract_processes=0,
+                    route_probe_rate=0,
+                    metrics_path=report_path,
+                    prometheus_path=prom_path,
+                )
+
+            report = json.loads(report_path.read_text(encoding="utf-8"))
+            prom = prom_path.read_text(encoding="utf-8")
+
+        self.assertEqual(
+            report["summary"],
+            {"unread": 2, "success": 2, "failed": 0, "skipped": 0, "duplicates": 0},
+        )
+        stages = {
+            (row["stage"], row["source"], row["outcome"]): row
+            for row in report["stages"]
+        }
+        for key in (
+            ("list", None, "ok"),
+            ("article", "miniflux", "ok"),
+            ("article", "miniflux", "error"),
+            ("article", "jina", "ok"),
+            ("trafilatura", None, "ok"),
+            ("mark-read", None, "ok"),
+            ("chunk", None, "ok"),
+            ("tokenize", None, "ok"),
+        ):
+            self.assertIn(key, stages)
+        self.assertEqual(stages[("article", "jina", "ok")]["bytes_total"], 250)
+        jina_span = next(
+            span for span in report["spans"] if span["source"] == "jina"
+        )
+        self.assertEqual(jina_span["entry_id"], 2)
+        self.assertIn(
+            'miniflux_prompt_compiler_stage_calls_total{stage="article",'
+            'source="jina",outcome="ok"} 1',
+            prom,
+        )
+        self.assertIn("miniflux_prompt_compiler_run_success 2", prom)
+
+    def test_span_records_errors_and_cancellations(self) -> None:
+        import asyncio
+
+        from miniflux_prompt_compiler.metrics import RunMetrics
+
+        ticks = iter([0.0, 0.0, 0.5, 1.0, 3.0])
+        metrics = RunMetrics(clock=lambda: next(ticks))
+        with self.assertRaises(RuntimeError):
+            with metrics.span("youtube"):
+                raise RuntimeError("brak napisow")
+        with self.assertRaises(asyncio.CancelledError):
+            with metrics.span("article", 7, "jina"):
+                raise asyncio.CancelledError()
+
+        first, second = metrics.spans
+        self.assertEqual((first.outcome, first.duration), ("error", 0.5))
+        self.assertEqual(first.error, "RuntimeError: brak napisow")
+        self.assertEqual(
+            (second.outcome, second.entry_id, second.source, second.duration),
+            ("cancelled", 7, "jina", 2.0),
+        )
+
+
+class BatchReadMarkerTest(unittest.TestCase):
+    def test_batch_marker_learns_variant_and_flushes_in_chunks(self) -> None:
+        from miniflux_prompt_compiler.adapters.miniflux_http import BatchReadMarker
+
+        calls: list[tuple[str, str, object]] = []
+
+        def fake_request(method, url, json, **kwargs):  # type: ignore[no-untyped-def]
+            calls.append((method, url, json.get("entry_ids")))
+            return fake_response(400 if url.endswith("?status=read") else 204)
+
+        session = mock.Mock(spec=requests.Session)
+        session.request.side_effect = fake_request
+        marker = BatchReadMarker(
+            "http://example.com", "token", batch_size=2, session=session
+        )
+        flushed = [marker.add(entry_id) for entry_id in (1, 2, 3, 4, 5)]
+        flushed.append(marker.flush())
+
+        self.assertEqual(flushed, [[], [1, 2], [], [3, 4], [], [5]])
+        self.assertEqual(marker.variant, 1)
+        self.assertEqual(
+            calls,
+            [
+                ("PUT", "http://example.com/v1/entries?status=read", [1, 2]),
+                ("PUT", "http://example.com/v1/entries", [1, 2]),
+                ("PUT", "http://example.com/v1/entries", [3, 4]),
+                ("PUT", "http://example.com/v1/entries", [5]),
+            ],
+        )
+
+    def test_run_uses_batch_marker_by_default(self) -> None:
+        from miniflux_prompt_compiler import app as app_module
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": index, "title": "A", "url": f"https://example.com/{index}"}
+                    for index in (1, 2, 3)
+                ]
+
+            batches: list[list[int]] = []
+
+            def fake_mark_entries_read(  # type: ignore[no-untyped-def]
+                base_url, token, entry_ids, **kwargs
+            ):
+                batches.append(list(entry_ids))
+                return 1
+
+            with mock.patch(
+                "miniflux_prompt_compiler.adapters.miniflux_http.mark_entries_read",
+                side_effect=fake_mark_entries_read,
+            ):
+                buffer = io.StringIO()
+                with redirect_stdout(buffer):
+                    output = app_module.run(
+                        env_path=env_path,
+                        environ={},
+                        fetcher=fake_fetcher,
+                        interactive=False,
+                        links_only=True,
+                        mark_batch_size=2,
+                    )
+
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertIn("Success: 3", output)
+
+
+class ContentCacheTest(unittest.TestCase):
+    def test_cache_expires_entries_and_evicts_least_recently_used(self) -> None:
+        from miniflux_prompt_compiler.adapters.content_cache import ContentCache
+
+        now = [1000.0]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with ContentCache(
+                Path(tmpdir) / "cache.sqlite3",
+                ttl_seconds=60,
+                max_bytes=10,
+                clock=lambda: now[0],
+            ) as cache:
+                cache.put("article", "a", "aaaa")
+                now[0] += 1
+                cache.put("article", "b", "bbbb")
+                now[0] += 1
+                self.assertEqual(cache.get("article", "a"), "aaaa")
+                now[0] += 1
+                cache.put("article", "c", "cccc")
+
+                self.assertIsNone(cache.get("article", "b"))
+                self.assertEqual(cache.get("article", "a"), "aaaa")
+                self.assertEqual(cache.get("article", "c"), "cccc")
+
+                now[0] += 120
+                self.assertIsNone(cache.get("article", "c"))
+
+    def test_run_reuses_cached_content_between_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            cache_dir = Path(tmpdir) / "cache"
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"},
+                    {"id": 2, "title": "Video", "url": "https://youtu.be/abc123"},
+                ]
+
+            calls: list[str] = []
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                calls.append(url)
+                return "content"
+
+            def fake_youtube_fetcher(video_id: str) -> str:
+                calls.append(video_id)
+                return "transcript"
+
+            outputs: list[str] = []
+            for _ in range(2):
+                buffer = io.StringIO()
+                with redirect_stdout(buffer):
+                    run(
+                        env_path=env_path,
+                        environ={},
+                        fetcher=fake_fetcher,
+                        article_fetcher=fake_article_fetcher,
+                        youtube_fetcher=fake_youtube_fetcher,
+                        marker=lambda base_url, token, entry_id: None,
+                        interactive=False,
+                        tokenizer="approx",
+                        cache_dir=cache_dir,
+                    )
+                outputs.append(buffer.getvalue())
+
+        self.assertEqual(calls, ["https://example.com/a", "abc123"])
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class RunJournalTest(unittest.TestCase):
+    def test_journal_resumes_unfinished_run_until_all_entries_are_read(self) -> None:
+        from miniflux_prompt_compiler.adapters.run_journal import RunJournal
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "journal.sqlite3"
+            with RunJournal(path) as journal:
+                self.assertEqual(journal.begin("prompts"), {})
+                journal.extracted(1, ProcessedItem(title="A", content="a"))
+                journal.extracted(2, ProcessedItem(title="B", content="b"))
+                journal.delivered([1], prompt=1)
+
+            with RunJournal(path) as journal:
+                with self.assertLogs(level="INFO"):
+                    self.assertEqual(journal.begin("links", resume=True), {})
+
+            with RunJournal(path) as journal:
+                self.assertEqual(journal.begin("prompts"), {})
+                journal.extracted(1, ProcessedItem(title="A", content="a"))
+                journal.extracted(2, ProcessedItem(title="B", content="b"))
+                journal.delivered([1], prompt=1)
+
+            with RunJournal(path) as journal:
+                with self.assertLogs(level="INFO"):
+                    resumed = journal.begin("prompts", resume=True)
+                self.assertEqual(list(resumed), [1, 2])
+                self.assertEqual(resumed[1].state, "delivered")
+                self.assertEqual(resumed[1].prompt, 1)
+                self.assertEqual(
+                    resumed[2].result(), ProcessedItem("B", "b", entry_id=2)
+                )
+                journal.read([1])
+                with self.assertLogs(level="INFO"):
+                    self.assertFalse(journal.finish())
+                journal.read([2])
+                self.assertTrue(journal.finish())
+
+            with RunJournal(path) as journal:
+                with self.assertLogs(level="INFO") as logs:
+                    self.assertEqual(journal.begin("prompts", resume=True), {})
+        self.assertIn("brak przerwanego przebiegu", logs.output[0])
+
+    def test_run_marks_read_after_delivery_and_resumes_interrupted_run(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            state_dir = Path(tmpdir) / "state"
+            events: list[str] = []
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "A", "url": "https://example.com/a"},
+                    {"id": 2, "title": "B", "url": "https://example.com/b"},
+                ]
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                events.append(f"fetch:{entry_id}")
+                return f"tresc {entry_id}"
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                events.append(f"mark:{entry_id}")
+
+            def interrupted() -> str:
+                raise KeyboardInterrupt
+
+            options = {
+                "env_path": env_path,
+                "environ": {},
+                "fetcher": fake_fetcher,
+                "article_fetcher": fake_article_fetcher,
+                "marker": fake_marker,
+                "clipboard": lambda text: events.append("clipboard"),
+                "tokenizer": "approx",
+                "state_dir": state_dir,
+            }
+            with self.assertLogs(level="INFO"):
+                with self.assertRaises(KeyboardInterrupt):
+                    run(input_reader=interrupted, **options)
+            self.assertEqual(events, ["fetch:1", "fetch:2"])
+
+            events.clear()
+            with self.assertLogs(level="INFO") as logs:
+                output = run(input_reader=lambda: "", resume=True, **options)
+
+        self.assertEqual(events, ["clipboard", "mark:1", "mark:2"])
+        self.assertIn("Success: 2", output)
+        self.assertTrue(
+            any("Dziennik: wpis 1 bez pobierania" in line for line in logs.output)
+        )
+
+    def test_plain_run_keeps_interrupted_run_for_resume(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            listed: list[list[int]] = [[1, 2], [3], [1, 2, 3]]
+            events: list[str] = []
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": index, "title": f"T{index}", "url": f"https://e.com/{index}"}
+                    for index in listed.pop(0)
+                ]
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                events.append(f"fetch:{entry_id}")
+                return f"tresc {entry_id}"
+
+            def interrupted() -> str:
+                raise KeyboardInterrupt
+
+            options = {
+                "env_path": env_path,
+                "environ": {},
+                "fetcher": fake_fetcher,
+                "article_fetcher": fake_article_fetcher,
+                "marker": lambda base_url, token, entry_id: events.append(
+                    f"mark:{entry_id}"
+                ),
+                "clipboard": lambda text: events.append("clipboard"),
+                "tokenizer": "approx",
+                "state_dir": Path(tmpdir) / "state",
+            }
+            with self.assertLogs(level="INFO"):
+                with self.assertRaises(KeyboardInterrupt):
+                    run(input_reader=interrupted, **options)
+            with self.assertLogs(level="INFO") as logs:
+                with self.assertRaises(KeyboardInterrupt):
+                    run(input_reader=interrupted, **options)
+            self.assertTrue(
+                any("(2 wpisow); zostaje w dzienniku" in line for line in logs.output)
+            )
+
+            events.clear()
+            with self.assertLogs(level="INFO"):
+                output = run(input_reader=lambda: "", resume=True, **options)
+
+        self.assertEqual(events, ["clipboard", "mark:1", "mark:2", "mark:3"])
+        self.assertIn("Success: 3", output)
+
+    def test_run_resume_marks_delivered_entries_without_redelivery(self) -> None:
+        for async_mode in (False, True):
+            with self.subTest(async_mode=async_mode):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    env_path = Path(tmpdir) / ".env"
+                    env_path.write_text(
+                        "MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8"
+                    )
+                    delivered: list[str] = []
+                    marked: list[int] = []
+
+                    def fake_fetcher(
+                        base_url: str, token: str
+                    ) -> list[dict[str, object]]:
+                        return [
+                            {"id": 1, "title": "A", "url": "https://example.com/a"},
+                            {"id": 2, "title": "B", "url": "https://example.com/b"},
+                        ]
+
+                    def failing_marker(
+                        base_url: str, token: str, entry_id: int
+                    ) -> None:
+                        raise RuntimeError("Miniflux niedostepny")
+
+                    options = {
+                        "env_path": env_path,
+                        "environ": {},
+                        "fetcher": fake_fetcher,
+                        "article_fetcher": lambda entry_id, url: "tresc",
+                        "clipboard": delivered.append,
+                        "input_reader": lambda: "",
+                        "tokenizer": "approx",
+                        "state_dir": Path(tmpdir) / "state",
+                        "async_mode": async_mode,
+                    }
+                    with self.assertLogs(level="INFO"):
+                        run(marker=failing_marker, **options)
+                        output = run(
+                            marker=lambda base_url, token, entry_id: marked.append(
+                                entry_id
+                            ),
+                            resume=True,
+                            **options,
+                        )
+
+                self.assertEqual(len(delivered), 1)
+                self.assertEqual(marked, [1, 2])
+                self.assertIn("Unread entries: 0", output)
+
+
+class DedupTest(unittest.TestCase):
+    def test_canonical_url_strips_tracking_and_unwraps_redirectors(self) -> None:
+        from miniflux_prompt_compiler.core.dedup import canonical_url, clean_url
+
+        self.assertEqual(
+            clean_url(
+                "https://www.google.com/url?q=https://example.com/a%3Fid%3D3"
+                "%26utm_source%3Dx&sa=D"
+            ),
+            "https://example.com/a?id=3",
+        )
+        self.assertEqual(
+            clean_url("https://example.com/a?fbclid=1&page=2#top"),
+            "https://example.com/a?page=2#top",
+        )
+        self.assertEqual(
+            canonical_url("https://WWW.Example.com/a/?b=2&a=1&utm_medium=rss#x"),
+            canonical_url("http://example.com/a?a=1&b=2"),
+        )
+        self.assertEqual(
+            canonical_url("https://youtu.be/abc123"),
+            canonical_url("https://www.youtube.com/watch?v=abc123&feature=share"),
+        )
+        self.assertNotEqual(
+            canonical_url("https://example.com/a"),
+            canonical_url("https://example.com/b"),
+        )
+
+    def test_clean_url_keeps_untracked_query_verbatim(self) -> None:
+        from miniflux_prompt_compiler.core.dedup import clean_url
+
+        for url in (
+            "https://e.com/a?foo",
+            "https://e.com/a?q=caf%C3%A9+bar&sig=a%2Fb%3D%3D",
+            "https://e.com/a?x=1&x=2&flag",
+        ):
+            self.assertEqual(clean_url(url), url)
+        self.assertEqual(
+            clean_url("https://e.com/a?foo&utm_source=rss&sig=a%2Fb%3D"),
+            "https://e.com/a?foo&sig=a%2Fb%3D",
+        )
+
+    def test_deduplicator_collapses_near_duplicate_content_only(self) -> None:
+        import random
+
+        from miniflux_prompt_compiler.core.dedup import Deduplicator
+
+        rng = random.Random(3)
+        words = [f"slowo{index}" for index in range(2000)]
+
+        def article(size: int) -> str:
+            return " ".join(rng.choice(words) for _ in range(size))
+
+        story = article(400)
+        boilerplate = article(80)
+        deduplicator = Deduplicator()
+
+        self.assertIsNone(
+            deduplicator.near_duplicate(ProcessedItem("Reuters", story))
+        )
+        self.assertIsNone(
+            deduplicator.near_duplicate(
+                ProcessedItem("Inny", article(400) + boilerplate)
+            )
+        )
+        self.assertIsNone(
+            deduplicator.near_duplicate(
+                ProcessedItem("Jeszcze inny", article(400) + boilerplate)
+            )
+        )
+        self.assertEqual(
+            deduplicator.near_duplicate(
+                ProcessedItem(
+                    "Portal", f"Portal: {article(20)}\n{story}\n{article(30)}"
+                )
+            ),
+            "Reuters",
+        )
+        self.assertIsNone(deduplicator.near_duplicate(ProcessedItem("Krotki", "x")))
+        self.assertIsNone(deduplicator.near_duplicate(ProcessedItem("Krotki", "x")))
+        self.assertEqual(deduplicator.content_duplicates, 1)
+
+    def test_run_collapses_duplicates_and_marks_all_read(self) -> None:
+        import random
+
+        rng = random.Random(5)
+        story = " ".join(f"slowo{rng.randint(0, 3000)}" for _ in range(300))
+        other = " ".join(f"slowo{rng.randint(0, 3000)}" for _ in range(300))
+        contents = {
+            "https://example.com/a": story,
+            "https://wire.example.org/a?utm_medium=x": f"Depesza\n{story}",
+            "https://example.com/b": other,
+        }
+        for async_mode in (False, True):
+            with self.subTest(async_mode=async_mode):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    env_path = Path(tmpdir) / ".env"
+                    env_path.write_text(
+                        "MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8"
+                    )
+                    fetched: list[str] = []
+                    marked: list[int] = []
+
+                    def fake_fetcher(
+                        base_url: str, token: str
+                    ) -> list[dict[str, object]]:
+                        return [
+                            {"id": 1, "title": "A", "url": "https://example.com/a"},
+                            {
+                                "id": 2,
+                                "title": "A (RSS)",
+                                "url": "https://www.example.com/a/?utm_source=rss",
+                            },
+                            {
+                                "id": 3,
+                                "title": "A (depesza)",
+                                "url": "https://wire.example.org/a?utm_medium=x",
+                            },
+                            {"id": 4, "title": "B", "url": "https://example.com/b"},
+                        ]
+
+                    def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                        fetched.append(url)
+                        return contents[url]
+
+                    buffer = io.StringIO()
+                    with self.assertLogs(level="INFO") as logs:
+                        with redirect_stdout(buffer):
+                            output = run(
+                                env_path=env_path,
+                                environ={},
+                                fetcher=fake_fetcher,
+                                article_fetcher=fake_article_fetcher,
+                                marker=lambda base_url, token, entry_id: (
+                                    marked.append(entry_id)
+                                ),
+                                interactive=False,
+                                tokenizer="approx",
+                                async_mode=async_mode,
+                            )
+
+                self.assertEqual(
+                    fetched,
+                    [
+                        "https://example.com/a",
+                        "https://wire.example.org/a?utm_medium=x",
+                        "https://example.com/b",
+                    ],
+                )
+                self.assertEqual(sorted(marked), [1, 2, 3, 4])
+                self.assertIn(
+                    "Success: 2; Failed: 0; Skipped: 0; Duplicates: 2", output
+                )
+                self.assertNotIn("Depesza", buffer.getvalue())
+                self.assertTrue(
+                    any(
+                        "Duplikat URL: A (RSS) (jak: A)" in line
+                        for line in logs.output
+                    )
+                )
+
+
+class CompressionTest(unittest.TestCase):
+    ARTICLE_WITH_CODE = (
+        "Wstep   do  przykladu.\n\n"
+        "```js\n"
+        "function a() {\n"
+        "    if (x) {\n"
+        "        return  1;\n"
+        "    }\n"
+        "}\n"
+        "```\n\n"
+        "- punkt\n"
+        "    - podpunkt\n\n"
+        "| A | B |\n|---|---|\n| 1 | 2 |\n\n"
+        "| C | D |\n|---|---|\n| 3 | 4 |"
+    )
+
+    def test_content_within_budget_is_returned_unchanged(self) -> None:
+        from miniflux_prompt_compiler.core.compression import ContentCompressor
+
+        compressor = ContentCompressor(1000, tokenizer="approx")
+        content = self.ARTICLE_WITH_CODE + "\n\n\n\nReklama\nKoniec.\nReklama"
+
+        self.assertEqual(compressor.compress(content), content)
+        item = ProcessedItem(title="A", content=content)
+        self.assertFalse(compressor.compress_item(item))
+        self.assertEqual(item.content, content)
+        self.assertEqual(compressor.compressed, 0)
+
+    def test_cleanup_keeps_code_tables_and_first_repeated_line(self) -> None:
+        from miniflux_prompt_compiler.core.compression import (
+            drop_boilerplate,
+            normalize_whitespace,
+        )
+
+        content = (
+            "Reklama\n"
+            + self.ARTICLE_WITH_CODE
+            + "\n\n\n\n[Udostepnij](https://example.com/share)\n"
+            "Drugi   akapit.\t \nReklama"
+        )
+
+        cleaned = drop_boilerplate(normalize_whitespace(content))
+
+        self.assertEqual(
+            cleaned,
+            "Reklama\n"
+            + self.ARTICLE_WITH_CODE.replace("Wstep   do  ", "Wstep do ")
+            + "\n\nDrugi akapit.",
+        )
+
+    def test_long_content_keeps_head_tail_and_informative_paragraphs(self) -> None:
+        import random
+
+        from miniflux_prompt_compiler.core.compression import (
+            OMISSION,
+            ContentCompressor,
+        )
+
+        rng = random.Random(2)
+        filler = ["i", "w", "na", "jest", "to", "sie", "ze", "nie"]
+        paragraphs = [
+            " ".join(rng.choice(filler) for _ in range(60)) + "." for _ in range(30)
+        ]
+        paragraphs[12] = (
+            "Inflacja wyniosla 4,2 procent, a rentownosc obligacji spadla po "
+            "decyzji rady o stopach."
+        )
+        content = "\n\n".join(
+            ["Lead o gospodarce.", *paragraphs, "Podsumowanie na koniec."]
+        )
+        compressor = ContentCompressor(400, tokenizer="approx")
+        item = ProcessedItem(title="Dlugi", content=content)
+
+        with self.assertLogs(level="INFO") as logs:
+            self.assertTrue(compressor.compress_item(item))
+
+        self.assertLessEqual(count_tokens(item.content, tokenizer="approx"), 400)
+        self.assertTrue(item.content.startswith("Lead o gospodarce."))
+        self.assertTrue(item.content.endswith("Podsumowanie na koniec."))
+        self.assertIn(paragraphs[12], item.content)
+        self.assertIn(OMISSION, item.content)
+        self.assertEqual(compressor.compress(content), item.content)
+        self.assertTrue(any("Kompresja: Dlugi" in line for line in logs.output))
+
+        transcript = " ".join(f"w{index}" for index in range(5000))
+        compressed = compressor.compress(transcript)
+        self.assertLessEqual(count_tokens(compressed, tokenizer="approx"), 400)
+        self.assertTrue(compressed.startswith("w0 w1 "))
+        self.assertTrue(compressed.endswith(" w4999"))
+
+    def test_run_compresses_items_over_budget(self) -> None:
+        long_content = "\n\n".join(
+            [*(f"Akapit {index} " + "tresc " * 80 for index in range(20)), "Koniec."]
+        )
+
+        def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+            return [
+                {"id": 1, "title": "Krotki", "url": "https://example.com/a"},
+                {"id": 2, "title": "Dlugi", "url": "https://example.com/b"},
+            ]
+
+        def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+            return long_content if url.endswith("/b") else "Krotka tresc."
+
+        for async_mode in (False, True):
+            with self.subTest(async_mode=async_mode):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    env_path = Path(tmpdir) / ".env"
+                    env_path.write_text(
+                        "MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8"
+                    )
+                    buffer = io.StringIO()
+                    with self.assertLogs(level="INFO") as logs:
+                        with redirect_stdout(buffer):
+                            run(
+                                env_path=env_path,
+                                environ={},
+                                fetcher=fake_fetcher,
+                                article_fetcher=fake_article_fetcher,
+                                marker=lambda base_url, token, entry_id: None,
+                                interactive=False,
+                                tokenizer="approx",
+                                max_item_tokens=300,
+                                async_mode=async_mode,
+                            )
+
+                text = buffer.getvalue()
+                self.assertIn("Krotka tresc.", text)
+                self.assertIn("Akapit 0 ", text)
+                self.assertIn("Koniec.\n</lista", text)
+                self.assertIn("[...]", text)
+                self.assertTrue(
+                    any("skrocono 1 wpisow" in line for line in logs.output)
+                )
+
+
+class ClassificationTest(unittest.TestCase):
+    def test_youtube_detection_and_shorts(self) -> None:
+        self.assertTrue(is_youtube_url("https://youtube.com/watch?v=abc"))
+        self.assertTrue(is_youtube_url("https://www.youtube.com/watch?v=abc"))
+        self.assertTrue(is_youtube_url("https://youtu.be/abc"))
+        self.assertFalse(is_youtube_url("https://example.com/watch?v=abc"))
+
+        self.assertTrue(is_youtube_shorts("https://www.youtube.com/shorts/xyz"))
+        self.assertFalse(is_youtube_shorts("https://www.youtube.com/watch?v=xyz"))
+
+    def test_extract_youtube_id(self) -> None:
+        self.assertEqual(
+            extract_youtube_id("https://www.youtube.com/watch?v=abc123"), "abc123"
+        )
+        self.assertEqual(extract_youtube_id("https://youtu.be/xyz987"), "xyz987")
+        self.assertIsNone(extract_youtube_id("https://www.youtube.com/shorts/xyz"))
+
+
+class PromptBuildTest(unittest.TestCase):
+    def test_build_prompt_wraps_items(self) -> None:
+        prompt = build_prompt(
+            [
+                ProcessedItem(title="Artykul", content="Tresc A"),
+                ProcessedItem(title="Video", content="Tresc B"),
+            ]
+        )
+
+        self.assertIn("<lista_artykułów_i_transkrypcji>", prompt)
+        self.assertIn("</lista_artykułów_i_transkrypcji>", prompt)
+        self.assertIn("Tytuł: Artykul", prompt)
+        self.assertIn("Treść:\nTresc A", prompt)
+        self.assertIn("Tytuł: Video", prompt)
+        self.assertIn("Treść:\nTresc B", prompt)
+
+
+class TokenLabelTest(unittest.TestCase):
+    def test_label_for_tokens_thresholds(self) -> None:
+        self.assertEqual(label_for_tokens(0), "GPT-Instant")
+        self.assertEqual(label_for_tokens(31_999), "GPT-Instant")
+        self.assertEqual(label_for_tokens(32_000), "GPT-Thinking")
+        self.assertEqual(label_for_tokens(49_999), "GPT-Thinking")
+        self.assertEqual(label_for_tokens(50_000), "CHUNKING")
+
+    def test_count_tokens_approx(self) -> None:
+        self.assertEqual(count_tokens("abcd", tokenizer="approx"), 1)
+        self.assertEqual(count_tokens("abcdefgh", tokenizer="approx"), 2)
+        with self.assertRaises(ValueError):
+            count_tokens("test", tokenizer="unknown")
+
+
+class TokenizerTest(unittest.TestCase):
+    def test_tokenizer_loads_encoding_once_and_memoizes_counts(self) -> None:
+        import tiktoken
+
+        from miniflux_prompt_compiler.core.tokenization import Tokenizer
+
+        batches: list[list[str]] = []
+
+        class FakeEncoding:
+            def encode_ordinary_batch(  # type: ignore[no-untyped-def]
+                self, texts, num_threads=8
+            ):
+                batches.append(list(texts))
+                return [text.split() for text in texts]
+
+        with mock.patch.object(
+            tiktoken, "get_encoding", return_value=FakeEncoding()
+        ) as get_encoding:
+            tokenizer = Tokenizer("tiktoken", encoding="o200k_base")
+
+        self.assertEqual(tokenizer.count_batch(["a b", "c", "a b"]), [2, 1, 2])
+        self.assertEqual(tokenizer.count("a b"), 2)
+        self.assertEqual(tokenizer.count_batch(["c", "d e f"]), [1, 3])
+        get_encoding.assert_called_once_with("o200k_base")
+        self.assertEqual(batches, [["a b", "c"], ["d e f"]])
+
+    def test_approx_tokenizer_logs_once(self) -> None:
+        from miniflux_prompt_compiler.core.tokenization import Tokenizer
+
+        with self.assertLogs(level="INFO") as logs:
+            tokenizer = Tokenizer("approx")
+            counts = tokenizer.count_batch(["abcd", "abcdefgh", ""])
+
+        self.assertEqual(counts, [1, 2, 1])
+        self.assertEqual(len(logs.output), 1)
+        with self.assertRaises(ValueError):
+            Tokenizer("approx", encoding="unknown")
+
+
+class PromptChunkingTest(unittest.TestCase):
+    def test_build_prompts_with_chunking_splits_on_limit(self) -> None:
+        items = [
+            ProcessedItem(title="A", content="X" * 40),
+            ProcessedItem(title="B", content="Y" * 40),
+            ProcessedItem(title="C", content="Z" * 40),
+        ]
+        max_tokens = count_tokens(build_prompt(items[:2]), tokenizer="approx")
+
+        chunks = build_prompts_with_chunking(
+            items, max_tokens=max_tokens, tokenizer="approx"
+        )
+
+        self.assertEqual(
+            [chunk.text for chunk in chunks],
+            [build_prompt(items[:2]), build_prompt(items[2:])],
+        )
+        self.assertEqual([chunk.items for chunk in chunks], [items[:2], items[2:]])
+        self.assertEqual(
+            [chunk.token_count for chunk in chunks],
+            [count_tokens(chunk.text, tokenizer="approx") for chunk in chunks],
+        )
+        self.assertEqual(chunks[0].label, label_for_tokens(max_tokens))
+
+    def test_build_prompts_with_chunking_skips_oversize(self) -> None:
+        items = [
+            ProcessedItem(title="A", content="X"),
+            ProcessedItem(title="BIG", content="Y" * 10_000),
+            ProcessedItem(title="B", content="Z"),
+        ]
+        max_tokens = count_tokens(build_prompt(items[:1]), tokenizer="approx") + 1
+
+        with self.assertLogs(level="INFO") as logs:
+            chunks = build_prompts_with_chunking(
+                items, max_tokens=max_tokens, tokenizer="approx"
+            )
+
+        self.assertEqual(
+            [chunk.text for chunk in chunks],
+            [build_prompt(items[:1]), build_prompt(items[2:])],
+        )
+        self.assertTrue(
+            any(
+                "Item exceeds max token limit and was skipped" in strip_ansi(message)
+                for message in logs.output
+            )
+        )
+
+    def test_count_prompt_tokens_matches_full_prompt(self) -> None:
+        from miniflux_prompt_compiler.core.chunking import count_prompt_tokens
+
+        items = [
+            ProcessedItem(title="A", content="X" * 37),
+            ProcessedItem(title="B", content="Y" * 51),
+        ]
+
+        self.assertEqual(
+            count_prompt_tokens(items, tokenizer="approx"),
+            count_tokens(build_prompt(items), tokenizer="approx"),
+        )
+        self.assertEqual(count_prompt_tokens([], tokenizer="approx"), 0)
+
+    def test_prompt_chunker_matches_batch_chunking(self) -> None:
+        from miniflux_prompt_compiler.core.chunking import (
+            PromptChunker,
+            count_prompt_tokens,
+        )
+
+        items = [
+            ProcessedItem(title=f"T{index}", content="X" * (20 + index * 13))
+            for index in range(12)
+        ]
+        items.insert(5, ProcessedItem(title="BIG", content="Y" * 10_000))
+        max_tokens = count_tokens(build_prompt(items[:3]), tokenizer="approx")
+
+        chunker = PromptChunker(max_tokens, tokenizer="approx")
+        with self.assertLogs(level="INFO"):
+            streamed = [chunk for item in items for chunk in chunker.add_parts(item)]
+            streamed.append(chunker.flush())
+
+        expected = build_prompts_with_chunking(
+            items, max_tokens=max_tokens, tokenizer="approx"
+        )
+        self.assertEqual([chunk for chunk in streamed if chunk], expected)
+        self.assertIsNone(chunker.flush())
+        self.assertEqual(
+            chunker.total_tokens, count_prompt_tokens(items, tokenizer="approx")
+        )
+
+    def test_optimal_packing_uses_fewer_fuller_prompts(self) -> None:
+        import random
+
+        from miniflux_prompt_compiler.core.chunking import count_prompt_tokens
+
+        items = [
+            ProcessedItem(title="A", content="X" * 600),
+            ProcessedItem(title="B", content="X" * 600),
+            ProcessedItem(title="C", content="Y" * 400),
+            ProcessedItem(title="D", content="Y" * 400),
+        ]
+        max_tokens = count_prompt_tokens(items[1:3], tokenizer="approx")
+
+        greedy = build_prompts_with_chunking(
+            items, max_tokens=max_tokens, tokenizer="approx"
+        )
+        optimal = build_prompts_with_chunking(
+            items, max_tokens=max_tokens, tokenizer="approx", packing="optimal"
+        )
+
+        self.assertEqual(len(greedy), 3)
+        self.assertEqual(
+            [chunk.items for chunk in optimal],
+            [[items[0], items[2]], [items[1], items[3]]],
+        )
+        self.assertEqual(optimal[0].text, build_prompt([items[0], items[2]]))
+
+        rng = random.Random(11)
+        items = [
+            ProcessedItem(title=f"T{index}", content="X" * rng.randint(10, 900))
+            for index in range(60)
+        ]
+        max_tokens = count_prompt_tokens(items[:4], tokenizer="approx")
+        optimal = build_prompts_with_chunking(
+            items, max_tokens=max_tokens, tokenizer="approx", packing="optimal"
+        )
+
+        packed = [item for chunk in optimal for item in chunk.items]
+        self.assertEqual(
+            sorted(item.title for item in packed),
+            sorted(item.title for item in items),
+        )
+        for chunk in optimal:
+            self.assertLessEqual(chunk.token_count, max_tokens)
+            self.assertEqual(
+                chunk.token_count, count_prompt_tokens(chunk.items, tokenizer="approx")
+            )
+            positions = [items.index(item) for item in chunk.items]
+            self.assertEqual(positions, sorted(positions))
+
+    def test_oversized_item_is_split_into_parts(self) -> None:
+        import random
+
+        from miniflux_prompt_compiler.core.chunking import (
+            PromptChunker,
+            count_prompt_tokens,
+        )
+
+        rng = random.Random(4)
+        paragraphs = [
+            " ".join(f"slowo{rng.randint(0, 99)}" for _ in range(rng.randint(20, 90)))
+            + "."
+            for _ in range(40)
+        ]
+        long_item = ProcessedItem(
+            title="Long", content="\n\n".join(paragraphs), entry_id=7, feed="F"
+        )
+        transcript = ProcessedItem(
+            title="YT", content=" ".join(f"w{index}" for index in range(6000))
+        )
+        items = [ProcessedItem(title="A", content="krotki"), long_item, transcript]
+        max_tokens = 1500
+
+        for packing in ("greedy", "optimal"):
+            with self.subTest(packing=packing):
+                with self.assertLogs(level="INFO") as logs:
+                    chunks = build_prompts_with_chunking(
+                        items,
+                        max_tokens=max_tokens,
+                        tokenizer="approx",
+                        packing=packing,
+                    )
+
+                packed = [item for chunk in chunks for item in chunk.items]
+                for chunk in chunks:
+                    self.assertLessEqual(chunk.token_count, max_tokens)
+                    self.assertEqual(
+                        chunk.token_count,
+                        count_prompt_tokens(chunk.items, tokenizer="approx"),
+                    )
+                for original in (long_item, transcript):
+                    parts = [
+                        item
+                        for item in packed
+                        if item.title.startswith(f"{original.title} (część ")
+                    ]
+                    parts.sort(
+                        key=lambda item: int(item.title.split()[-1].split("/")[0])
+                    )
+                    self.assertGreater(len(parts), 1)
+                    self.assertEqual(
+                        parts[-1].title,
+                        f"{original.title} (część {len(parts)}/{len(parts)})",
+                    )
+                    self.assertEqual(
+                        " ".join(part.content for part in parts).split(),
+                        original.content.split(),
+                    )
+                    self.assertTrue(all(part.parts == len(parts) for part in parts))
+                self.assertTrue(
+                    all(
+                        part.content.endswith(".")
+                        for part in packed
+                        if "Long" in part.title
+                    )
+                )
+                self.assertTrue(
+                    all(
+                        part.entry_id == 7 and part.feed == "F"
+                        for part in packed
+                        if "Long" in part.title
+                    )
+                )
+                self.assertTrue(any("podzielony na" in line for line in logs.output))
+
+        chunker = PromptChunker(max_tokens, tokenizer="approx")
+        with self.assertLogs(level="INFO"):
+            streamed = [chunk for item in items for chunk in chunker.add_parts(item)]
+        streamed.append(chunker.flush())
+        self.assertEqual(
+            streamed,
+            build_prompts_with_chunking(
+                items, max_tokens=max_tokens, tokenizer="approx"
+            ),
+        )
+        self.assertEqual(
+            chunker.total_tokens, count_prompt_tokens(items, tokenizer="approx")
+        )
+
+    def test_optimal_packing_keeps_parts_together_and_in_order(self) -> None:
+        transcript = ProcessedItem(
+            title="YT", content=" ".join(f"w{index}" for index in range(5000))
+        )
+        items = [
+            ProcessedItem(title=f"S{index}", content="X" * (200 + 300 * index))
+            for index in range(4)
+        ]
+        items.insert(2, transcript)
+
+        with self.assertLogs(level="INFO"):
+            chunks = build_prompts_with_chunking(
+                items, max_tokens=1500, tokenizer="approx", packing="optimal"
+            )
+
+        placed = [
+            (position, item.title)
+            for position, chunk in enumerate(chunks)
+            for item in chunk.items
+            if item.title.startswith("YT (część ")
+        ]
+        total = len(placed)
+        self.assertGreater(total, 2)
+        self.assertEqual(
+            [title for _, title in placed],
+            [f"YT (część {part}/{total})" for part in range(1, total + 1)],
+        )
+        positions = [position for position, _ in placed]
+        self.assertTrue(
+            all(
+                0 <= after - before <= 1
+                for before, after in zip(positions, positions[1:])
+            )
+        )
+        expected = [item.title for item in items if item is not transcript]
+        expected += [title for _, title in placed]
+        self.assertEqual(
+            sorted(item.title for chunk in chunks for item in chunk.items),
+            sorted(expected),
+        )
+
+    def test_run_delivers_parts_of_oversized_entry(self) -> None:
+        from miniflux_prompt_compiler.app import chunk_entry_ids
+
+        def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+            return [
+                {"id": 1, "title": "Krotki", "url": "https://example.com/a"},
+                {"id": 2, "title": "Film", "url": "https://youtu.be/abc123"},
+            ]
+
+        transcript = " ".join(f"w{index}" for index in range(4000))
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    env_path = Path(tmpdir) / ".env"
+                    env_path.write_text(
+                        "MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8"
+                    )
+                    marked: list[int] = []
+                    buffer = io.StringIO()
+                    with self.assertLogs(level="INFO"):
+                        with redirect_stdout(buffer):
+                            run(
+                                env_path=env_path,
+                                environ={},
+                                fetcher=fake_fetcher,
+                                article_fetcher=lambda entry_id, url: "tresc",
+                                youtube_fetcher=lambda video_id: transcript,
+                                marker=lambda base_url, token, entry_id: (
+                                    marked.append(entry_id)
+                                ),
+                                interactive=False,
+                                tokenizer="approx",
+                                max_tokens=1500,
+                                stream=stream,
+                            )
+
+                text = buffer.getvalue()
+                self.assertIn("Tytuł: Film (część 1/", text)
+                parts = int(text.split("Tytuł: Film (część 1/")[1].split(")")[0])
+                self.assertIn(f"Tytuł: Film (część {parts}/{parts})", text)
+                self.assertEqual(sorted(marked), [1, 2])
+
+        part = ProcessedItem(
+            title="Film (część 1/2)", content="a", entry_id=2, parts=2
+        )
+        delivered_parts: dict[int, int] = {}
+        chunk = PromptChunk("", 1, "", [ProcessedItem("A", "a", entry_id=1), part])
+        self.assertEqual(chunk_entry_ids(chunk, delivered_parts), [1])
+        self.assertEqual(
+            chunk_entry_ids(PromptChunk("", 1, "", [part]), delivered_parts), [2]
+        )
+
+    def test_group_by_keeps_feeds_in_separate_prompts(self) -> None:
+        items = [
+            ProcessedItem(title="A1", content="X" * 30, feed="A", category="Tech"),
+            ProcessedItem(title="B1", content="X" * 30, feed="B", category="Tech"),
+            ProcessedItem(title="A2", content="X" * 30, feed="A", category="Tech"),
+            ProcessedItem(title="N", content="X" * 30),
+        ]
+
+        for packing in ("greedy", "optimal"):
+            with self.subTest(packing=packing):
+                by_feed = build_prompts_with_chunking(
+                    items,
+                    max_tokens=10_000,
+                    tokenizer="approx",
+                    packing=packing,
+                    group_by="feed",
+                )
+                by_category = build_prompts_with_chunking(
+                    items,
+                    max_tokens=10_000,
+                    tokenizer="approx",
+                    packing=packing,
+                    group_by="category",
+                )
+
+                self.assertEqual(
+                    [[item.title for item in chunk.items] for chunk in by_feed],
+                    [["A1", "A2"], ["B1"], ["N"]],
+                )
+                self.assertEqual(
+                    [[item.title for item in chunk.items] for chunk in by_category],
+                    [["A1", "B1", "A2"], ["N"]],
+                )
+
+        with self.assertRaises(ValueError):
+            build_prompts_with_chunking(items, max_tokens=100, packing="best")
+
+    def test_run_packs_prompts_by_feed_and_reports_fill(self) -> None:
+        def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+            return [
+                {
+                    "id": index,
+                    "title": f"T{index}",
+                    "url": f"https://example.com/{index}",
+                    "feed": {"title": feed, "category": {"title": "Tech"}},
+                }
+                for index, feed in enumerate(["A", "B", "A", "B"], start=1)
+            ]
+
+        for async_mode in (False, True):
+            with self.subTest(async_mode=async_mode):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    env_path = Path(tmpdir) / ".env"
+                    env_path.write_text(
+                        "MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8"
+                    )
+                    buffer = io.StringIO()
+                    with self.assertLogs(level="INFO") as logs:
+                        with redirect_stdout(buffer):
+                            output = run(
+                                env_path=env_path,
+                                environ={},
+                                fetcher=fake_fetcher,
+                                article_fetcher=lambda entry_id, url: f"tresc {url}",
+                                marker=lambda base_url, token, entry_id: None,
+                                interactive=False,
+                                tokenizer="approx",
+                                packing="optimal",
+                                group_by="feed",
+                                dedup=False,
+                                async_mode=async_mode,
+                            )
+
+                text = buffer.getvalue()
+                self.assertIn("Prompts: 2", output)
+                self.assertLess(text.index("Tytuł: T3"), text.index("Prompt 2/2"))
+                self.assertLess(text.index("Prompt 2/2"), text.index("Tytuł: T2"))
+                self.assertTrue(
+                    any("Wypelnienie promptow: 1: " in line for line in logs.output)
+                )
+
+    def test_run_groups_by_feed_from_paginated_miniflux_api(self) -> None:
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlsplit
+
+        def entry(entry_id: int) -> dict[str, object]:
+            feed = "AB"[entry_id % 2]
+            return {
+                "id": entry_id,
+                "title": f"T{entry_id}",
+                "url": f"https://example.com/{entry_id}",
+                "content": "<p>skrot</p>",
+                "feed": {"title": feed, "category": {"title": f"Kategoria {feed}"}},
+            }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802
+                parts = urlsplit(self.path)
+                if parts.path.endswith("/fetch-content"):
+                    entry_id = parts.path.split("/")[-2]
+                    paragraph = f"<p>{f'Tresc wpisu {entry_id}. ' * 20}</p>"
+                    body = {"content": f"<article>{paragraph * 2}</article>"}
+                else:
+                    query = parse_qs(parts.query)
+                    after = int(query.get("after_entry_id", ["0"])[0])
+                    limit = int(query["limit"][0])
+                    ids = range(after + 1, min(after + limit, 4) + 1)
+                    body = {"entries": [entry(entry_id) for entry_id in ids]}
+                self.reply(200, json.dumps(body).encode("utf-8"))
+
+            def do_PUT(self) -> None:  # noqa: N802
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.reply(204, b"")
+
+            def reply(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                return
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = "http://127.0.0.1:%d" % server.server_address[1]
+        try:
+            for async_mode in (False, True):
+                with self.subTest(async_mode=async_mode):
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        buffer = io.StringIO()
+                        with self.assertLogs(level="INFO"):
+                            with redirect_stdout(buffer):
+                                output = run(
+                                    env_path=Path(tmpdir) / ".env",
+                                    environ={
+                                        "MINIFLUX_API_TOKEN": "abc123",
+                                        "MINIFLUX_BASE_URL": base_url,
+                                    },
+                                    interactive=False,
+                                    tokenizer="approx",
+                                    group_by="feed",
+                                    cache_dir=None,
+                                    async_mode=async_mode,
+                                )
+
+                    text = buffer.getvalue()
+                    self.assertIn("Unread entries: 4; Success: 4", output)
+                    self.assertIn("Prompts: 2", output)
+                    self.assertLess(text.index("Tytuł: T3"), text.index("Prompt 2/2"))
+                    self.assertLess(text.index("Prompt 2/2"), text.index("Tytuł: T2"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_incremental_chunking_matches_full_prompt_token_counts(self) -> None:
+        import random
+
+        import tiktoken
+
+        from miniflux_prompt_compiler.core.chunking import PromptMeter
+        from miniflux_prompt_compiler.core.tokenization import Tokenizer
+
+        # Enkoder bajtowy z wzorcem pre-tokenizacji cl100k_base i kilkoma
+        # scaleniami na granicach sekcji, zeby nie wymagac pobierania rang.
+        pattern = (
+            r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+|"""
+            r""" ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+        )
+        ranks = {bytes([value]): value for value in range(256)}
+        for merge in (b"\n\n", b".\n", b"--", b"---", b".\n\n", b">\n", b"</"):
+            ranks[merge] = len(ranks)
+        encoding = tiktoken.Encoding(
+            "test", pat_str=pattern, mergeable_ranks=ranks, special_tokens={}
+        )
+        rng = random.Random(7)
+        fragments = ["slowo ", "the ", ".\n", "\n\n", "123", "--", "ą", "?", " "]
+        items = [
+            ProcessedItem(
+                title=f"T{index}",
+                content="".join(rng.choices(fragments, k=rng.randint(0, 40))),
+            )
+            for index in range(30)
+        ]
+
+        with mock.patch.object(tiktoken, "get_encoding", return_value=encoding):
+            tokenizer = Tokenizer("tiktoken")
+        meter = PromptMeter(tokenizer)
+        costs = meter.items_units(items)
+        for size in range(1, len(items) + 1):
+            middle = sum(cost[0] for cost in costs[: size - 1])
+            self.assertEqual(
+                meter.tokens(middle, costs[size - 1][1]),
+                len(encoding.encode_ordinary(build_prompt(items[:size]))),
+            )
+
+
+class InteractiveModeTest(unittest.TestCase):
+    def test_run_interactive_waits_for_enter_single_prompt(self) -> None:
+        from miniflux_prompt_compiler import delivery
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"},
+                ]
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                return "content"
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                return None
+
+            events: list[str] = []
+
+            def fake_input_reader() -> None:
+                events.append("input")
+
+            def fake_clipboard(text: str) -> None:
+                events.append(f"clipboard:{text}")
+
+            with mock.patch.object(
+                delivery,
+                "build_prompts_with_chunking",
+                return_value=[PromptChunk("PROMPT1", 10, "GPT-Instant", [])],
+            ):
+                with mock.patch.object(
+                    delivery, "count_prompt_tokens", return_value=10
+                ):
+                    output = run(
+                        env_path=env_path,
+                        environ={},
+                        fetcher=fake_fetcher,
+                        article_fetcher=fake_article_fetcher,
+                        marker=fake_marker,
+                        clipboard=fake_clipboard,
+                        input_reader=fake_input_reader,
+                        interactive=True,
+                    )
+
+        self.assertEqual(events, ["input", "clipboard:PROMPT1"])
+        self.assertIn("Tokens: 10", output)
+
+    def test_run_no_interactive_outputs_prompts(self) -> None:
+        from miniflux_prompt_compiler import delivery
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": 1, "title": "Artykul", "url": "https://example.com/a"},
+                    {"id": 2, "title": "Video", "url": "https://youtu.be/abc123"},
+                ]
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                return "content"
+
+            def fake_youtube_fetcher(video_id: str) -> str:
+                return "transcript"
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                return None
+
+            clipboard_values: list[str] = []
+
+            def fake_clipboard(text: str) -> None:
+                clipboard_values.append(text)
+
+            def fake_input_reader() -> None:
+                return None
+
+            with mock.patch.object(
+                delivery,
+                "build_prompts_with_chunking",
+                return_value=[
+                    PromptChunk("PROMPT1", 10, "GPT-Instant", []),
+                    PromptChunk("PROMPT2", 20, "GPT-Instant", []),
+                ],
+            ):
+                with mock.patch.object(
+                    delivery, "count_prompt_tokens", return_value=70_000
+                ):
+                    buffer = io.StringIO()
+                    with self.assertLogs(level="INFO") as logs:
+                        with redirect_stdout(buffer):
+                            output = run(
+                                env_path=env_path,
+                                environ={},
+                                fetcher=fake_fetcher,
+                                article_fetcher=fake_article_fetcher,
+                                youtube_fetcher=fake_youtube_fetcher,
+                                marker=fake_marker,
+                                clipboard=fake_clipboard,
+                                interactive=False,
+                            )
+
+        stdout = strip_ansi(buffer.getvalue())
+        self.assertEqual(clipboard_values, [])
+        self.assertTrue(
+            any("Total tokens: 70000 -> CHUNKING" in message for message in logs.output)
+        )
         self.assertTrue(
             any("Generated prompts: 2" in message for message in logs.output)
         )
@@ -337,146 +2263,753 @@ class InteractiveModeTest(unittest.TestCase):
         self.assertIn("Prompts: 2", output)
         self.assertIn("Label: CHUNKING", output)
 
+    def test_run_stream_writes_prompts_before_fetching_finishes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+            stream = io.StringIO()
+            seen_before_last: list[str] = []
+
+            def fake_fetcher(base_url: str, token: str):  # type: ignore[no-untyped-def]
+                for entry_id in (1, 2):
+                    yield {
+                        "id": entry_id,
+                        "title": f"Artykul {entry_id}",
+                        "url": f"https://example.com/{entry_id}",
+                    }
+                seen_before_last.append(stream.getvalue())
+                yield {"id": 3, "title": "Artykul 3", "url": "https://example.com/3"}
+
+            def fake_article_fetcher(entry_id: int | None, url: str) -> str:
+                return f"slowo{entry_id} " * 800
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                return None
+
+            with self.assertLogs(level="INFO"):
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    article_fetcher=fake_article_fetcher,
+                    marker=fake_marker,
+                    clipboard=lambda text: self.fail("clipboard"),
+                    interactive=False,
+                    max_tokens=2500,
+                    tokenizer="approx",
+                    workers=1,
+                    cache_dir=None,
+                    stream=True,
+                    output=stream,
+                )
+
+        self.assertIn("Prompt 1 (", seen_before_last[0])
+        self.assertNotIn("Prompt 2 (", seen_before_last[0])
+        self.assertIn("Prompt 3 (", stream.getvalue())
+        self.assertNotIn("\033[", stream.getvalue())
+        self.assertIn("Success: 3", output)
+        self.assertIn("Prompts: 3", output)
+
 
 class MinifluxFetchContentTest(unittest.TestCase):
     def test_run_uses_miniflux_fetch_content_first(self) -> None:
         from miniflux_prompt_compiler import app as app_module
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            env_path = Path(tmpdir) / ".env"
-            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [{"id": 1, "title": "Artykul", "url": "https://example.com/a"}]
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                return None
+
+            events: list[str] = []
+
+            def fake_input_reader() -> None:
+                events.append("input")
+
+            def fake_clipboard(text: str) -> None:
+                events.append(f"clipboard:{text}")
+
+            with mock.patch.object(
+                app_module, "fetch_entry_content", return_value="<p>HTML</p>"
+            ):
+                with mock.patch.object(
+                    app_module,
+                    "html_to_clean_markdown",
+                    return_value="# Artykul\n\nTresc markdown",
+                ) as normalize_mock:
+                    with mock.patch.object(
+                        app_module,
+                        "fetch_article_markdown",
+                        side_effect=AssertionError("Jina fallback should not be used."),
+                    ):
+                        output = run(
+                            env_path=env_path,
+                            environ={},
+                            fetcher=fake_fetcher,
+                            marker=fake_marker,
+                            clipboard=fake_clipboard,
+                            input_reader=fake_input_reader,
+                        )
+
+        self.assertEqual(events[0], "input")
+        self.assertTrue(events[1].startswith("clipboard:"))
+        self.assertIn("# Artykul", events[1])
+        self.assertIn("Tresc markdown", events[1])
+        # Routing konwertuje bez tytulu; naglowek dokleja `fetch_entry`.
+        normalize_mock.assert_called_once_with(
+            title="", html="<p>HTML</p>", url="https://example.com/a"
+        )
+        self.assertIn("Tokens:", output)
+
+    def test_run_falls_back_to_jina_when_miniflux_fails(self) -> None:
+        from miniflux_prompt_compiler import app as app_module
+        from miniflux_prompt_compiler.types import ContentFetchError
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [{"id": 1, "title": "Artykul", "url": "https://example.com/a"}]
+
+            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
+                return None
+
+            events: list[str] = []
+
+            def fake_input_reader() -> None:
+                events.append("input")
+
+            def fake_clipboard(text: str) -> None:
+                events.append(f"clipboard:{text}")
+
+            with mock.patch.object(
+                app_module,
+                "fetch_entry_content",
+                side_effect=ContentFetchError("fail"),
+            ):
+                with mock.patch.object(
+                    app_module,
+                    "fetch_article_markdown",
+                    return_value="JINA",
+                ) as fallback_mock:
+                    output = run(
+                        env_path=env_path,
+                        environ={},
+                        fetcher=fake_fetcher,
+                        marker=fake_marker,
+                        clipboard=fake_clipboard,
+                        input_reader=fake_input_reader,
+                    )
+
+        self.assertEqual(events[0], "input")
+        self.assertTrue(events[1].startswith("clipboard:"))
+        self.assertIn("JINA", events[1])
+        self.assertTrue(fallback_mock.called)
+        self.assertIn("Tokens:", output)
+
+
+class SourceRoutingTest(unittest.TestCase):
+    def test_router_demotes_failing_source_and_reprobes_it(self) -> None:
+        from miniflux_prompt_compiler.adapters.source_routing import SourceRouter
+
+        rolls = [0.9, 0.05]
+        router = SourceRouter(probe_rate=0.1, random_source=lambda: rolls.pop(0))
+        sources = ["miniflux", "jina"]
+        self.assertEqual(router.order("example.com", sources), sources)
+
+        for _ in range(3):
+            router.record_fetch("example.com", "miniflux", True, 0.1)
+            router.record_extraction("example.com", "miniflux", 0)
+
+        self.assertEqual(router.order("example.com", sources), ["jina", "miniflux"])
+        self.assertEqual(router.order("example.com", sources), sources)
+        self.assertEqual(router.order("other.org", sources), sources)
+
+    def test_router_stats_persist_between_runs(self) -> None:
+        from miniflux_prompt_compiler.adapters.source_routing import SourceRouter
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with SourceRouter.in_dir(Path(tmpdir)) as router:
+                for _ in range(3):
+                    router.record_fetch("example.com", "jina", True, 0.5)
+                    router.record_extraction("example.com", "jina", 1000)
+                    router.record_fetch("example.com", "miniflux", False, 0.2)
+
+            with SourceRouter.in_dir(Path(tmpdir), probe_rate=0) as router:
+                stats = router.stats("example.com", "jina")
+                order = router.order("example.com", ["miniflux", "jina"])
+
+        self.assertEqual((stats.attempts, stats.successes), (3, 3))
+        self.assertEqual(stats.mean_length, 1000)
+        self.assertEqual(order, ["jina", "miniflux"])
+
+    def test_run_skips_miniflux_for_domain_with_empty_extractions(self) -> None:
+        from miniflux_prompt_compiler import app as app_module
+        from miniflux_prompt_compiler.adapters.trafilatura_markdown import (
+            EXTRACTION_PLACEHOLDER,
+        )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+
+            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
+                return [
+                    {"id": index, "title": f"A{index}", "url": f"https://www.x.com/{index}"}
+                    for index in range(1, 6)
+                ]
+
+            with mock.patch.object(
+                app_module, "fetch_entry_content", return_value="<p>nav</p>"
+            ) as miniflux_mock, mock.patch.object(
+                app_module,
+                "html_to_clean_markdown",
+                side_effect=lambda title, html, url: f"# {title}\n\n{EXTRACTION_PLACEHOLDER}",
+            ), mock.patch.object(
+                app_module, "fetch_article_markdown", return_value="Tresc " * 100
+            ) as jina_mock, redirect_stdout(io.StringIO()) as stdout:
+                output = run(
+                    env_path=env_path,
+                    environ={},
+                    fetcher=fake_fetcher,
+                    marker=lambda *_: None,
+                    interactive=False,
+                    tokenizer="approx",
+                    cache_dir=Path(tmpdir) / "cache",
+                    extract_processes=0,
+                    route_probe_rate=0,
+                    dedup=False,
+                )
+
+        # Pusta ekstrakcja to chybienie: wpis dostaje tresc z Jiny, a po trzech
+        # probach Miniflux dla domeny jest pomijany.
+        self.assertIn("Success: 5; Failed: 0; Skipped: 0", output)
+        self.assertEqual(miniflux_mock.call_count, 3)
+        self.assertEqual(jina_mock.call_count, 5)
+        self.assertNotIn(EXTRACTION_PLACEHOLDER, stdout.getvalue())
+
+    def test_empty_extraction_falls_through_to_next_source(self) -> None:
+        import asyncio
+
+        from miniflux_prompt_compiler.adapters.source_routing import (
+            SourceRouter,
+            fetch_routed,
+            fetch_routed_async,
+        )
+        from miniflux_prompt_compiler.adapters.trafilatura_markdown import (
+            EXTRACTION_PLACEHOLDER,
+        )
+
+        async def empty_miniflux() -> str:
+            return EXTRACTION_PLACEHOLDER
+
+        async def jina() -> str:
+            return "Tresc z Jiny"
+
+        router = SourceRouter(probe_rate=0)
+        results = [
+            fetch_routed(
+                router,
+                "https://example.com/a",
+                {"miniflux": lambda: EXTRACTION_PLACEHOLDER, "jina": lambda: "Tresc"},
+            ),
+            asyncio.run(
+                fetch_routed_async(
+                    router,
+                    "https://example.com/b",
+                    {"miniflux": empty_miniflux, "jina": jina},
+                )
+            ),
+        ]
+
+        self.assertEqual(results, [("Tresc", "jina"), ("Tresc z Jiny", "jina")])
+        stats = router.stats("example.com", "miniflux")
+        self.assertEqual((stats.attempts, stats.successes), (2, 0))
+
+    def test_hedged_fetch_returns_faster_secondary_source(self) -> None:
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from miniflux_prompt_compiler.adapters.source_routing import (
+            Hedging,
+            SourceRouter,
+            fetch_routed,
+        )
+
+        router = SourceRouter(probe_rate=0)
+        for _ in range(10):
+            router.record_fetch("example.com", "miniflux", True, 0.01)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_miniflux() -> str:
+            release.wait(5)
+            return "<p>za pozno</p>"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            hedging = Hedging(95, executor=executor, max_ratio=1.0)
+            content, source = fetch_routed(
+                router,
+                "https://example.com/a",
+                {"miniflux": slow_miniflux, "jina": lambda: "Tresc z Jiny"},
+                hedging,
+            )
+            release.set()
+
+        self.assertEqual((content, source), ("Tresc z Jiny", "jina"))
+        self.assertEqual((hedging.fetches, hedging.hedges, hedging.wins), (1, 1, 1))
+
+    def test_async_hedged_fetch_cancels_losing_request(self) -> None:
+        import asyncio
+
+        from miniflux_prompt_compiler.adapters.source_routing import (
+            Hedging,
+            SourceRouter,
+            fetch_routed_async,
+        )
+
+        router = SourceRouter(probe_rate=0)
+        for _ in range(10):
+            router.record_fetch("example.com", "miniflux", True, 0.01)
+        cancelled: list[str] = []
+
+        async def slow_miniflux() -> str:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append("miniflux")
+                raise
+            return "<p>za pozno</p>"
+
+        async def fast_jina() -> str:
+            return "Tresc z Jiny"
+
+        async def scenario() -> tuple[str, str]:
+            result = await fetch_routed_async(
+                router,
+                "https://example.com/a",
+                {"miniflux": slow_miniflux, "jina": fast_jina},
+                Hedging(95, max_ratio=1.0),
+            )
+            await asyncio.sleep(0)
+            return result
+
+        self.assertEqual(asyncio.run(scenario()), ("Tresc z Jiny", "jina"))
+        self.assertEqual(cancelled, ["miniflux"])
+
+    def test_hedging_caps_backup_requests_ratio(self) -> None:
+        from miniflux_prompt_compiler.adapters.source_routing import Hedging
+
+        hedging = Hedging(95, max_ratio=0.1)
+        hedging.start()
+        self.assertFalse(hedging.allow())
+        for _ in range(9):
+            hedging.start()
+        self.assertTrue(hedging.allow())
+        self.assertFalse(hedging.allow())
+
+
+class PlaywrightFlagTest(unittest.TestCase):
+    def test_main_passes_playwright_flag(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py", "--playwright"]):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(captured.get("use_playwright"))
+        self.assertEqual(captured.get("playwright_pages"), 2)
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys, "argv", ["cli.py", "--playwright", "--playwright-pages", "4"]
+            ):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("playwright_pages"), 4)
+
+    def test_main_passes_links_flag(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py", "--links"]):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(captured.get("links_only"))
+
+    def test_main_passes_workers_and_upstream_limits(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys,
+                "argv",
+                ["cli.py", "--workers", "8", "--jina-concurrency", "3"],
+            ):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(captured.get("workers"), 8)
+        limits = captured.get("upstream_limits")
+        assert isinstance(limits, dict)
+        self.assertEqual(limits["jina"], 3)
+        self.assertEqual(limits["miniflux"], 4)
+
+    def test_main_passes_async_flags(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys, "argv", ["cli.py", "--async", "--async-concurrency", "16"]
+            ):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(captured.get("async_mode"))
+        self.assertEqual(captured.get("async_concurrency"), 16)
+
+    def test_main_passes_retry_settings(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys,
+                "argv",
+                ["cli.py", "--retry-attempts", "5", "--retry-budget", "0"],
+            ):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(captured.get("retry_attempts"), 5)
+        self.assertEqual(captured.get("retry_budget"), 0)
+
+    def test_main_passes_rate_limits(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys,
+                "argv",
+                [
+                    "cli.py",
+                    "--rate-limit",
+                    "r.jina.ai=0.5:2",
+                    "--rate-limit",
+                    "youtube.com=0",
+                ],
+            ):
+                exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            captured.get("rate_limits"),
+            {"r.jina.ai": (0.5, 2), "youtube.com": (0.0, 1)},
+        )
+
+    def test_main_passes_route_probe_rate(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
 
-            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
-                return [{"id": 1, "title": "Artykul", "url": "https://example.com/a"}]
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
 
-            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
-                return None
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys, "argv", ["cli.py", "--route-probe-rate", "0.25"]
+            ):
+                exit_code = cli.main()
 
-            events: list[str] = []
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(captured.get("route_probe_rate"), 0.25)
 
-            def fake_input_reader() -> None:
-                events.append("input")
+    def test_main_passes_hedge_percentile(self) -> None:
+        from miniflux_prompt_compiler import cli
 
-            def fake_clipboard(text: str) -> None:
-                events.append(f"clipboard:{text}")
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
 
+        with mock.patch.object(cli, "run", side_effect=fake_run):
             with mock.patch.object(
-                app_module, "fetch_entry_content", return_value="<p>HTML</p>"
+                cli.sys, "argv", ["cli.py", "--hedge-percentile", "95"]
             ):
-                with mock.patch.object(
-                    app_module,
-                    "html_to_clean_markdown",
-                    return_value="# Artykul\n\nTresc markdown",
-                ) as normalize_mock:
-                    with mock.patch.object(
-                        app_module,
-                        "fetch_article_with_fallback",
-                        side_effect=AssertionError("Jina fallback should not be used."),
-                    ):
-                        output = run(
-                            env_path=env_path,
-                            environ={},
-                            fetcher=fake_fetcher,
-                            marker=fake_marker,
-                            clipboard=fake_clipboard,
-                            input_reader=fake_input_reader,
-                        )
+                exit_code = cli.main()
 
-        self.assertEqual(events[0], "input")
-        self.assertTrue(events[1].startswith("clipboard:"))
-        self.assertIn("# Artykul", events[1])
-        self.assertIn("Tresc markdown", events[1])
-        normalize_mock.assert_called_once_with(title="Artykul", html="<p>HTML</p>")
-        self.assertIn("Tokens:", output)
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(captured.get("hedge_percentile"), 95.0)
 
-    def test_run_falls_back_to_jina_when_miniflux_fails(self) -> None:
-        from miniflux_prompt_compiler import app as app_module
-        from miniflux_prompt_compiler.types import ContentFetchError
+    def test_main_passes_metrics_paths(self) -> None:
+        from miniflux_prompt_compiler import cli
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            env_path = Path(tmpdir) / ".env"
-            env_path.write_text("MINIFLUX_API_TOKEN=abc123\n", encoding="utf-8")
+        captured: dict[str, object] = {}
 
-            def fake_fetcher(base_url: str, token: str) -> list[dict[str, object]]:
-                return [{"id": 1, "title": "Artykul", "url": "https://example.com/a"}]
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
 
-            def fake_marker(base_url: str, token: str, entry_id: int) -> None:
-                return None
+        argv = ["cli.py", "--metrics-json", "run.json", "--metrics-prom", "run.prom"]
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", argv):
+                exit_code = cli.main()
 
-            events: list[str] = []
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(captured.get("metrics_path"), Path("run.json"))
+        self.assertEqual(captured.get("prometheus_path"), Path("run.prom"))
 
-            def fake_input_reader() -> None:
-                events.append("input")
+    def test_main_passes_stream_output(self) -> None:
+        from miniflux_prompt_compiler import cli
 
-            def fake_clipboard(text: str) -> None:
-                events.append(f"clipboard:{text}")
+        captured: dict[str, object] = {}
 
-            with mock.patch.object(
-                app_module,
-                "fetch_entry_content",
-                side_effect=ContentFetchError("fail"),
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "prompts.txt"
+            argv = ["cli.py", "--no-interactive", "--stream", "--output", str(path)]
+            with mock.patch.object(cli, "run", side_effect=fake_run):
+                with mock.patch.object(cli.sys, "argv", argv):
+                    exit_code = cli.main()
+
+            self.assertEqual(exit_code, 0)
+            self.assertTrue(captured.get("stream"))
+            output = captured.get("output")
+            self.assertEqual(getattr(output, "name", None), str(path))
+            self.assertTrue(getattr(output, "closed", False))
+
+    def test_rejected_output_combination_leaves_existing_file_intact(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "prompts.txt"
+            path.write_text("poprzednie prompty\n", encoding="utf-8")
+            for argv in (
+                ["cli.py", "--no-interactive", "--output", str(path)],
+                [
+                    "cli.py",
+                    "--no-interactive",
+                    "--stream",
+                    "--links",
+                    "--output",
+                    str(path),
+                ],
+                ["cli.py", "--stream", "--output", str(path)],
             ):
-                with mock.patch.object(
-                    app_module,
-                    "fetch_article_with_fallback",
-                    return_value="JINA",
-                ) as fallback_mock:
-                    output = run(
-                        env_path=env_path,
-                        environ={},
-                        fetcher=fake_fetcher,
-                        marker=fake_marker,
-                        clipboard=fake_clipboard,
-                        input_reader=fake_input_reader,
+                with self.subTest(argv=argv):
+                    with mock.patch.object(cli, "run") as run_mock:
+                        with mock.patch.object(cli.sys, "argv", argv):
+                            with redirect_stderr(io.StringIO()):
+                                with self.assertRaises(SystemExit):
+                                    cli.main()
+                    run_mock.assert_not_called()
+                    self.assertEqual(
+                        path.read_text(encoding="utf-8"), "poprzednie prompty\n"
                     )
 
-        self.assertEqual(events[0], "input")
-        self.assertTrue(events[1].startswith("clipboard:"))
-        self.assertIn("JINA", events[1])
-        self.assertTrue(fallback_mock.called)
-        self.assertIn("Tokens:", output)
+    def test_parse_args_rejects_stream_without_no_interactive(self) -> None:
+        from miniflux_prompt_compiler.cli import parse_args
 
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / "prompts.txt")
+            for argv in (
+                ["--stream"],
+                ["--no-interactive", "--stream", "--links"],
+                ["--no-interactive", "--output", path],
+            ):
+                with self.subTest(argv=argv):
+                    with redirect_stderr(io.StringIO()):
+                        with self.assertRaises(SystemExit):
+                            parse_args(argv)
 
-class PlaywrightFlagTest(unittest.TestCase):
-    def test_main_passes_playwright_flag(self) -> None:
+    def test_main_passes_packing_and_group_by(self) -> None:
         from miniflux_prompt_compiler import cli
 
         captured: dict[str, object] = {}
 
-        def fake_run(*args, **kwargs):  # type: ignore[no-untyped-def]
-            captured.update(kwargs)
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
             return "ok"
 
         with mock.patch.object(cli, "run", side_effect=fake_run):
-            with mock.patch.object(cli.sys, "argv", ["cli.py", "--playwright"]):
-                exit_code = cli.main()
+            with mock.patch.object(cli.sys, "argv", ["cli.py"]):
+                self.assertEqual(cli.main(), 0)
+            self.assertEqual(captured.get("packing"), "greedy")
+            self.assertIsNone(captured.get("group_by"))
+            argv = ["cli.py", "--packing", "optimal", "--group-by", "category"]
+            with mock.patch.object(cli.sys, "argv", argv):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("packing"), "optimal")
+        self.assertEqual(captured.get("group_by"), "category")
+
+    def test_parse_args_rejects_stream_with_packing_or_group_by(self) -> None:
+        from miniflux_prompt_compiler.cli import parse_args
+
+        for extra in (["--packing", "optimal"], ["--group-by", "feed"]):
+            with self.subTest(extra=extra):
+                with redirect_stderr(io.StringIO()):
+                    with self.assertRaises(SystemExit):
+                        parse_args(["--no-interactive", "--stream", *extra])
+
+    def test_main_passes_max_item_tokens(self) -> None:
+        from miniflux_prompt_compiler import cli
 
-        self.assertEqual(exit_code, 0)
-        self.assertTrue(captured.get("use_playwright"))
+        captured: dict[str, object] = {}
 
-    def test_main_passes_links_flag(self) -> None:
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py"]):
+                self.assertEqual(cli.main(), 0)
+            self.assertIsNone(captured.get("max_item_tokens"))
+            argv = ["cli.py", "--max-item-tokens", "4000"]
+            with mock.patch.object(cli.sys, "argv", argv):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("max_item_tokens"), 4000)
+
+    def test_main_passes_resume(self) -> None:
         from miniflux_prompt_compiler import cli
 
         captured: dict[str, object] = {}
 
-        def fake_run(*args, **kwargs):  # type: ignore[no-untyped-def]
-            captured.update(kwargs)
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
             return "ok"
 
         with mock.patch.object(cli, "run", side_effect=fake_run):
-            with mock.patch.object(cli.sys, "argv", ["cli.py", "--links"]):
-                exit_code = cli.main()
+            with mock.patch.object(cli.sys, "argv", ["cli.py", "--resume"]):
+                self.assertEqual(cli.main(), 0)
+        self.assertTrue(captured.get("resume"))
 
-        self.assertEqual(exit_code, 0)
-        self.assertTrue(captured.get("links_only"))
+        with redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                cli.parse_args(["--resume", "--no-journal"])
+
+    def test_main_passes_no_dedup(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py"]):
+                self.assertEqual(cli.main(), 0)
+            self.assertIs(captured.get("dedup"), True)
+            with mock.patch.object(cli.sys, "argv", ["cli.py", "--no-dedup"]):
+                self.assertEqual(cli.main(), 0)
+        self.assertIs(captured.get("dedup"), False)
+
+    def test_main_enables_cache_only_with_cache_dir(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py"]):
+                self.assertEqual(cli.main(), 0)
+        self.assertIsNone(captured.get("cache_dir"))
+        # Dziennik przebiegu nie zalezy od cache tresci.
+        self.assertIsNotNone(captured.get("state_dir"))
+
+        argv = ["cli.py", "--resume", "--state-dir", "/tmp/mpc-state"]
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", argv):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("state_dir"), Path("/tmp/mpc-state"))
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(cli.sys, "argv", ["cli.py", "--no-journal"]):
+                self.assertEqual(cli.main(), 0)
+        self.assertIsNone(captured.get("state_dir"))
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys, "argv", ["cli.py", "--cache-dir", "/tmp/mpc-cache"]
+            ):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("cache_dir"), Path("/tmp/mpc-cache"))
+
+    def test_main_passes_extract_processes_and_noise_rules(self) -> None:
+        from miniflux_prompt_compiler import cli
+
+        captured: dict[str, object] = {}
+
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
+            return "ok"
+
+        with mock.patch.object(cli, "run", side_effect=fake_run):
+            with mock.patch.object(
+                cli.sys,
+                "argv",
+                ["cli.py", "--extract-processes", "0", "--noise-rules", "noise.toml"],
+            ):
+                self.assertEqual(cli.main(), 0)
+        self.assertEqual(captured.get("extract_processes"), 0)
+        self.assertEqual(captured.get("noise_rules_path"), Path("noise.toml"))
 
     def test_main_passes_base_url(self) -> None:
         from miniflux_prompt_compiler import cli
 
         captured: dict[str, object] = {}
 
-        def fake_run(*args, **kwargs):  # type: ignore[no-untyped-def]
-            captured.update(kwargs)
+        def fake_run(options, **kwargs):  # type: ignore[no-untyped-def]
+            captured.update(vars(options))
             return "ok"
 
         with mock.patch.object(cli, "run", side_effect=fake_run):
@@ -489,6 +3022,89 @@ class PlaywrightFlagTest(unittest.TestCase):
         self.assertEqual(captured.get("base_url"), "http://example.com")
 
 
+# Budzet importu CLI (`-X importtime`, mikrosekundy): bez ciezkich zaleznosci
+# zostaje stdlib i moduly pakietu; trafilatura z lxml sama przekracza limit.
+CLI_IMPORT_BUDGET_US = 250_000
+HEAVY_MODULES = (
+    "trafilatura",
+    "lxml",
+    "requests",
+    "httpx",
+    "tiktoken",
+    "playwright",
+    "youtube_transcript_api",
+)
+
+
+class StartupImportTest(unittest.TestCase):
+    def test_cli_import_skips_heavy_dependencies_and_fits_budget(self) -> None:
+        import subprocess
+        import sys
+
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                "import miniflux_prompt_compiler.cli",
+            ],
+            cwd=Path(__file__).resolve().parents[1],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings: dict[str, int] = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative)
+
+        loaded = {name.split(".")[0] for name in timings}
+        self.assertEqual(loaded & set(HEAVY_MODULES), set())
+        self.assertLess(
+            timings["miniflux_prompt_compiler.cli"], CLI_IMPORT_BUDGET_US
+        )
+
+    def test_links_mode_does_not_load_extraction_dependencies(self) -> None:
+        import subprocess
+        import sys
+
+        code = """
+import sys
+from pathlib import Path
+from miniflux_prompt_compiler.app import run
+
+output = run(
+    env_path=Path(sys.argv[1]),
+    environ={"MINIFLUX_API_TOKEN": "abc123"},
+    fetcher=lambda base_url, token: [{"id": 1, "url": "https://example.com/a"}],
+    marker=lambda base_url, token, entry_id: None,
+    clipboard=lambda text: None,
+    interactive=False,
+    links_only=True,
+)
+print(output.splitlines()[0])
+print(sorted({name.split(".")[0] for name in sys.modules}))
+"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            result = subprocess.run(
+                [sys.executable, "-c", code, str(Path(tmpdir) / ".env")],
+                cwd=Path(__file__).resolve().parents[1],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+        summary, modules = result.stdout.splitlines()[-2:]
+        self.assertIn("Links: 1", summary)
+        # `--links` rozmawia z Miniflux przez requests; reszta jest zbedna.
+        for name in set(HEAVY_MODULES) - {"requests"}:
+            self.assertNotIn(repr(name), modules)
+
+
 class LinksModeTest(unittest.TestCase):
     def test_run_links_only_copies_article_links_and_marks_them_read(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -602,16 +3218,329 @@ class PlaywrightFallbackTest(unittest.TestCase):
         self.assertEqual(content, "fallback content")
 
 
+    def test_browser_pool_launches_once_and_blocks_heavy_resources(self) -> None:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        from miniflux_prompt_compiler.adapters.playwright_fetch import (
+            PlaywrightBrowserPool,
+        )
+
+        events: list[str] = []
+        active = 0
+        peak = 0
+
+        class FakeLocator:
+            first = None
+
+            async def count(self) -> int:
+                return 0
+
+        class FakePage:
+            def __init__(self) -> None:
+                self.url = ""
+
+            async def goto(self, url: str, **kwargs: object) -> None:
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+                self.url = url
+
+            def get_by_role(self, role: str, **kwargs: object) -> FakeLocator:
+                return FakeLocator()
+
+            async def evaluate(self, script: str) -> str:
+                return f"tekst {self.url}"
+
+            async def close(self) -> None:
+                events.append("page.close")
+
+        class FakeContext:
+            def __init__(self) -> None:
+                self.handler = None
+                self.pages = 0
+
+            async def route(self, pattern: str, handler: object) -> None:
+                self.handler = handler
+
+            async def new_page(self) -> FakePage:
+                self.pages += 1
+                return FakePage()
+
+            async def close(self) -> None:
+                events.append("context.close")
+
+        context = FakeContext()
+
+        class FakeBrowser:
+            async def new_context(self) -> FakeContext:
+                return context
+
+            async def close(self) -> None:
+                events.append("browser.close")
+
+        class FakeChromium:
+            async def launch(self, headless: bool) -> FakeBrowser:
+                events.append("launch")
+                return FakeBrowser()
+
+        class FakePlaywright:
+            chromium = FakeChromium()
+
+            async def stop(self) -> None:
+                events.append("stop")
+
+        class FakeManager:
+            async def start(self) -> FakePlaywright:
+                return FakePlaywright()
+
+        class FakeRoute:
+            def __init__(self, resource_type: str) -> None:
+                self.request = mock.Mock(resource_type=resource_type)
+                self.result = ""
+
+            async def abort(self) -> None:
+                self.result = "abort"
+
+            async def continue_(self) -> None:
+                self.result = "continue"
+
+        with PlaywrightBrowserPool(max_pages=2, playwright_factory=FakeManager) as pool:
+            urls = [f"https://example.com/{index}" for index in range(6)]
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                contents = list(executor.map(pool.fetch, urls))
+
+            routes = [FakeRoute(kind) for kind in ("image", "font", "media", "script")]
+            for route in routes:
+                asyncio.run(context.handler(route))
+
+        self.assertEqual(contents, [f"tekst {url}" for url in urls])
+        self.assertEqual(events.count("launch"), 1)
+        self.assertLessEqual(peak, 2)
+        self.assertLessEqual(context.pages, 2)
+        self.assertEqual(
+            [route.result for route in routes],
+            ["abort", "abort", "abort", "continue"],
+        )
+        self.assertIn("browser.close", events)
+        self.assertEqual(events[-1], "stop")
+
+    def test_browser_pool_remembers_failed_start(self) -> None:
+        from miniflux_prompt_compiler.adapters.playwright_fetch import (
+            PlaywrightBrowserPool,
+        )
+        from miniflux_prompt_compiler.types import ContentFetchError
+
+        factory = mock.Mock(side_effect=ContentFetchError("brak przegladarki"))
+        with PlaywrightBrowserPool(playwright_factory=factory) as pool:
+            with self.assertRaises(ContentFetchError):
+                pool.fetch("https://example.com/a")
+            with self.assertRaises(ContentFetchError):
+                pool.fetch("https://example.com/b")
+
+        self.assertEqual(factory.call_count, 1)
+
+
 class JinaTimeoutTest(unittest.TestCase):
     def test_fetch_article_markdown_timeout_is_wrapped(self) -> None:
         from miniflux_prompt_compiler.adapters import jina
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
         from miniflux_prompt_compiler.types import ContentFetchError
 
-        with mock.patch.object(
-            jina.requests, "get", side_effect=requests.Timeout("timeout")
+        sleeps: list[float] = []
+        session = mock.Mock(spec=requests.Session)
+        session.get.side_effect = requests.Timeout("timeout")
+        with self.assertRaises(ContentFetchError):
+            jina.fetch_article_markdown(
+                "https://example.com",
+                session=session,
+                retry_policy=RetryPolicy(attempts=3, sleep=sleeps.append),
+            )
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(len(sleeps), 2)
+
+    def test_reader_url_comes_from_env_before_dotenv(self) -> None:
+        from miniflux_prompt_compiler.adapters import jina
+        from miniflux_prompt_compiler.app import resolve_jina_reader_url
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env_path = Path(tmpdir) / ".env"
+            env_path.write_text(
+                "JINA_READER_URL=http://127.0.0.1:9000\n", encoding="utf-8"
+            )
+            from_file = resolve_jina_reader_url(env_path, {"X": "1"})
+            from_env = resolve_jina_reader_url(
+                env_path, {"JINA_READER_URL": "http://127.0.0.1:9001/"}
+            )
+            default = resolve_jina_reader_url(Path(tmpdir) / "brak.env", {"X": "1"})
+
+        session = mock.Mock(spec=requests.Session)
+        session.get.return_value.text = "Tresc"
+        jina.fetch_article_markdown(
+            "https://example.com/a", session=session, reader_url=from_env
+        )
+
+        self.assertEqual(from_file, "http://127.0.0.1:9000")
+        self.assertEqual(default, jina.JINA_READER_URL)
+        self.assertEqual(
+            session.get.call_args.args[0],
+            "http://127.0.0.1:9001/https://example.com/a",
+        )
+
+
+def http_error(status: int, headers: dict[str, str] | None = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status} Error", response=response)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_jina_honors_retry_after_on_429(self) -> None:
+        from miniflux_prompt_compiler.adapters import jina
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+
+        throttled = requests.Response()
+        throttled.status_code = 429
+        throttled.headers["Retry-After"] = "7"
+        ok = requests.Response()
+        ok.status_code = 200
+        ok._content = b"Tresc"
+        session = mock.Mock(spec=requests.Session)
+        session.get.side_effect = [throttled, ok]
+        sleeps: list[float] = []
+
+        content = jina.fetch_article_markdown(
+            "https://example.com",
+            session=session,
+            retry_policy=RetryPolicy(base_delay=0.5, sleep=sleeps.append),
+        )
+
+        self.assertEqual(content, "Tresc")
+        self.assertEqual(sleeps, [7.0])
+
+    def test_backoff_grows_exponentially_with_jitter(self) -> None:
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=lambda: 1.0)
+        self.assertEqual([policy.backoff(n) for n in (1, 2, 3, 4)], [1, 2, 4, 5])
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=lambda: 0.0)
+        self.assertEqual([policy.backoff(n) for n in (1, 2, 3)], [0.5, 1, 2])
+
+    def test_fatal_errors_and_long_retry_after_are_not_retried(self) -> None:
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+
+        sleeps: list[float] = []
+        policy = RetryPolicy(max_delay=30.0, sleep=sleeps.append)
+        for error in (
+            http_error(404),
+            http_error(429, {"Retry-After": "120"}),
+            ValueError("zly JSON"),
         ):
-            with self.assertRaises(ContentFetchError):
-                jina.fetch_article_markdown("https://example.com", retries=1)
+            calls = mock.Mock(side_effect=error)
+            with self.assertRaises(type(error)):
+                policy.call(calls, "test")
+            self.assertEqual(calls.call_count, 1)
+        self.assertEqual(sleeps, [])
+
+    def test_500_is_retried_except_for_miniflux_fetch_content(self) -> None:
+        from miniflux_prompt_compiler.adapters import jina
+        from miniflux_prompt_compiler.adapters.miniflux_http import (
+            fetch_entry_content,
+        )
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+        from miniflux_prompt_compiler.types import ContentFetchError
+
+        def response(status: int, body: bytes = b"") -> requests.Response:
+            result = requests.Response()
+            result.status_code = status
+            result._content = body
+            return result
+
+        sleeps: list[float] = []
+        policy = RetryPolicy(sleep=sleeps.append)
+        session = mock.Mock(spec=requests.Session)
+        session.get.side_effect = [response(500), response(200, b"Tresc")]
+        content = jina.fetch_article_markdown(
+            "https://example.com", session=session, retry_policy=policy
+        )
+        self.assertEqual(content, "Tresc")
+        self.assertEqual(len(sleeps), 1)
+
+        session = mock.Mock(spec=requests.Session)
+        session.get.side_effect = [response(500), response(200, b"{}")]
+        with self.assertRaises(ContentFetchError):
+            fetch_entry_content(
+                "http://miniflux.local", "t", 1, session=session, retry_policy=policy
+            )
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(len(sleeps), 1)
+
+    def test_retry_budget_is_shared_across_calls(self) -> None:
+        from miniflux_prompt_compiler.adapters.retry import RetryBudget, RetryPolicy
+
+        budget = RetryBudget(3)
+        policy = RetryPolicy(attempts=3, budget=budget, sleep=lambda _: None)
+        calls = mock.Mock(side_effect=requests.ConnectionError("reset"))
+        for _ in range(3):
+            with self.assertRaises(requests.ConnectionError):
+                policy.call(calls, "test")
+
+        # 2 ponowienia w pierwszym wywolaniu, 1 w drugim, 0 w trzecim.
+        self.assertEqual(calls.call_count, 6)
+        self.assertEqual(budget.spent, 3)
+
+    def test_wrapped_http_errors_are_classified_by_cause(self) -> None:
+        from miniflux_prompt_compiler.adapters.retry import is_retryable
+
+        try:
+            try:
+                raise http_error(503)
+            except requests.HTTPError:
+                raise RuntimeError("YouTubeRequestFailed")
+        except RuntimeError as wrapped:
+            self.assertTrue(is_retryable(wrapped))
+        self.assertFalse(is_retryable(RuntimeError("TranscriptsDisabled")))
+
+    def test_async_miniflux_fetch_retries_gateway_errors(self) -> None:
+        import asyncio
+
+        import httpx
+
+        from miniflux_prompt_compiler.adapters.miniflux_http import (
+            fetch_entry_content_async,
+        )
+        from miniflux_prompt_compiler.adapters.retry import RetryPolicy
+
+        statuses = [503, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={"content": "<p>HTML</p>"})
+
+        sleeps: list[float] = []
+
+        async def fake_sleep(delay: float) -> None:
+            sleeps.append(delay)
+
+        async def fetch() -> str:
+            async with httpx.AsyncClient(
+                transport=httpx.MockTransport(handler)
+            ) as client:
+                return await fetch_entry_content_async(
+                    client,
+                    "http://miniflux.local",
+                    "token",
+                    1,
+                    retry_policy=RetryPolicy(async_sleep=fake_sleep),
+                )
+
+        self.assertEqual(asyncio.run(fetch()), "<p>HTML</p>")
+        self.assertEqual(len(sleeps), 1)
 
 
 class TrafilaturaCleanupTest(unittest.TestCase):
@@ -635,10 +3564,43 @@ class TrafilaturaCleanupTest(unittest.TestCase):
         self.assertIn("Akapit merytoryczny", cleaned)
         self.assertNotIn("\n\n\n", cleaned)
 
+    def test_noise_rules_file_adds_site_specific_rules(self) -> None:
+        from miniflux_prompt_compiler.config import load_noise_rules
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_path = Path(tmpdir) / "noise.toml"
+            rules_path.write_text(
+                "[default]\n"
+                'line_contains = ["subscribe now"]\n'
+                '[sites."example.com"]\n'
+                'line_patterns = ["related articles:?"]\n',
+                encoding="utf-8",
+            )
+            rules = load_noise_rules(rules_path)
+
+        markdown = (
+            "Tekst\nRelated articles:\nSubscribe NOW for more\nFollow us\nKoniec"
+        )
+        site = rules.for_url("https://www.example.com/a").clean(markdown)
+        other = rules.for_url("https://other.org/a").clean(markdown)
+        self.assertEqual(site, "Tekst\n\nKoniec")
+        self.assertEqual(other, "Tekst\nRelated articles:\n\nKoniec")
+
+    def test_noise_rules_file_with_invalid_pattern_raises(self) -> None:
+        from miniflux_prompt_compiler.config import load_noise_rules
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_path = Path(tmpdir) / "noise.toml"
+            rules_path.write_text(
+                '[default]\nline_patterns = ["(unclosed"]\n', encoding="utf-8"
+            )
+            with self.assertRaises(RuntimeError):
+                load_noise_rules(rules_path)
+
     def test_html_to_clean_markdown_uses_placeholder_when_empty(self) -> None:
         from miniflux_prompt_compiler.adapters import trafilatura_markdown
 
-        with mock.patch.object(trafilatura_markdown.trafilatura, "extract", return_value=None):
+        with mock.patch("trafilatura.extract", return_value=None):
             output = trafilatura_markdown.html_to_clean_markdown(
                 title="Tytul",
                 html="<html></html>",